@@ -0,0 +1,91 @@
+"""
+Benchmark: sender-side batching.
+
+Runs a receiver in a separate process that unpacks batches and decodes every
+envelope, then measures end-to-end messages per second for several batch sizes.
+
+Usage:
+    python -m benchmarks.bench_batching [--messages 100000] [--size 64]
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import time
+
+from src.core.batching import BatchingSender, decode_batch
+from src.core.codec import Envelope, encode_envelope, decode_envelope
+from src.core.connection_pool import ConnectionPool
+from src.core.endpoint import Endpoint, start_endpoint_server
+from src.core.framing import iter_frames, MSG_BATCH
+
+BENCH_PORT = 5991
+BATCH_SIZES = (1, 10, 100, 1000)
+
+
+def _receiver(endpoint, ready, counter):
+    async def handle(reader, writer):
+        async for msg_type, flags, payload in iter_frames(reader):
+            bodies = decode_batch(payload) if msg_type == MSG_BATCH else [payload]
+            for body in bodies:
+                decode_envelope(body)
+            with counter.get_lock():
+                counter.value += len(bodies)
+        writer.close()
+
+    async def serve():
+        server = await start_endpoint_server(endpoint, handle)
+        ready.set()
+        async with server:
+            await server.serve_forever()
+
+    asyncio.run(serve())
+
+
+def _run(endpoint, counter, messages, size, batch_size):
+    body = encode_envelope(Envelope(b"x" * size, sender_pid=1))
+    pool = ConnectionPool()
+    sender = BatchingSender(pool=pool, max_messages=batch_size, max_bytes=1 << 30, linger=0.01)
+    with counter.get_lock():
+        counter.value = 0
+
+    start = time.perf_counter()
+    for _ in range(messages):
+        sender.send(endpoint, body)
+    sender.flush()
+    while counter.value < messages:
+        time.sleep(0.0005)
+    elapsed = time.perf_counter() - start
+
+    sender.close()
+    pool.close_all()
+    return messages / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure throughput of the batching sender")
+    parser.add_argument("--messages", type=int, default=100000)
+    parser.add_argument("--size", type=int, default=64, help="Payload size in bytes")
+    args = parser.parse_args()
+
+    endpoint = Endpoint(BENCH_PORT, None)
+    ready = multiprocessing.Event()
+    counter = multiprocessing.Value("q", 0)
+    receiver = multiprocessing.Process(target=_receiver, args=(endpoint, ready, counter), daemon=True)
+    receiver.start()
+    ready.wait(5)
+
+    try:
+        print(f"{'batch size':<12}{'msgs/s':>14}{'speedup':>10}")
+        baseline = None
+        for batch_size in BATCH_SIZES:
+            rate = _run(endpoint, counter, args.messages, args.size, batch_size)
+            baseline = baseline or rate
+            print(f"{batch_size:<12}{rate:>14.0f}{rate / baseline:>9.1f}x")
+    finally:
+        receiver.terminate()
+        receiver.join()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""
+Benchmark: port allocation latency as the port range fills up.
+
+Fills a private allocator's range to several levels and measures the cost
+of allocating and releasing one port, and of allocating ten ports in one call.
+
+Usage:
+    python -m benchmarks.bench_port_allocator [--start 40000] [--size 1000] [--repeat 200]
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+from src.core.port_allocator import PortAllocator
+
+FILL_LEVELS = (0.0, 0.5, 0.9, 0.98)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure port allocation latency against range fill")
+    parser.add_argument("--start", type=int, default=40000, help="First port of the benchmark range")
+    parser.add_argument("--size", type=int, default=1000, help="Ports in the range")
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        allocator = PortAllocator(start_port=args.start, end_port=args.start + args.size,
+                                  lockfile=os.path.join(tmp, "allocator.lock"),
+                                  used_ports_file=os.path.join(tmp, "used_ports.txt"),
+                                  bitmap_file=os.path.join(tmp, "used_ports.bitmap"))
+        held = []
+        print(f"{'fill':>6}{'alloc+release us':>18}{'10 ports us':>14}")
+        for level in FILL_LEVELS:
+            target = int(args.size * level)
+            if target > len(held):
+                held.extend(allocator.get_free_ports(target - len(held)))
+
+            start = time.perf_counter()
+            for _ in range(args.repeat):
+                allocator.release_port(allocator.get_next_free_port())
+            single = (time.perf_counter() - start) / args.repeat * 1e6
+
+            start = time.perf_counter()
+            for _ in range(args.repeat):
+                for port in allocator.get_free_ports(10):
+                    allocator.release_port(port)
+            batch = (time.perf_counter() - start) / args.repeat * 1e6
+            print(f"{level:>6.0%}{single:>18.1f}{batch:>14.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Benchmark: process registry operations as the registry grows.
+
+Fills a registry with trees of one parent and nine children, then measures
+the per-operation cost of lookups, registering and removing a child, and
+tearing down a whole ten-process tree. The cost should stay flat from 10
+to 10,000 registered processes.
+
+Usage:
+    python -m benchmarks.bench_registry [--repeat 200]
+"""
+
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+from src.core.process_registry import ProcessRegistry, CachedProcessRegistry
+from src.core.registry_index import RegistryIndex
+
+SIZES = (10, 100, 1000, 10000)
+TREE = 10  # One parent and nine children
+
+
+class _IndexBackend:
+    """
+    RegistryIndex behind the ProcessRegistry method names.
+    """
+
+    def __init__(self):
+        self.index = RegistryIndex()
+
+    def register_process(self, pid, port, parent_pid=None):
+        self.index.register(pid, port, parent_pid)
+
+    def get_endpoint_by_pid(self, pid):
+        return self.index.endpoint_of(pid)
+
+    def remove_process(self, port):
+        self.index.remove_port(port)
+
+    def remove_parent_and_children(self, parent_pid):
+        self.index.remove_tree(parent_pid)
+
+
+def _fill(registry, size):
+    for parent in range(size // TREE):
+        parent_pid = 100000 + parent * TREE
+        registry.register_process(parent_pid, 10000 + parent * TREE)
+        for child in range(1, TREE):
+            registry.register_process(parent_pid + child, 10000 + parent * TREE + child, parent_pid=parent_pid)
+
+
+def _per_op(fn, repeat):
+    start = time.perf_counter()
+    for i in range(repeat):
+        fn(i)
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+def _measure(registry, size, repeat):
+    _fill(registry, size)
+    trees = size // TREE
+
+    def lookup(i):
+        registry.get_endpoint_by_pid(100000 + (i % trees) * TREE + i % TREE)
+
+    def churn(i):
+        registry.register_process(900000 + i, 90000 + i, parent_pid=100000)
+        registry.remove_process(90000 + i)
+
+    def teardown(i):
+        parent_pid = 800000 + i * TREE
+        registry.register_process(parent_pid, 80000 + i * TREE)
+        for child in range(1, TREE):
+            registry.register_process(parent_pid + child, 80000 + i * TREE + child, parent_pid=parent_pid)
+        start = time.perf_counter()
+        registry.remove_parent_and_children(parent_pid)
+        teardown.elapsed += time.perf_counter() - start
+
+    lookup(0)  # Let a caching backend load its snapshot first
+    teardown.elapsed = 0.0
+    _per_op(teardown, repeat)
+    return _per_op(lookup, repeat * 10), _per_op(churn, repeat), teardown.elapsed / repeat * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure registry operation cost against registry size")
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        backends = {
+            "index": lambda size: _IndexBackend(),
+            "sqlite": lambda size: ProcessRegistry(Path(tmp) / f"sqlite-{size}.db", legacy_file=None),
+            "cached": lambda size: CachedProcessRegistry(Path(tmp) / f"cached-{size}.db", legacy_file=None),
+        }
+        print(f"{'backend':<8}{'processes':>10}{'lookup us':>12}{'churn us':>12}{'teardown us':>14}")
+        for name, make in backends.items():
+            for size in SIZES:
+                lookup, churn, teardown = _measure(make(size), size, args.repeat)
+                print(f"{name:<8}{size:>10}{lookup:>12.2f}{churn:>12.2f}{teardown:>14.2f}")
+
+
+if __name__ == "__main__":
+    main()
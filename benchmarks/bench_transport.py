@@ -0,0 +1,96 @@
+"""
+Benchmark: loopback TCP vs Unix domain socket transport.
+
+Runs an echo server in a separate process for each transport and measures
+round-trip latency (one frame in flight) and pipelined throughput.
+
+Usage:
+    python -m benchmarks.bench_transport [--messages 20000] [--size 128]
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import os
+import statistics
+import tempfile
+import time
+
+from src.core.endpoint import Endpoint, connect_endpoint, start_endpoint_server
+from src.core.framing import encode_frame, iter_frames, recv_frame
+
+BENCH_PORT = 5990
+
+
+def _echo_server(endpoint, ready):
+    async def handle(reader, writer):
+        async for msg_type, flags, payload in iter_frames(reader):
+            writer.write(encode_frame(payload, msg_type, flags))
+            await writer.drain()
+        writer.close()
+
+    async def serve():
+        server = await start_endpoint_server(endpoint, handle)
+        ready.set()
+        async with server:
+            await server.serve_forever()
+
+    asyncio.run(serve())
+
+
+def _run(endpoint, messages, size):
+    ready = multiprocessing.Event()
+    server = multiprocessing.Process(target=_echo_server, args=(endpoint, ready), daemon=True)
+    server.start()
+    ready.wait(5)
+    frame = encode_frame(os.urandom(size))
+
+    try:
+        sock = connect_endpoint(endpoint)
+        latencies = []
+        for _ in range(min(messages, 5000)):
+            start = time.perf_counter()
+            sock.sendall(frame)
+            recv_frame(sock)
+            latencies.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        batch = frame * 100
+        for _ in range(messages // 100):
+            sock.sendall(batch)
+            for _ in range(100):
+                recv_frame(sock)
+        elapsed = time.perf_counter() - start
+        sock.close()
+    finally:
+        server.terminate()
+        server.join()
+
+    latencies.sort()
+    return {
+        "p50_us": statistics.median(latencies) * 1e6,
+        "p99_us": latencies[int(len(latencies) * 0.99) - 1] * 1e6,
+        "msgs_per_s": (messages // 100) * 100 / elapsed,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare TCP and Unix socket transports")
+    parser.add_argument("--messages", type=int, default=20000)
+    parser.add_argument("--size", type=int, default=128, help="Payload size in bytes")
+    args = parser.parse_args()
+
+    socket_dir = tempfile.mkdtemp(prefix="portpulse-bench-")
+    modes = {
+        "tcp": Endpoint(BENCH_PORT, None),
+        "unix": Endpoint(BENCH_PORT, os.path.join(socket_dir, "bench.sock")),
+    }
+
+    print(f"{'transport':<10}{'p50 (us)':>12}{'p99 (us)':>12}{'msgs/s':>14}")
+    for name, endpoint in modes.items():
+        result = _run(endpoint, args.messages, args.size)
+        print(f"{name:<10}{result['p50_us']:>12.1f}{result['p99_us']:>12.1f}{result['msgs_per_s']:>14.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -6,12 +6,20 @@ import signal
 import os
 import asyncio
 import json
-from ..core.process_manager import ProcessCreator, send_message_to_process
+import time
+from ..core.process_manager import ProcessCreator, send_message_to_process, send_request_to_process
 from ..core.monitor import ProcessMonitor
 from ..core.message_handler import MessageQueue
-from ..core.process_registry import ProcessRegistry
+from ..core.process_registry import get_registry
 from ..core.port_allocator import PortAllocator 
 from ..core.logger import log_event
+from ..core.log_store import SegmentedLogStore, parse_timestamp
+from ..core.log_collector import run_log_collector
+from ..core.registry_daemon import run_registry_daemon
+from ..core.fanout import broadcast
+from ..core.broker import run_broker, publish, BrokerClient
+from ..core.compression import get_compression_stats
+from ..core.config import COMPRESSION, LOG_COLLECTOR, REGISTRY_DAEMON
 from ..ui.dashboard import launch_dashboard
 
 def handle_init():
@@ -43,33 +51,70 @@ def handle_create_process(process_type, num_parents, num_children):
         port = creator.port_allocator.get_next_free_port()
         creator.child_handler(child_id=1, port=port)
 
-def handle_send_message(port, from_pid, message):
+def handle_send_message(port, from_pid, message, compression=None, count=1):
     """
     Sends a message from a process (by PID) to another process (by port).
+    `compression` overrides COMPRESSION from config.py ("none" disables it).
+    With `count` > 1 the message is sent that many times through the batching sender.
     """
     print(f"📬 Sending: '{message}' from PID {from_pid} to port {port}")
-    registry = ProcessRegistry()
+    registry = get_registry()
     target_pid = registry.get_pid_by_port(port)
     
     if target_pid:
-        send_message_to_process(target_pid, message, sender_pid=from_pid)
+        if compression is None:
+            compression = COMPRESSION
+        elif compression == "none":
+            compression = None
+        if count > 1:
+            sent = _send_batched(registry.get_endpoint_by_port(port), from_pid, message, compression, count)
+        else:
+            sent = send_message_to_process(target_pid, message, sender_pid=from_pid, compression=compression)
+        if sent and compression:
+            stats = get_compression_stats(registry.get_endpoint_by_port(port)).as_dict()
+            print(f"🗜️  {compression}: {stats['compressed']}/{stats['messages']} compressed, "
+                  f"ratio {stats['ratio']}, {stats['compress_ms']} ms")
         log_event(f"Message sent from PID {from_pid} to PID {target_pid} on port {port}", 
                  pid=from_pid, port=port)
     else:
         print(f"[❌] No process found for port {port}")
         log_event(f"Failed to send message: No process found for port {port}", level="ERROR")
 
+def _send_batched(endpoint, from_pid, message, compression, count):
+    queue = MessageQueue()
+    batcher = queue.batching_sender(compression=compression)
+    for _ in range(count):
+        queue.send_batched(endpoint, message, sender_pid=from_pid)
+    batcher.close()
+    stats = batcher.stats()
+    if stats["failed"]:
+        print(f"[❌] {stats['failed']} of {count} messages could not be delivered")
+        return False
+    print(f"[✅] {count} messages sent in {stats['batches']} batches (avg {stats['avg_batch']:.1f} per batch)")
+    return True
+
+def handle_request(to_pid, from_pid, message, timeout):
+    """
+    Sends a request to a process by PID and prints its reply.
+    """
+    print(f"📨 Requesting: '{message}' from PID {to_pid}")
+    reply = send_request_to_process(to_pid, message, sender_pid=from_pid, timeout=timeout)
+    if reply is not None:
+        print(f"[✅] Reply from PID {reply.sender_pid}: {reply.text}")
+    else:
+        print(f"[❌] No reply from PID {to_pid}")
+
 def handle_child_message(from_pid, to_pid, message):
     """
     Sends a message from one child process to another child process by PID.
     """
-    registry = ProcessRegistry()
+    registry = get_registry()
     from_port = registry.get_port_by_pid(from_pid)
     to_port = registry.get_port_by_pid(to_pid)
     
     if from_port and to_port:
         print(f"📩 Sending: '{message}' from PID {from_pid} to PID {to_pid}")
-        send_message_to_process(port=to_port, message=message, sender_pid=from_pid)
+        send_message_to_process(to_pid, message, sender_pid=from_pid)
         log_event(f"Child message sent from PID {from_pid} to PID {to_pid}: {message}", 
                  pid=from_pid, port=to_port)
     else:
@@ -79,21 +124,130 @@ def handle_child_message(from_pid, to_pid, message):
 def handle_broadcast(parent_pid, message):
     """
     Sends a message to all children of a parent or all processes if parent_pid is 0.
+    Deliveries run concurrently; a per-target report is printed at the end.
     """
-    registry = ProcessRegistry()
     if parent_pid == 0:
         print(f"📢 Broadcasting: '{message}' to all processes")
-        processes = registry.list_all_processes()
-        for port, pid in processes["port_to_pid"].items():
-            if port != -1:
-                send_message_to_process(port=port, message=message, sender_pid=None)
     else:
         print(f"📢 Broadcasting: '{message}' to children of PID {parent_pid}")
-        children = registry.get_children_by_parent(parent_pid)
-        for child_pid in children:
-            port = registry.get_port_by_pid(child_pid)
-            if port and port != -1:
-                send_message_to_process(port=port, message=message, sender_pid=None)
+
+    report = broadcast(message, parent_pid=parent_pid)
+    for result in report.results:
+        if result.delivered:
+            print(f"  [✅] PID {result.pid} on port {result.port} ({result.latency * 1000:.1f} ms)")
+        else:
+            print(f"  [❌] PID {result.pid} on port {result.port}: {result.error}")
+    print(f"📊 {report.summary()}")
+
+def handle_broker(port):
+    """
+    Runs the publish/subscribe broker in the foreground.
+    """
+    print("📡 Starting PortPulse broker...")
+    run_broker(port)
+
+def handle_publish(topic, message, from_pid):
+    """
+    Publishes a message to a topic through the broker.
+    """
+    try:
+        publish(topic, message, sender_pid=from_pid)
+        print(f"[✅] Published to '{topic}'")
+    except OSError as e:
+        print(f"[❌] Failed to publish to '{topic}': {e}")
+        log_event(f"Failed to publish to {topic}: {e}", pid=from_pid, level="ERROR")
+
+def handle_subscribe(patterns):
+    """
+    Subscribes to topic patterns and prints messages until interrupted.
+    """
+    async def run():
+        client = await BrokerClient.connect()
+        for pattern in patterns:
+            await client.subscribe(pattern)
+        print(f"👂 Subscribed to {', '.join(patterns)} (Ctrl+C to stop)")
+        try:
+            async for topic, envelope in client.messages():
+                print(f"[{topic}] from PID {envelope.sender_pid}: {envelope.text}")
+        finally:
+            await client.close()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+    except (OSError, ValueError) as e:
+        print(f"[❌] Failed to subscribe: {e}")
+
+def _parse_time(value):
+    """
+    Epoch seconds for an age ("30s", "15m", "2h", "7d"), epoch seconds, or an ISO-8601 timestamp.
+    """
+    if value is None:
+        return None
+    units = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+    if value[-1:] in units and value[:-1].isdigit():
+        return time.time() - int(value[:-1]) * units[value[-1]]
+    try:
+        return float(value)
+    except ValueError:
+        return parse_timestamp(value)
+
+def handle_logs(pid, port, level, since, until, limit):
+    """
+    Prints log entries matching the filters, oldest first, from the active log and its segments.
+    """
+    try:
+        since, until = _parse_time(since), _parse_time(until)
+    except ValueError as e:
+        print(f"[❌] Invalid time: {e}")
+        return
+    count = 0
+    for log in SegmentedLogStore().query(pid=pid, port=port, level=level.upper() if level else None,
+                                         since=since, until=until, limit=limit):
+        print(f"{log['timestamp']} | PID {log['pid']} | Port {log['port']} | {log['level']}: {log['message']}")
+        count += 1
+    if not count:
+        print("No matching log entries")
+
+def handle_log_collector():
+    """
+    Runs the central log collector in the foreground until interrupted.
+    """
+    if not LOG_COLLECTOR:
+        print("ℹ️  LOG_COLLECTOR is disabled in config.py; other processes will keep writing logs themselves")
+    run_log_collector()
+
+def handle_registry_daemon():
+    """
+    Runs the registry daemon in the foreground until interrupted.
+    """
+    if not REGISTRY_DAEMON:
+        print("❌ REGISTRY_DAEMON is disabled in config.py; enable it so processes use the daemon instead of the database")
+        return
+    run_registry_daemon()
+
+def handle_ports(sweep=False):
+    """
+    Lists port leases with the state of their holders; with --sweep, reclaims
+    the ports of dead holders and expired leases first.
+    """
+    allocator = PortAllocator()
+    if sweep:
+        reclaimed = allocator.reclaim()
+        print(f"♻️  Reclaimed {len(reclaimed)} port(s)" + (f": {', '.join(map(str, reclaimed))}" if reclaimed else ""))
+    leases = allocator.leases()
+    if not leases:
+        print(f"ℹ️  No ports leased in {allocator.start_port}-{allocator.end_port - 1}")
+        return
+    now = time.time()
+    print(f"{'PORT':<8}{'PID':<10}{'HOLDER':<10}EXPIRES")
+    for lease in leases:
+        expires = f"in {lease.expires - now:.0f}s" if lease.expires else "-"
+        print(f"{lease.port:<8}{lease.pid or '-':<10}{lease.status:<10}{expires}")
+    stale = sum(lease.status in ("dead", "expired") for lease in leases)
+    if stale and not sweep:
+        print(f"⚠️  {stale} lease(s) held by dead holders or expired; run with --sweep to reclaim them")
 
 def handle_monitor():
     """
@@ -114,7 +268,7 @@ def handle_terminate_process(port):
     """
     Terminates a specific child process by port and updates registry.
     """
-    registry = ProcessRegistry()
+    registry = get_registry()
     pid = registry.get_pid_by_port(port)
     
     if pid:
@@ -134,7 +288,7 @@ def handle_terminate_parent(parent_pid):
     """
     Terminates a parent and all its associated children.
     """
-    registry = ProcessRegistry()
+    registry = get_registry()
     children = registry.get_children_by_parent(parent_pid)
     allocator = PortAllocator()
 
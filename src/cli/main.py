@@ -4,12 +4,21 @@ Handles command-line parsing and dispatches to corresponding command handlers.
 """
 
 import argparse
+from ..core.config import RPC_TIMEOUT
 from .commands import (
     handle_init,
     handle_create_process,
     handle_send_message,
+    handle_request,
     handle_child_message,
     handle_broadcast,
+    handle_broker,
+    handle_publish,
+    handle_subscribe,
+    handle_logs,
+    handle_log_collector,
+    handle_registry_daemon,
+    handle_ports,
     handle_monitor,
     handle_ui,
     handle_terminate_process, 
@@ -38,6 +47,18 @@ def main():
     send_parser.add_argument('--port', type=int, required=True, help='Destination port')
     send_parser.add_argument('--from-pid', type=int, required=True, help='Sender process PID')
     send_parser.add_argument('--message', type=str, required=True, help='Message to send')
+    send_parser.add_argument('--compress', choices=['zlib', 'lzma', 'none'], default=None,
+                             help='Compress payloads above COMPRESSION_THRESHOLD (default: COMPRESSION from config.py)')
+    send_parser.add_argument('--count', type=int, default=1,
+                             help='Send the message this many times, coalesced into batches')
+
+    # Request / Reply
+    request_parser = subparsers.add_parser('request', help='Send a request to a process by PID and wait for its reply')
+    request_parser.add_argument('--to-pid', type=int, required=True, help='Receiver process PID')
+    request_parser.add_argument('--from-pid', type=int, default=None, help='Sender process PID')
+    request_parser.add_argument('--message', type=str, required=True, help='Request payload')
+    request_parser.add_argument('--timeout', type=float, default=RPC_TIMEOUT,
+                                help='Seconds to wait for the reply (default: RPC_TIMEOUT from config.py)')
 
     # Child to Child Message
     child_msg_parser = subparsers.add_parser('child-message', help='Send message from one child to another by PID')
@@ -50,6 +71,39 @@ def main():
     broadcast_parser.add_argument('--parent-pid', type=int, default=0, help='Parent PID (0 for all processes)')
     broadcast_parser.add_argument('--message', type=str, required=True, help='Message to broadcast')
 
+    # Publish / Subscribe
+    broker_parser = subparsers.add_parser('broker', help='Run the publish/subscribe broker')
+    broker_parser.add_argument('--port', type=int, default=None, help='Broker port (allocated if omitted)')
+
+    publish_parser = subparsers.add_parser('publish', help='Publish a message to a topic via the broker')
+    publish_parser.add_argument('--topic', type=str, required=True, help='Topic, e.g. jobs.eu.created')
+    publish_parser.add_argument('--message', type=str, required=True, help='Message to publish')
+    publish_parser.add_argument('--from-pid', type=int, default=None, help='Sender process PID')
+
+    subscribe_parser = subparsers.add_parser('subscribe', help='Print messages published to matching topics')
+    subscribe_parser.add_argument('--topic', type=str, action='append', required=True,
+                                  help='Topic pattern ("*" = one segment, "#" = the rest); repeatable')
+
+    # Log history
+    logs_parser = subparsers.add_parser('logs', help='Query log history across rotated segments')
+    logs_parser.add_argument('--pid', type=int, default=None, help='Only entries for this PID')
+    logs_parser.add_argument('--port', type=int, default=None, help='Only entries for this port')
+    logs_parser.add_argument('--level', type=str, default=None, help='Only entries at this level, e.g. ERROR')
+    logs_parser.add_argument('--since', type=str, default=None,
+                             help='Start of the time range: ISO-8601 (UTC), epoch seconds, or an age like 30m, 2h, 7d')
+    logs_parser.add_argument('--until', type=str, default=None, help='End of the time range (same formats as --since)')
+    logs_parser.add_argument('--limit', type=int, default=None, help='Print at most this many entries')
+
+    # Log collector
+    subparsers.add_parser('log-collector', help='Run the central log collector (used when LOG_COLLECTOR is enabled)')
+
+    # Registry daemon
+    subparsers.add_parser('registry-daemon', help='Run the in-memory registry daemon (used when REGISTRY_DAEMON is enabled)')
+
+    # Port leases
+    ports_parser = subparsers.add_parser('ports', help='Show port leases and the state of their holders')
+    ports_parser.add_argument('--sweep', action='store_true', help='Reclaim ports of dead holders and expired leases first')
+
     # Terminate Child
     terminate_parser = subparsers.add_parser('terminate-child', help='Terminate child process by port')
     terminate_parser.add_argument('--port', type=int, required=True, help='Port of the child process')
@@ -73,11 +127,27 @@ def main():
         case 'create-process':
             handle_create_process(args.type, args.parents, args.children)
         case 'send':
-            handle_send_message(args.port, args.from_pid, args.message)
+            handle_send_message(args.port, args.from_pid, args.message, args.compress, args.count)
+        case 'request':
+            handle_request(args.to_pid, args.from_pid, args.message, args.timeout)
         case 'child-message':
             handle_child_message(args.from_pid, args.to_pid, args.message)
         case 'broadcast':
             handle_broadcast(args.parent_pid, args.message)
+        case 'broker':
+            handle_broker(args.port)
+        case 'publish':
+            handle_publish(args.topic, args.message, args.from_pid)
+        case 'subscribe':
+            handle_subscribe(args.topic)
+        case 'logs':
+            handle_logs(args.pid, args.port, args.level, args.since, args.until, args.limit)
+        case 'log-collector':
+            handle_log_collector()
+        case 'registry-daemon':
+            handle_registry_daemon()
+        case 'ports':
+            handle_ports(args.sweep)
         case 'terminate-child':
             handle_terminate_process(args.port)  
         case 'terminate-parent':
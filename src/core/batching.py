@@ -0,0 +1,200 @@
+import atexit
+import collections
+import os
+import struct
+import threading
+import time
+
+from .config import BATCH_MAX_MESSAGES, BATCH_MAX_BYTES, BATCH_LINGER, COMPRESSION
+from .connection_pool import get_connection_pool
+from .endpoint import as_endpoint
+from .framing import FrameError, MSG_DATA, MSG_BATCH
+from .logger import log_event
+
+_LENGTH = struct.Struct("!I")
+_MAX_READY_BATCHES = 64  # Producers wait once this many full batches are waiting to be sent
+
+
+def encode_batch(bodies):
+    """
+    Payload of a BATCH frame: each encoded envelope prefixed with its length.
+    """
+    return b"".join(_LENGTH.pack(len(body)) + body for body in bodies)
+
+
+def decode_batch(payload):
+    """
+    Split a BATCH frame payload back into the encoded envelopes.
+    """
+    bodies = []
+    offset, end = 0, len(payload)
+    while offset < end:
+        if end - offset < _LENGTH.size:
+            raise FrameError("Truncated message length in batch")
+        (length,) = _LENGTH.unpack_from(payload, offset)
+        offset += _LENGTH.size
+        if offset + length > end:
+            raise FrameError("Truncated message in batch")
+        bodies.append(payload[offset:offset + length])
+        offset += length
+    return bodies
+
+
+class _Batch:
+    def __init__(self, deadline):
+        self.bodies = []
+        self.size = 0
+        self.deadline = deadline
+
+
+class BatchingSender:
+    """
+    Coalesces messages bound for the same destination into one BATCH frame.
+
+    A destination's batch is flushed when it holds `max_messages` messages,
+    reaches `max_bytes`, or `linger` seconds after its first message, whichever
+    comes first. Sending happens on a background thread, so send() does not do
+    any I/O; producers only wait when too many full batches are waiting to be sent.
+    """
+
+    def __init__(self, pool=None, max_messages=BATCH_MAX_MESSAGES, max_bytes=BATCH_MAX_BYTES,
+                 linger=BATCH_LINGER, compression=COMPRESSION):
+        self.pool = pool or get_connection_pool()
+        self.max_messages = max_messages
+        self.max_bytes = max_bytes
+        self.linger = linger
+        self.compression = compression
+        self._open = {}  # endpoint -> _Batch still accepting messages
+        self._ready = collections.deque()  # (endpoint, bodies) waiting to be sent
+        self._in_flight = 0
+        self._cond = threading.Condition()
+        self._thread = None
+        self._pid = None
+        self._closed = False
+        self.messages = 0
+        self.batches = 0
+        self.failed = 0
+
+    def stats(self):
+        with self._cond:
+            return {
+                "messages": self.messages,
+                "batches": self.batches,
+                "failed": self.failed,
+                "avg_batch": self.messages / self.batches if self.batches else 0.0,
+                "pending": sum(len(b.bodies) for b in self._open.values())
+                           + sum(len(bodies) for _, bodies in self._ready),
+            }
+
+    def _ensure_thread_locked(self):
+        if self._pid != os.getpid():
+            # Batches and the flusher thread belong to the parent after a fork.
+            self._open, self._ready, self._in_flight = {}, collections.deque(), 0
+            self._thread, self._pid = None, os.getpid()
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="portpulse-batcher", daemon=True)
+            self._thread.start()
+
+    def send(self, target, body):
+        """
+        Queue one encoded envelope for `target` (a port or Endpoint).
+        """
+        endpoint = as_endpoint(target)
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("BatchingSender is closed")
+            self._ensure_thread_locked()
+            batch = self._open.get(endpoint)
+            if batch is None:
+                batch = self._open[endpoint] = _Batch(time.monotonic() + self.linger)
+                self._cond.notify_all()  # The flusher may need to wake up earlier
+            batch.bodies.append(body)
+            batch.size += len(body)
+            if len(batch.bodies) >= self.max_messages or batch.size >= self.max_bytes:
+                del self._open[endpoint]
+                self._ready.append((endpoint, batch.bodies))
+                self._cond.notify_all()
+            while len(self._ready) > _MAX_READY_BATCHES:
+                self._cond.wait()
+
+    def flush(self, timeout=None):
+        """
+        Send every queued message now and wait until it has been written.
+        Returns False if `timeout` expired first.
+        """
+        with self._cond:
+            if self._thread is None or self._pid != os.getpid():
+                return True
+            for endpoint, batch in self._open.items():
+                self._ready.append((endpoint, batch.bodies))
+            self._open.clear()
+            self._cond.notify_all()
+            return self._cond.wait_for(lambda: not self._ready and not self._in_flight, timeout)
+
+    def close(self):
+        """
+        Flush outstanding batches and stop the background thread.
+        """
+        self.flush()
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+            thread = self._thread if self._pid == os.getpid() else None
+        if thread is not None:
+            thread.join()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while True:
+                    now = time.monotonic()
+                    for endpoint in [e for e, b in self._open.items() if b.deadline <= now]:
+                        self._ready.append((endpoint, self._open.pop(endpoint).bodies))
+                    if self._ready or self._closed:
+                        break
+                    deadline = min((b.deadline for b in self._open.values()), default=None)
+                    self._cond.wait(None if deadline is None else deadline - now)
+                if not self._ready:
+                    return
+                ready, self._ready = self._ready, collections.deque()
+                self._in_flight = len(ready)
+                self._cond.notify_all()  # Producers waiting for room can continue
+
+            for endpoint, bodies in ready:
+                self._send(endpoint, bodies)
+
+            with self._cond:
+                self._in_flight = 0
+                self._cond.notify_all()
+
+    def _send(self, endpoint, bodies):
+        try:
+            if len(bodies) == 1:
+                self.pool.send_frame(endpoint, bodies[0], MSG_DATA, compression=self.compression)
+            else:
+                self.pool.send_frame(endpoint, encode_batch(bodies), MSG_BATCH, compression=self.compression)
+        except Exception as e:
+            with self._cond:
+                self.failed += len(bodies)
+            log_event(f"Failed to send batch of {len(bodies)} to port {endpoint.port}: {e}",
+                      port=endpoint.port, level="ERROR")
+            return
+        with self._cond:
+            self.messages += len(bodies)
+            self.batches += 1
+
+
+_default_sender = None
+_default_sender_lock = threading.Lock()
+
+
+def get_batching_sender():
+    """
+    Return the process-wide batching sender, flushed at interpreter exit.
+    """
+    global _default_sender
+    with _default_sender_lock:
+        if _default_sender is None:
+            _default_sender = BatchingSender()
+            atexit.register(_default_sender.close)
+        return _default_sender
@@ -0,0 +1,333 @@
+import asyncio
+import os
+import struct
+
+from .config import BROKER_QUEUE_SIZE, BROKER_SLOW_POLICY, BROKER_STATS_INTERVAL
+from .codec import Envelope, encode_envelope, decode_envelope
+from .connection_pool import get_connection_pool
+from .endpoint import endpoint_for_port, open_endpoint_connection, start_endpoint_server
+from .framing import encode_frame, iter_frames, FrameError, MSG_SUBSCRIBE, MSG_UNSUBSCRIBE, MSG_PUBLISH
+from .logger import log_event
+from .port_allocator import PortAllocator
+from .process_registry import get_registry
+
+BROKER_SERVICE = "broker"
+SLOW_POLICIES = ("drop_oldest", "drop_newest", "disconnect")
+
+_TOPIC_LENGTH = struct.Struct("!H")
+_MAX_CACHED_ROUTES = 10000
+
+
+def encode_publish(topic, envelope_bytes):
+    """
+    Payload of a PUBLISH frame: a length-prefixed topic followed by the envelope.
+    """
+    topic = topic.encode()
+    return _TOPIC_LENGTH.pack(len(topic)) + topic + envelope_bytes
+
+
+def decode_publish(payload):
+    """
+    Topic and envelope bytes of a PUBLISH frame payload. Raises FrameError if it is malformed.
+    """
+    try:
+        (length,) = _TOPIC_LENGTH.unpack_from(payload)
+        end = _TOPIC_LENGTH.size + length
+        if end > len(payload):
+            raise FrameError(f"Topic of {length} bytes overruns a {len(payload)}-byte publish frame")
+        return bytes(payload[_TOPIC_LENGTH.size:end]).decode(), payload[end:]
+    except (struct.error, UnicodeDecodeError) as e:
+        raise FrameError(f"Malformed publish frame: {e}") from None
+
+
+def _decode_pattern(payload):
+    try:
+        return payload.decode()
+    except UnicodeDecodeError as e:
+        raise FrameError(f"Topic pattern is not UTF-8: {e}") from None
+
+
+def validate_pattern(pattern):
+    """
+    Raise ValueError unless `pattern` is a valid subscription: "#" may only
+    be the last segment.
+    """
+    parts = pattern.split(".")
+    if "#" in parts[:-1]:
+        raise ValueError(f"Invalid topic pattern {pattern!r}: '#' is only allowed as the last segment")
+
+
+def topic_matches(pattern, topic):
+    """
+    Dot-separated topic matching: "*" matches exactly one segment and a
+    trailing "#" matches any number of remaining segments (including none).
+    Patterns are checked with validate_pattern() when subscribing.
+    """
+    pattern_parts = pattern.split(".")
+    topic_parts = topic.split(".")
+    for i, part in enumerate(pattern_parts):
+        if part == "#":
+            return True
+        if i >= len(topic_parts):
+            return False
+        if part != "*" and part != topic_parts[i]:
+            return False
+    return len(pattern_parts) == len(topic_parts)
+
+
+class _Subscriber:
+    """
+    One subscriber connection: its patterns and its outgoing queue.
+    """
+
+    def __init__(self, writer, peer, queue_size):
+        self.writer = writer
+        self.peer = peer
+        self.patterns = set()
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.dropped = 0
+        self.sender_task = None
+
+
+class Broker:
+    """
+    Topic-based publish/subscribe broker.
+    Publishers send each message once; the broker fans it out to every
+    subscriber whose pattern matches, over their persistent connections.
+    Each subscriber has its own bounded queue so one slow consumer only
+    affects itself, according to `slow_policy`.
+    """
+
+    def __init__(self, port, queue_size=BROKER_QUEUE_SIZE, slow_policy=BROKER_SLOW_POLICY,
+                 stats_interval=BROKER_STATS_INTERVAL):
+        if slow_policy not in SLOW_POLICIES:
+            raise ValueError(f"Unknown slow-consumer policy: {slow_policy}")
+        self.port = port
+        self.queue_size = queue_size
+        self.slow_policy = slow_policy
+        self.stats_interval = stats_interval
+        self.subscribers = set()
+        self._routes = {}  # topic -> [subscriber, ...], cleared when subscriptions change
+        self.published = 0
+        self.delivered = 0
+        self.dropped = 0
+        self.disconnected = 0
+
+    def stats(self):
+        return {
+            "subscribers": len(self.subscribers),
+            "published": self.published,
+            "delivered": self.delivered,
+            "dropped": self.dropped,
+            "disconnected": self.disconnected,
+        }
+
+    async def serve(self):
+        """
+        Listen for publishers and subscribers until cancelled.
+        """
+        endpoint = endpoint_for_port(self.port)
+        server = await start_endpoint_server(endpoint, self._handle_client)
+        log_event(f"Broker listening on port {self.port}", port=self.port)
+        stats_task = asyncio.create_task(self._report_stats())
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            stats_task.cancel()
+            if endpoint.path and os.path.exists(endpoint.path):
+                os.unlink(endpoint.path)
+
+    def _route(self, topic):
+        subscribers = self._routes.get(topic)
+        if subscribers is None:
+            if len(self._routes) >= _MAX_CACHED_ROUTES:
+                self._routes.clear()
+            subscribers = [s for s in self.subscribers
+                           if any(topic_matches(p, topic) for p in s.patterns)]
+            self._routes[topic] = subscribers
+        return subscribers
+
+    def publish(self, topic, frame):
+        """
+        Queue an already-encoded PUBLISH frame for every matching subscriber.
+        """
+        self.published += 1
+        for subscriber in self._route(topic):
+            try:
+                subscriber.queue.put_nowait(frame)
+                continue
+            except asyncio.QueueFull:
+                pass
+            if self.slow_policy == "drop_oldest":
+                subscriber.queue.get_nowait()
+                subscriber.queue.put_nowait(frame)
+                subscriber.dropped += 1
+                self.dropped += 1
+            elif self.slow_policy == "drop_newest":
+                subscriber.dropped += 1
+                self.dropped += 1
+            else:
+                log_event(f"Disconnecting slow subscriber {subscriber.peer}", port=self.port, level="ERROR")
+                self.disconnected += 1
+                self._remove(subscriber)
+                subscriber.writer.close()
+
+    def _remove(self, subscriber):
+        if subscriber in self.subscribers:
+            self.subscribers.discard(subscriber)
+            self._routes.clear()
+        if subscriber.sender_task:
+            subscriber.sender_task.cancel()
+
+    async def _send_loop(self, subscriber):
+        """
+        Drain a subscriber's queue, writing whatever has accumulated in one go.
+        """
+        try:
+            while True:
+                frames = [await subscriber.queue.get()]
+                while not subscriber.queue.empty() and len(frames) < 256:
+                    frames.append(subscriber.queue.get_nowait())
+                subscriber.writer.write(b"".join(frames))
+                await subscriber.writer.drain()
+                self.delivered += len(frames)
+        except OSError as e:
+            log_event(f"Delivery to subscriber {subscriber.peer} failed: {e}", port=self.port, level="ERROR")
+            self.subscribers.discard(subscriber)
+            self._routes.clear()
+
+    async def _handle_client(self, reader, writer):
+        peer = writer.get_extra_info('peername') or writer.get_extra_info('sockname')
+        subscriber = _Subscriber(writer, peer, self.queue_size)
+        try:
+            async for msg_type, flags, payload in iter_frames(reader):
+                if msg_type == MSG_PUBLISH:
+                    topic, _ = decode_publish(payload)
+                    self.publish(topic, encode_frame(payload, MSG_PUBLISH))
+                elif msg_type == MSG_SUBSCRIBE:
+                    pattern = _decode_pattern(payload)
+                    try:
+                        validate_pattern(pattern)
+                    except ValueError as e:
+                        log_event(f"{peer} subscription rejected: {e}", port=self.port, level="ERROR")
+                        continue
+                    subscriber.patterns.add(pattern)
+                    if subscriber not in self.subscribers:
+                        self.subscribers.add(subscriber)
+                        subscriber.sender_task = asyncio.create_task(self._send_loop(subscriber))
+                    self._routes.clear()
+                    log_event(f"{peer} subscribed to {pattern}", port=self.port)
+                elif msg_type == MSG_UNSUBSCRIBE:
+                    subscriber.patterns.discard(_decode_pattern(payload))
+                    self._routes.clear()
+                    if not subscriber.patterns:
+                        self._remove(subscriber)
+        except (ConnectionResetError, FrameError) as e:
+            log_event(f"Broker connection from {peer} dropped: {e}", port=self.port, level="ERROR")
+        finally:
+            self._remove(subscriber)
+            writer.close()
+
+    async def _report_stats(self):
+        last_published, last_delivered = 0, 0
+        while True:
+            await asyncio.sleep(self.stats_interval)
+            if self.published == last_published and self.delivered == last_delivered:
+                continue
+            log_event(f"Broker: {(self.published - last_published) / self.stats_interval:.0f} pub/s, "
+                      f"{(self.delivered - last_delivered) / self.stats_interval:.0f} deliveries/s, "
+                      f"{len(self.subscribers)} subscribers, {self.dropped} dropped", port=self.port)
+            last_published, last_delivered = self.published, self.delivered
+
+
+def run_broker(port=None):
+    """
+    Run a broker in the current process, registered in the ProcessRegistry as
+    the "broker" service so clients can discover it. Blocks until interrupted.
+    """
+    allocator = PortAllocator()
+    port = port or allocator.get_next_free_port()
+    pid = os.getpid()
+    registry = get_registry()
+    registry.register_process(pid, port, socket_path=endpoint_for_port(port).path)
+    registry.register_service(BROKER_SERVICE, pid)
+    print(f"[Broker] PID: {pid} running on port {port}")
+
+    try:
+        asyncio.run(Broker(port).serve())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        registry.unregister_service(BROKER_SERVICE)
+        registry.remove_process(port)
+        allocator.release_port(port)
+        log_event("Broker stopped", pid=pid, port=port)
+
+
+def find_broker(registry=None):
+    """
+    Endpoint of the registered broker, or None if none is running.
+    """
+    registry = registry or get_registry()
+    pid = registry.get_service_pid(BROKER_SERVICE)
+    return registry.get_endpoint_by_pid(pid) if pid is not None else None
+
+
+def publish(topic, message, sender_pid=None, endpoint=None):
+    """
+    Publish one message through the broker over a pooled persistent connection.
+    """
+    endpoint = endpoint or find_broker()
+    if endpoint is None:
+        raise ConnectionRefusedError("No broker registered")
+    envelope = Envelope(message, sender_pid=sender_pid)
+    get_connection_pool().send(endpoint, encode_frame(encode_publish(topic, encode_envelope(envelope)), MSG_PUBLISH))
+
+
+class BrokerClient:
+    """
+    asyncio client for publishing and subscribing through the broker.
+    """
+
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+
+    @classmethod
+    async def connect(cls, endpoint=None):
+        endpoint = endpoint or find_broker()
+        if endpoint is None:
+            raise ConnectionRefusedError("No broker registered")
+        reader, writer = await open_endpoint_connection(endpoint)
+        return cls(reader, writer)
+
+    async def subscribe(self, pattern):
+        validate_pattern(pattern)
+        self.writer.write(encode_frame(pattern.encode(), MSG_SUBSCRIBE))
+        await self.writer.drain()
+
+    async def unsubscribe(self, pattern):
+        self.writer.write(encode_frame(pattern.encode(), MSG_UNSUBSCRIBE))
+        await self.writer.drain()
+
+    async def publish(self, topic, message, sender_pid=None):
+        envelope = Envelope(message, sender_pid=sender_pid)
+        self.writer.write(encode_frame(encode_publish(topic, encode_envelope(envelope)), MSG_PUBLISH))
+        await self.writer.drain()
+
+    async def messages(self):
+        """
+        Yield (topic, Envelope) for every message delivered to this subscriber.
+        """
+        async for msg_type, flags, payload in iter_frames(self.reader):
+            if msg_type == MSG_PUBLISH:
+                topic, envelope_bytes = decode_publish(payload)
+                yield topic, decode_envelope(envelope_bytes)
+
+    async def close(self):
+        self.writer.close()
+        try:
+            await self.writer.wait_closed()
+        except ConnectionResetError:
+            pass
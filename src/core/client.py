@@ -0,0 +1,195 @@
+import asyncio
+import atexit
+import os
+import threading
+
+from .config import RPC_TIMEOUT, USE_TCP, COMPRESSION
+from .codec import Envelope, encode_envelope
+from .compression import get_compression_stats
+from .datagram import get_datagram_sender
+from .endpoint import LOCALHOST, Endpoint, open_endpoint_connection
+from .framing import negotiate_compression_async
+from .logger import log_event
+from .process_registry import get_registry
+from .rpc import RpcConnection
+
+
+class AsyncPortPulseClient:
+    """
+    Long-lived asyncio client that keeps one persistent connection per
+    destination and uses it for messages and requests alike.
+
+    Targets are PIDs (resolved through the ProcessRegistry) or Endpoints.
+    The client belongs to the event loop it is first used on.
+    """
+
+    def __init__(self, sender_pid=None, host=LOCALHOST, compression=COMPRESSION):
+        self.sender_pid = sender_pid if sender_pid is not None else os.getpid()
+        self.host = host
+        self.compression = compression
+        self._connections = {}  # endpoint -> RpcConnection
+        self._opening = {}  # endpoint -> Task, so concurrent callers share one connect
+
+    def resolve(self, target):
+        """
+        Endpoint for a PID or Endpoint; raises LookupError for an unknown PID.
+        """
+        if isinstance(target, Endpoint):
+            return target
+        endpoint = get_registry().get_endpoint_by_pid(target)
+        if endpoint is None:
+            raise LookupError(f"No valid port found for PID {target}")
+        return endpoint
+
+    async def connection(self, endpoint):
+        """
+        The open connection to `endpoint`, connecting (and negotiating compression) if needed.
+        """
+        connection = self._connections.get(endpoint)
+        if connection is not None and not connection.closed:
+            return connection
+        task = self._opening.get(endpoint)
+        if task is None:
+            task = self._opening[endpoint] = asyncio.create_task(self._open(endpoint))
+        try:
+            connection = await asyncio.shield(task)
+        finally:
+            if task.done():
+                self._opening.pop(endpoint, None)
+        self._connections[endpoint] = connection
+        return connection
+
+    async def _open(self, endpoint):
+        reader, writer = await open_endpoint_connection(endpoint, self.host)
+        algorithm = ""
+        if self.compression:
+            try:
+                algorithm = await negotiate_compression_async(reader, writer, self.compression)
+            except BaseException:
+                writer.close()
+                raise
+        connection = RpcConnection(reader, writer, self.sender_pid, compression=algorithm)
+        if algorithm:
+            connection.stats = get_compression_stats(endpoint)
+        return connection
+
+    async def send_many(self, target, messages, sender_pid=None):
+        """
+        Send several messages to one target, written in a single batch.
+        """
+        endpoint = self.resolve(target)
+        destination = None if isinstance(target, Endpoint) else target
+        sender_pid = sender_pid if sender_pid is not None else self.sender_pid
+        if not USE_TCP:
+            sender = get_datagram_sender()
+            for message in messages:
+                sender.send(endpoint.port, encode_envelope(
+                    Envelope(message, sender_pid=sender_pid, destination=destination)))
+            return
+        try:
+            connection = await self.connection(endpoint)
+            await connection.send(messages, sender_pid, destination)
+        except (ConnectionError, BrokenPipeError):
+            # The peer closed an idle connection; reconnect once.
+            self._connections.pop(endpoint, None)
+            connection = await self.connection(endpoint)
+            await connection.send(messages, sender_pid, destination)
+
+    async def send(self, target, message, sender_pid=None):
+        await self.send_many(target, [message], sender_pid)
+
+    async def request(self, target, message, timeout=RPC_TIMEOUT, sender_pid=None):
+        """
+        Send a request and return the reply Envelope (see RpcConnection.request).
+        """
+        if not USE_TCP:
+            raise RuntimeError("Requests need a stream transport (USE_TCP is False)")
+        endpoint = self.resolve(target)
+        destination = None if isinstance(target, Endpoint) else target
+        connection = await self.connection(endpoint)
+        return await connection.request(message, timeout=timeout, destination=destination,
+                                        sender_pid=sender_pid)
+
+    async def close(self):
+        for task in self._opening.values():
+            task.cancel()
+        connections, self._connections, self._opening = list(self._connections.values()), {}, {}
+        await asyncio.gather(*(c.close() for c in connections), return_exceptions=True)
+
+
+class PortPulseClient:
+    """
+    Synchronous facade over AsyncPortPulseClient for non-async callers.
+
+    Runs the async client on `loop` if one is given (it must be running in
+    another thread), otherwise on an event loop in its own background thread.
+    submit() returns a concurrent.futures.Future for callers, such as the
+    dashboard, that must not block.
+    """
+
+    def __init__(self, loop=None, **options):
+        self._pid = os.getpid()
+        self._thread = None
+        if loop is None:
+            loop = asyncio.new_event_loop()
+            self._thread = threading.Thread(target=loop.run_forever, name="portpulse-client", daemon=True)
+            self._thread.start()
+        self.loop = loop
+        self.client = AsyncPortPulseClient(**options)
+
+    def submit(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def _call(self, coro, timeout=None):
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is self.loop:
+            coro.close()
+            raise RuntimeError("PortPulseClient cannot block its own event loop; use AsyncPortPulseClient")
+        return self.submit(coro).result(timeout)
+
+    def send_nowait(self, target, message, sender_pid=None):
+        """
+        Queue a send on the client's loop and return its Future without waiting.
+        """
+        return self.submit(self.client.send(target, message, sender_pid))
+
+    def send(self, target, message, sender_pid=None):
+        return self._call(self.client.send(target, message, sender_pid))
+
+    def send_many(self, target, messages, sender_pid=None):
+        return self._call(self.client.send_many(target, messages, sender_pid))
+
+    def request(self, target, message, timeout=RPC_TIMEOUT, sender_pid=None):
+        return self._call(self.client.request(target, message, timeout, sender_pid))
+
+    def close(self):
+        if self.loop.is_closed() or self._pid != os.getpid():
+            return
+        try:
+            self._call(self.client.close(), timeout=5)
+        except Exception as e:
+            log_event(f"Error while closing client connections: {e}", level="ERROR")
+        if self._thread is not None:
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self._thread.join()
+            self.loop.close()
+
+
+_default_client = None
+_default_client_lock = threading.Lock()
+
+
+def get_client():
+    """
+    Return the process-wide client shared by the CLI and the dashboard.
+    """
+    global _default_client
+    with _default_client_lock:
+        if _default_client is None or _default_client._pid != os.getpid():
+            # The loop thread of a parent process does not survive fork().
+            _default_client = PortPulseClient()
+            atexit.register(_default_client.close)
+        return _default_client
@@ -0,0 +1,152 @@
+import base64
+import itertools
+import json
+import os
+import struct
+import time
+
+from .config import CODEC, ENCODING
+
+# Binary envelope: magic, sender pid, destination, message id, timestamp, then raw payload bytes.
+# PIDs are -1 when unknown.
+_BINARY_MAGIC = 0xB1
+_BINARY_HEADER = struct.Struct("!BiiQd")
+
+_message_counter = itertools.count(1)
+
+
+def next_message_id():
+    """
+    Message id unique per sender: the PID in the high 32 bits, a counter in the low 32.
+    """
+    return ((os.getpid() & 0xFFFFFFFF) << 32) | (next(_message_counter) & 0xFFFFFFFF)
+
+
+class Envelope:
+    """
+    A message plus its routing metadata.
+    `payload` is bytes, or a memoryview for zero-copy deliveries.
+    """
+
+    __slots__ = ("payload", "sender_pid", "destination", "message_id", "timestamp")
+
+    def __init__(self, payload, sender_pid=None, destination=None, message_id=None, timestamp=None):
+        if isinstance(payload, str):
+            payload = payload.encode(ENCODING)
+        self.payload = payload
+        self.sender_pid = sender_pid
+        self.destination = destination
+        self.message_id = next_message_id() if message_id is None else message_id
+        self.timestamp = time.time() if timestamp is None else timestamp
+
+    @property
+    def text(self):
+        return str(self.payload, ENCODING, errors="replace")
+
+    def __str__(self):
+        return self.text
+
+    def __repr__(self):
+        return (f"Envelope(sender_pid={self.sender_pid}, destination={self.destination}, "
+                f"message_id={self.message_id}, size={len(self.payload)})")
+
+
+class BinaryCodec:
+    """
+    Compact struct-packed envelope encoding (default).
+    """
+    name = "binary"
+
+    def encode(self, envelope):
+        header = _BINARY_HEADER.pack(
+            _BINARY_MAGIC,
+            -1 if envelope.sender_pid is None else envelope.sender_pid,
+            -1 if envelope.destination is None else envelope.destination,
+            envelope.message_id,
+            envelope.timestamp,
+        )
+        return header + envelope.payload
+
+    def decode(self, data, copy=True):
+        _, sender_pid, destination, message_id, timestamp = _BINARY_HEADER.unpack_from(data)
+        payload = memoryview(data)[_BINARY_HEADER.size:]
+        return Envelope(
+            bytes(payload) if copy else payload,
+            sender_pid=None if sender_pid == -1 else sender_pid,
+            destination=None if destination == -1 else destination,
+            message_id=message_id,
+            timestamp=timestamp,
+        )
+
+
+class JsonCodec:
+    """
+    Human-readable envelope encoding for debugging. Non-text payloads are base64-encoded.
+    """
+    name = "json"
+
+    def encode(self, envelope):
+        doc = {
+            "sender_pid": envelope.sender_pid,
+            "destination": envelope.destination,
+            "message_id": envelope.message_id,
+            "timestamp": envelope.timestamp,
+        }
+        try:
+            doc["payload"] = str(envelope.payload, ENCODING)
+        except UnicodeDecodeError:
+            doc["payload"] = base64.b64encode(envelope.payload).decode("ascii")
+            doc["payload_encoding"] = "base64"
+        return json.dumps(doc).encode(ENCODING)
+
+    def decode(self, data, copy=True):
+        doc = json.loads(bytes(data))
+        if "payload" not in doc and "message" in doc:
+            # Envelope written by older senders: {"message": ..., "sender_pid": ...}
+            if not isinstance(doc["message"], str):
+                raise TypeError("Message of an older envelope is not text")
+            return Envelope(doc["message"], sender_pid=doc.get("sender_pid"))
+        if doc.get("payload_encoding") == "base64":
+            payload = base64.b64decode(doc["payload"])
+        else:
+            payload = doc["payload"].encode(ENCODING)
+        return Envelope(
+            payload,
+            sender_pid=doc.get("sender_pid"),
+            destination=doc.get("destination"),
+            message_id=doc.get("message_id"),
+            timestamp=doc.get("timestamp"),
+        )
+
+
+CODECS = {
+    BinaryCodec.name: BinaryCodec(),
+    JsonCodec.name: JsonCodec(),
+}
+
+
+def get_codec(name=CODEC):
+    try:
+        return CODECS[name]
+    except KeyError:
+        raise ValueError(f"Unknown codec: {name}") from None
+
+
+def encode_envelope(envelope, codec=CODEC):
+    return get_codec(codec).encode(envelope)
+
+
+def decode_envelope(data, copy=True):
+    """
+    Decode an envelope written by either codec, detected from its first byte.
+    Anything else is treated as a bare payload. With `copy=False` the payload
+    is a memoryview into `data`.
+    """
+    if len(data) >= _BINARY_HEADER.size and data[0] == _BINARY_MAGIC:
+        return CODECS["binary"].decode(data, copy)
+    if data[:1] == b"{":
+        try:
+            return CODECS["json"].decode(data, copy)
+        except (ValueError, KeyError, AttributeError, TypeError):
+            pass
+    return Envelope(bytes(data) if copy else data, message_id=0)
@@ -0,0 +1,153 @@
+import lzma
+import threading
+import time
+import zlib
+
+from .config import COMPRESSION_THRESHOLD, COMPRESSION_LEVEL, MAX_FRAME_SIZE
+from . import framing  # Only the module: framing imports this one in turn
+
+# Frame header flag bits marking a compressed payload
+FLAG_ZLIB = 0x01
+FLAG_LZMA = 0x02
+COMPRESSION_FLAGS = FLAG_ZLIB | FLAG_LZMA
+
+
+def _decompress_zlib(data):
+    decompressor = zlib.decompressobj()
+    try:
+        output = decompressor.decompress(data, MAX_FRAME_SIZE + 1)
+    except zlib.error as e:
+        raise framing.FrameError(f"Corrupt zlib payload: {e}") from None
+    return _checked(output, decompressor.eof)
+
+
+def _decompress_lzma(data):
+    decompressor = lzma.LZMADecompressor()
+    try:
+        output = decompressor.decompress(data, max_length=MAX_FRAME_SIZE + 1)
+    except lzma.LZMAError as e:
+        raise framing.FrameError(f"Corrupt lzma payload: {e}") from None
+    return _checked(output, decompressor.eof)
+
+
+def _checked(output, eof):
+    # Output is bounded, so a small frame cannot expand without limit in the receiver.
+    if len(output) > MAX_FRAME_SIZE:
+        raise framing.FrameError(f"Compressed payload expands beyond MAX_FRAME_SIZE ({MAX_FRAME_SIZE})")
+    if not eof:
+        raise framing.FrameError("Truncated compressed payload")
+    return output
+
+
+ALGORITHMS = {
+    "zlib": (FLAG_ZLIB, lambda data: zlib.compress(data, COMPRESSION_LEVEL), _decompress_zlib),
+    "lzma": (FLAG_LZMA, lambda data: lzma.compress(data, preset=min(COMPRESSION_LEVEL, 9)), _decompress_lzma),
+}
+_BY_FLAG = {flag: decompress for flag, _, decompress in ALGORITHMS.values()}
+
+
+class CompressionStats:
+    """
+    Running totals for one endpoint: how much was saved and what it cost.
+    """
+
+    def __init__(self):
+        self.messages = 0
+        self.compressed = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.compress_time = 0.0
+        self.decompressed = 0
+        self.decompress_time = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def ratio(self):
+        """
+        Compressed size over original size for payloads that went through the compressor.
+        """
+        return self.bytes_out / self.bytes_in if self.bytes_in else 1.0
+
+    def record_compress(self, size_in, size_out, elapsed, used):
+        with self._lock:
+            self.messages += 1
+            if elapsed:
+                self.bytes_in += size_in
+                self.bytes_out += size_out
+                self.compress_time += elapsed
+            if used:
+                self.compressed += 1
+
+    def record_decompress(self, elapsed):
+        with self._lock:
+            self.decompressed += 1
+            self.decompress_time += elapsed
+
+    def as_dict(self):
+        return {
+            "messages": self.messages,
+            "compressed": self.compressed,
+            "ratio": round(self.ratio, 3),
+            "compress_ms": round(self.compress_time * 1000, 3),
+            "decompressed": self.decompressed,
+            "decompress_ms": round(self.decompress_time * 1000, 3),
+        }
+
+
+_stats = {}
+_stats_lock = threading.Lock()
+
+
+def get_compression_stats(key=None):
+    """
+    Stats for one endpoint key (a destination Endpoint or a listening port),
+    or a dict of all of them when `key` is None.
+    """
+    with _stats_lock:
+        if key is None:
+            return {k: v.as_dict() for k, v in _stats.items()}
+        return _stats.setdefault(key, CompressionStats())
+
+
+def compress_payload(payload, algorithm, threshold=COMPRESSION_THRESHOLD, stats=None):
+    """
+    Compress `payload` with `algorithm` if it is at least `threshold` bytes and
+    compression actually makes it smaller. Returns (data, frame flags).
+    """
+    if not algorithm or len(payload) < threshold:
+        if stats:
+            stats.record_compress(len(payload), len(payload), 0.0, False)
+        return payload, 0
+    flag, compress, _ = ALGORITHMS[algorithm]
+    start = time.perf_counter()
+    compressed = compress(payload)
+    elapsed = time.perf_counter() - start
+    used = len(compressed) < len(payload)
+    if stats:
+        stats.record_compress(len(payload), len(compressed), elapsed, used)
+    return (compressed, flag) if used else (payload, 0)
+
+
+def decompress_payload(payload, flags, stats=None):
+    """
+    Undo compress_payload according to the frame flags. Raises FrameError for
+    a corrupt payload or one that expands beyond MAX_FRAME_SIZE.
+    """
+    flag = flags & COMPRESSION_FLAGS
+    if not flag:
+        return payload
+    start = time.perf_counter()
+    data = _BY_FLAG[flag](payload)
+    if stats:
+        stats.record_decompress(time.perf_counter() - start)
+    return data
+
+
+def choose_algorithm(offered):
+    """
+    Server side of negotiation: the first offered algorithm this side supports, or "".
+    """
+    for name in offered:
+        if name in ALGORITHMS:
+            return name
+    return ""
@@ -4,6 +4,8 @@ import os
 BASE_PORT = 5000               # Starting port for process assignment
 MAX_PORT = 6000                # Maximum port number
 PORT_STEP = 1                  # Increment step to assign ports
+PORT_LEASE_TTL = 0             # Seconds a port lease lasts unless its holder renews it (0: as long as the holder runs)
+PORT_SWEEP_INTERVAL = 30       # Seconds between sweeps reclaiming ports of dead holders during allocation
 
 # === Process Settings ===
 MAX_PARENT_PROCESSES = 5       # Limit on how many parent processes can be created
@@ -14,15 +16,67 @@ PROCESS_TIMEOUT = 60           # Time (in seconds) to keep child alive for test/
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 LOG_DIR = os.path.abspath(os.path.join(BASE_DIR, "../../logs"))  # Resolves to ~/Documents/pbl/port-pulse/logs
 LOG_FILE = os.path.join(LOG_DIR, "logs.json")
-LOG_LEVEL = "INFO"             # Levels: DEBUG, INFO, ERROR
+LOG_LEVEL = "INFO"             # Minimum level written: DEBUG, INFO, WARNING, ERROR
+LOG_MESSAGE_SAMPLE = 1000      # Per-message events (received/handled) are logged 1 in N per call site
+LOG_RATE_LIMIT = 10            # Records per second allowed from a rate-limited call site (errors in hot paths)
+LOG_QUEUE_SIZE = 10000         # Records buffered for the background writer; further records are dropped
+LOG_BATCH_SIZE = 512           # Records written per batch
+LOG_DURABILITY = "interval"    # fsync policy: "records" (every LOG_FSYNC_RECORDS), "interval" (every LOG_FSYNC_INTERVAL_MS) or "never"
+LOG_FSYNC_RECORDS = 100        # Records between fsyncs with "records"
+LOG_FSYNC_INTERVAL_MS = 1000   # Milliseconds between fsyncs with "interval"
+LOG_SEGMENT_DIR = os.path.join(LOG_DIR, "segments")  # Closed (rotated) log segments and their indexes
+LOG_ROTATE_BYTES = 10 * 1024 * 1024  # Rotate LOG_FILE into a segment at this size (0 disables)
+LOG_ROTATE_INTERVAL = 86400    # ... or once its first record is this many seconds old (0 disables)
+LOG_COMPRESS_SEGMENTS = True   # gzip closed segments
+LOG_INDEX_EVERY = 1000         # Records between sparse (timestamp, offset) index points
+LOG_COLLECTOR = False          # Send records to a central log collector process ("portpulse log-collector") when one is running
+LOG_COLLECTOR_SOCKET = "/tmp/portpulse/log-collector.sock"  # Unix stream socket of the collector
+
+# === Registry ===
+REGISTRY_BUSY_TIMEOUT = 5      # Seconds a registry update waits while another process holds the write lock
+REGISTRY_DAEMON = False        # Use the registry daemon ("portpulse registry-daemon") instead of the database when it is running
+REGISTRY_SOCKET = "/tmp/portpulse/registry.sock"  # Unix stream socket of the registry daemon
+REGISTRY_STATE_DIR = os.path.join(BASE_DIR, "registry_state")  # Daemon snapshot and journal
+REGISTRY_SNAPSHOT_EVERY = 1000 # Journal entries between daemon snapshots
+REGISTRY_SUBSCRIBER_BUFFER = 1024 * 1024  # Bytes of unsent events before a slow subscriber is disconnected
 
 # === Monitor ===
 MONITOR_REFRESH_RATE = 2       # In seconds, refresh interval for dashboard
 
 # === Networking ===
-USE_TCP = True                 # Use TCP over UDP for message passing
-BUFFER_SIZE = 1024             # Size of message buffer
+USE_TCP = True                 # Use TCP over UDP for message passing (False: UDP datagrams)
+DATAGRAM_MAX_SIZE = 1472       # Largest datagram sent (1500-byte MTU minus IP/UDP headers)
+DATAGRAM_SEQUENCE = True       # Number datagrams so receivers can count losses
+DATAGRAM_BATCH_SIZE = 64       # Datagrams read per event-loop wakeup
+TRANSPORT = "tcp"              # Stream transport: "tcp" (loopback ports) or "unix" (AF_UNIX sockets)
+SOCKET_DIR = "/tmp/portpulse"  # Runtime directory for Unix socket endpoints
+USE_SHM_CHANNELS = False       # Give each parent->child pair a shared-memory channel for messages
+SHM_RING_CAPACITY = 4 * 1024 * 1024  # Bytes per shared-memory ring (multiple of 8)
+BUFFER_SIZE = 65536            # Socket read chunk size hint (not a message size limit)
+MAX_FRAME_SIZE = 16 * 1024 * 1024  # Largest accepted message frame, in bytes
 ENCODING = "utf-8"             # Message encoding format
+CODEC = "binary"               # Envelope encoding: "binary" (compact) or "json" (debugging)
+COMPRESSION = None             # Opt-in payload compression: None, "zlib" or "lzma"
+COMPRESSION_THRESHOLD = 4096   # Payloads smaller than this (bytes) are never compressed
+COMPRESSION_LEVEL = 6          # zlib level / lzma preset
+BATCH_MAX_MESSAGES = 100       # Batching sender: flush once this many messages are queued for a destination
+BATCH_MAX_BYTES = 65536        # ... or once the queued envelopes reach this many bytes
+BATCH_LINGER = 0.005           # ... or this many seconds after the first message of a batch
+CONNECT_TIMEOUT = 2            # Seconds to wait when opening a connection to a process
+POOL_IDLE_TIMEOUT = 30         # Seconds an unused pooled connection is kept open
+POOL_MAX_IDLE_PER_PORT = 4     # Idle connections kept per destination port
+FANOUT_CONCURRENCY = 64        # Broadcast deliveries in flight at once
+FANOUT_TIMEOUT = 2             # Seconds before a single broadcast delivery is abandoned
+RPC_TIMEOUT = 5                # Seconds a request waits for its reply
+INBOX_CAPACITY = 1000          # Messages queued per endpoint before backpressure applies
+INBOX_WORKERS = 4              # Handler coroutines draining each endpoint's inbox
+INBOX_POLICY = "block"         # When full: "block" the sender, reply "busy", or ask to "retry"
+INBOX_RETRY_AFTER = 0.1        # Seconds suggested to senders under the "retry" policy
+
+# === Broker ===
+BROKER_QUEUE_SIZE = 1000       # Messages buffered per subscriber
+BROKER_SLOW_POLICY = "drop_oldest"  # Full subscriber queue: "drop_oldest", "drop_newest" or "disconnect"
+BROKER_STATS_INTERVAL = 10     # Seconds between broker throughput log lines
 
 # === UI Settings (optional, if using Tkinter/Web) ===
 UI_UPDATE_INTERVAL = 1000      # Milliseconds (used in Tkinter's after())
@@ -0,0 +1,205 @@
+import os
+import socket
+import threading
+import time
+import atexit
+import weakref
+
+from .config import CONNECT_TIMEOUT, POOL_IDLE_TIMEOUT, POOL_MAX_IDLE_PER_PORT
+from .compression import compress_payload, get_compression_stats
+from .endpoint import LOCALHOST, as_endpoint, connect_endpoint
+from .framing import encode_frame, negotiate_compression, MSG_DATA
+
+
+class ConnectionPool:
+    """
+    Keeps sender-side sockets open and reuses them across messages.
+    Connections are keyed by destination endpoint (TCP port or Unix socket
+    path); idle ones are evicted after
+    `idle_timeout` seconds and dead peers are detected before reuse.
+    """
+
+    def __init__(self, host=LOCALHOST, idle_timeout=POOL_IDLE_TIMEOUT,
+                 max_idle_per_port=POOL_MAX_IDLE_PER_PORT, connect_timeout=CONNECT_TIMEOUT):
+        self.host = host
+        self.idle_timeout = idle_timeout
+        self.max_idle_per_port = max_idle_per_port
+        self.connect_timeout = connect_timeout
+        self._idle = {}  # endpoint -> [(sock, last_used), ...]
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+        self._negotiated = weakref.WeakKeyDictionary()  # sock -> (offered, accepted) compression
+
+    def _check_fork(self):
+        """
+        Sockets inherited from a parent process must not be shared with it.
+        """
+        if self._pid != os.getpid():
+            for conns in self._idle.values():
+                for sock, _ in conns:
+                    sock.close()
+            self._idle = {}
+            self._pid = os.getpid()
+
+    def _connect(self, endpoint):
+        return connect_endpoint(endpoint, host=self.host, timeout=self.connect_timeout)
+
+    def _is_alive(self, sock):
+        """
+        Peek at the socket without blocking: an empty read means the peer closed it.
+        """
+        try:
+            sock.setblocking(False)
+            return sock.recv(1, socket.MSG_PEEK) != b""
+        except BlockingIOError:
+            return True
+        except OSError:
+            return False
+        finally:
+            try:
+                sock.settimeout(self.connect_timeout)
+            except OSError:
+                pass
+
+    def acquire(self, target):
+        """
+        Return (sock, reused) for `target` (a port or Endpoint), reusing a live
+        idle connection if one exists.
+        """
+        endpoint = as_endpoint(target)
+        with self._lock:
+            self._check_fork()
+            self._evict_idle_locked()
+            conns = self._idle.get(endpoint, [])
+            while conns:
+                sock, _ = conns.pop()
+                if self._is_alive(sock):
+                    return sock, True
+                sock.close()
+        return self._connect(endpoint), False
+
+    def release(self, target, sock):
+        """
+        Return a healthy connection to the pool.
+        """
+        endpoint = as_endpoint(target)
+        with self._lock:
+            self._check_fork()
+            conns = self._idle.setdefault(endpoint, [])
+            if len(conns) < self.max_idle_per_port:
+                conns.append((sock, time.monotonic()))
+                return
+        sock.close()
+
+    def send(self, target, payload):
+        """
+        Send `payload` to `target` (a port or Endpoint) over a pooled connection.
+        A reused connection that fails is retried once on a fresh one.
+        """
+        self._send_with_retry(as_endpoint(target), lambda sock: payload)
+
+    def send_frame(self, target, body, msg_type=MSG_DATA, compression=None):
+        """
+        Frame and send `body`, compressing it with `compression` ("zlib"/"lzma")
+        if the receiver agreed to it when the connection was negotiated.
+        """
+        endpoint = as_endpoint(target)
+        if not compression:
+            self._send_with_retry(endpoint, lambda sock: encode_frame(body, msg_type))
+            return
+        stats = get_compression_stats(endpoint)
+
+        def build(sock):
+            data, flags = compress_payload(body, self._negotiate(sock, compression), stats=stats)
+            return encode_frame(data, msg_type, flags)
+
+        self._send_with_retry(endpoint, build)
+
+    def _negotiate(self, sock, compression):
+        """
+        Agree on a compression algorithm once per connection (and again if the
+        offer changes); returns the accepted algorithm or "".
+        """
+        offered, accepted = self._negotiated.get(sock, (None, ""))
+        if offered != compression:
+            accepted = negotiate_compression(sock, compression, timeout=self.connect_timeout)
+            self._negotiated[sock] = (compression, accepted)
+        return accepted
+
+    def _send_with_retry(self, endpoint, build):
+        """
+        Send on a pooled connection, retrying once on a fresh one if a reused
+        connection turns out to be dead. A connection that fails in any way
+        (including a FrameError from `build`) is closed, never returned to the pool.
+        """
+        sock, reused = self.acquire(endpoint)
+        try:
+            sock.sendall(build(sock))
+        except OSError:
+            sock.close()
+            if not reused:
+                raise
+            sock = self._connect(endpoint)
+            try:
+                sock.sendall(build(sock))
+            except BaseException:
+                sock.close()
+                raise
+        except BaseException:
+            sock.close()
+            raise
+        self.release(endpoint, sock)
+
+    def _evict_idle_locked(self):
+        cutoff = time.monotonic() - self.idle_timeout
+        for endpoint in list(self._idle):
+            fresh = []
+            for sock, last_used in self._idle[endpoint]:
+                if last_used < cutoff:
+                    sock.close()
+                else:
+                    fresh.append((sock, last_used))
+            if fresh:
+                self._idle[endpoint] = fresh
+            else:
+                del self._idle[endpoint]
+
+    def evict_idle(self):
+        """
+        Close connections that have been idle longer than `idle_timeout`.
+        """
+        with self._lock:
+            self._check_fork()
+            self._evict_idle_locked()
+
+    def idle_count(self, target=None):
+        with self._lock:
+            if target is not None:
+                return len(self._idle.get(as_endpoint(target), []))
+            return sum(len(conns) for conns in self._idle.values())
+
+    def close_all(self):
+        """
+        Close every pooled connection.
+        """
+        with self._lock:
+            for conns in self._idle.values():
+                for sock, _ in conns:
+                    sock.close()
+            self._idle = {}
+
+
+_default_pool = None
+_default_pool_lock = threading.Lock()
+
+
+def get_connection_pool():
+    """
+    Return the process-wide connection pool used by send_message_to_process.
+    """
+    global _default_pool
+    with _default_pool_lock:
+        if _default_pool is None:
+            _default_pool = ConnectionPool()
+            atexit.register(_default_pool.close_all)
+        return _default_pool
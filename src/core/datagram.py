@@ -0,0 +1,154 @@
+import asyncio
+import itertools
+import socket
+import struct
+import threading
+
+from .config import DATAGRAM_MAX_SIZE, DATAGRAM_SEQUENCE, DATAGRAM_BATCH_SIZE, LOG_RATE_LIMIT
+from .codec import decode_envelope
+from .endpoint import LOCALHOST
+from .logger import log_event, get_logger
+
+# Datagram header: magic, flags, sequence number (0 when sequencing is off)
+_HEADER = struct.Struct("!BBI")
+_MAGIC = 0xD7
+FLAG_SEQUENCED = 0x01
+
+log = get_logger()
+
+
+class DatagramTooLarge(ValueError):
+    """
+    Raised when a message does not fit in a single datagram.
+    """
+
+
+class DatagramSender:
+    """
+    Sends small, loss-tolerant messages (heartbeats, telemetry) over UDP.
+    One socket is shared for all destinations; each destination gets its own sequence.
+    """
+
+    def __init__(self, host=LOCALHOST, max_size=DATAGRAM_MAX_SIZE, sequenced=DATAGRAM_SEQUENCE):
+        self.host = host
+        self.max_size = max_size
+        self.sequenced = sequenced
+        self._sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._sequences = {}  # port -> itertools.count
+        self._lock = threading.Lock()
+
+    def send(self, port, payload):
+        """
+        Send one encoded envelope to `port`. Raises DatagramTooLarge if it does not fit.
+        """
+        size = _HEADER.size + len(payload)
+        if size > self.max_size:
+            raise DatagramTooLarge(f"Datagram of {size} bytes exceeds DATAGRAM_MAX_SIZE ({self.max_size})")
+        with self._lock:
+            if self.sequenced:
+                counter = self._sequences.setdefault(port, itertools.count(1))
+                header = _HEADER.pack(_MAGIC, FLAG_SEQUENCED, next(counter) & 0xFFFFFFFF)
+            else:
+                header = _HEADER.pack(_MAGIC, 0, 0)
+            self._sock.sendto(header + payload, (self.host, port))
+
+    def close(self):
+        self._sock.close()
+
+
+_default_sender = None
+_default_sender_lock = threading.Lock()
+
+
+def get_datagram_sender():
+    """
+    Return the process-wide sender used when USE_TCP is False.
+    """
+    global _default_sender
+    with _default_sender_lock:
+        if _default_sender is None:
+            _default_sender = DatagramSender()
+        return _default_sender
+
+
+class DatagramListener:
+    """
+    Receives datagrams on a UDP port and hands decoded envelopes to an Inbox.
+
+    asyncio's datagram transport reads a single datagram per readiness
+    callback, so the listener registers its own reader that drains up to
+    `batch_size` datagrams per event-loop wakeup.
+    """
+
+    def __init__(self, port, inbox, host=LOCALHOST, batch_size=DATAGRAM_BATCH_SIZE, max_size=DATAGRAM_MAX_SIZE):
+        self.port = port
+        self.inbox = inbox
+        self.host = host
+        self.batch_size = batch_size
+        self.max_size = max_size
+        self._sock = None
+        self._last_seq = {}  # sender address -> last sequence number seen
+        self.received = 0
+        self.lost = 0
+        self.reordered = 0
+        self.malformed = 0
+        self.wakeups = 0
+
+    def start(self):
+        self._sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._sock.setblocking(False)
+        self._sock.bind((self.host, self.port))
+        asyncio.get_running_loop().add_reader(self._sock.fileno(), self._read_ready)
+        log_event(f"Listening for datagrams on {self._sock.getsockname()}", port=self.port)
+
+    def close(self):
+        if self._sock is not None:
+            asyncio.get_running_loop().remove_reader(self._sock.fileno())
+            self._sock.close()
+            self._sock = None
+
+    def stats(self):
+        return {
+            "received": self.received,
+            "lost": self.lost,
+            "reordered": self.reordered,
+            "malformed": self.malformed,
+            "avg_batch": self.received / self.wakeups if self.wakeups else 0.0,
+        }
+
+    def _read_ready(self):
+        self.wakeups += 1
+        for _ in range(self.batch_size):
+            try:
+                data, addr = self._sock.recvfrom(self.max_size)
+            except (BlockingIOError, InterruptedError):
+                break
+            except OSError as e:
+                log.error("Datagram receive failed on port %s: %s", self.port, e, port=self.port, rate=LOG_RATE_LIMIT)
+                break
+            self._handle_datagram(data, addr)
+
+    def _handle_datagram(self, data, addr):
+        if len(data) < _HEADER.size:
+            self.malformed += 1
+            return
+        magic, flags, seq = _HEADER.unpack_from(data)
+        if magic != _MAGIC:
+            self.malformed += 1
+            return
+        self.received += 1
+
+        if flags & FLAG_SEQUENCED:
+            last = self._last_seq.get(addr)
+            if last is not None:
+                if seq > last + 1:
+                    self.lost += seq - last - 1
+                elif seq < last:
+                    # A datagram already counted as lost arrived late.
+                    self.reordered += 1
+                    self.lost = max(0, self.lost - 1)
+                    seq = last
+            self._last_seq[addr] = seq
+
+        envelope = decode_envelope(memoryview(data)[_HEADER.size:])
+        self.inbox.offer_nowait(envelope)
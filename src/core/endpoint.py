@@ -0,0 +1,79 @@
+import asyncio
+import os
+import socket
+from collections import namedtuple
+
+from .config import TRANSPORT, SOCKET_DIR, CONNECT_TIMEOUT
+
+# A process endpoint: its port identifies it, and `path` is set when it
+# listens on an AF_UNIX socket instead of loopback TCP.
+Endpoint = namedtuple("Endpoint", ["port", "path"])
+
+LOCALHOST = "127.0.0.1"
+
+
+def socket_path_for_port(port):
+    """
+    Path of the Unix socket a process with `port` listens on in "unix" mode.
+    """
+    return os.path.join(SOCKET_DIR, f"portpulse-{int(port)}.sock")
+
+
+def endpoint_for_port(port, transport=TRANSPORT):
+    """
+    Build the endpoint for `port` under the given transport ("tcp" or "unix").
+    """
+    if transport == "unix":
+        return Endpoint(int(port), socket_path_for_port(port))
+    if transport == "tcp":
+        return Endpoint(int(port), None)
+    raise ValueError(f"Unknown transport: {transport}")
+
+
+def as_endpoint(target):
+    """
+    Accept either an Endpoint or a bare port number.
+    """
+    if isinstance(target, Endpoint):
+        return target
+    return endpoint_for_port(target)
+
+
+def connect_endpoint(endpoint, host=LOCALHOST, timeout=CONNECT_TIMEOUT):
+    """
+    Open a blocking stream socket to `endpoint`.
+    """
+    if endpoint.path:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(timeout)
+        try:
+            sock.connect(endpoint.path)
+        except OSError:
+            sock.close()
+            raise
+        return sock
+    sock = socket.create_connection((host, endpoint.port), timeout=timeout)
+    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    return sock
+
+
+async def open_endpoint_connection(endpoint, host=LOCALHOST):
+    """
+    asyncio counterpart of connect_endpoint, returning (reader, writer).
+    """
+    if endpoint.path:
+        return await asyncio.open_unix_connection(endpoint.path)
+    return await asyncio.open_connection(host, endpoint.port)
+
+
+async def start_endpoint_server(endpoint, client_connected_cb, host=LOCALHOST):
+    """
+    Start an asyncio stream server listening on `endpoint`.
+    A stale socket file left by a dead process is removed first.
+    """
+    if endpoint.path:
+        os.makedirs(os.path.dirname(endpoint.path), exist_ok=True)
+        if os.path.exists(endpoint.path):
+            os.unlink(endpoint.path)
+        return await asyncio.start_unix_server(client_connected_cb, path=endpoint.path)
+    return await asyncio.start_server(client_connected_cb, host=host, port=endpoint.port)
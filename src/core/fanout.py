@@ -0,0 +1,126 @@
+import asyncio
+import time
+
+from .config import FANOUT_CONCURRENCY, FANOUT_TIMEOUT
+from .codec import Envelope, encode_envelope
+from .endpoint import open_endpoint_connection
+from .framing import encode_frame
+from .logger import log_event
+from .process_registry import get_registry
+
+
+class DeliveryResult:
+    """
+    Outcome of delivering one message to one target.
+    """
+
+    __slots__ = ("pid", "port", "delivered", "latency", "error")
+
+    def __init__(self, pid, port, delivered, latency, error=None):
+        self.pid = pid
+        self.port = port
+        self.delivered = delivered
+        self.latency = latency
+        self.error = error
+
+
+class FanoutReport:
+    """
+    Aggregated result of a fan-out: which targets got the message and how long each took.
+    """
+
+    def __init__(self, results, elapsed):
+        self.results = results
+        self.elapsed = elapsed
+
+    @property
+    def delivered(self):
+        return [r for r in self.results if r.delivered]
+
+    @property
+    def failed(self):
+        return [r for r in self.results if not r.delivered]
+
+    def summary(self):
+        return (f"{len(self.delivered)}/{len(self.results)} delivered, "
+                f"{len(self.failed)} failed in {self.elapsed * 1000:.1f} ms")
+
+
+async def _deliver(endpoint, frame):
+    reader, writer = await open_endpoint_connection(endpoint)
+    try:
+        writer.write(frame)
+        await writer.drain()
+    finally:
+        writer.close()
+        await writer.wait_closed()
+
+
+async def fan_out(targets, message, sender_pid=None,
+                  concurrency=FANOUT_CONCURRENCY, timeout=FANOUT_TIMEOUT):
+    """
+    Deliver `message` to every (pid, Endpoint) in `targets` concurrently.
+    At most `concurrency` deliveries are in flight, and each one is abandoned
+    after `timeout` seconds so a hung target cannot stall the others.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    payload = message.encode() if isinstance(message, str) else message
+
+    async def deliver_one(pid, endpoint):
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                frame = encode_frame(encode_envelope(Envelope(payload, sender_pid=sender_pid, destination=pid)))
+                await asyncio.wait_for(_deliver(endpoint, frame), timeout)
+                return DeliveryResult(pid, endpoint.port, True, time.perf_counter() - start)
+            except asyncio.TimeoutError:
+                return DeliveryResult(pid, endpoint.port, False, time.perf_counter() - start,
+                                      f"timed out after {timeout}s")
+            except OSError as e:
+                return DeliveryResult(pid, endpoint.port, False, time.perf_counter() - start, str(e))
+            except Exception as e:
+                # E.g. FrameError for an oversized message: one failed target must not lose the whole report
+                return DeliveryResult(pid, endpoint.port, False, time.perf_counter() - start,
+                                      f"{type(e).__name__}: {e}")
+
+    start = time.perf_counter()
+    results = await asyncio.gather(*(deliver_one(pid, endpoint) for pid, endpoint in targets))
+    report = FanoutReport(list(results), time.perf_counter() - start)
+    log_event(f"Fan-out from sender_pid {sender_pid}: {report.summary()}",
+              level="INFO" if not report.failed else "ERROR")
+    return report
+
+
+def broadcast_targets(parent_pid=0, registry=None):
+    """
+    Resolve broadcast targets: every registered process except services
+    (such as the broker) when `parent_pid` is 0, otherwise the children of `parent_pid`.
+    """
+    registry = registry or get_registry()
+    if parent_pid == 0:
+        processes = registry.list_all_processes()
+        services = set(processes["services"].values())
+        # A process may be mapped to several ports; it still gets the message once.
+        pids = [pid for pid in dict.fromkeys(processes["port_to_pid"].values()) if pid not in services]
+    else:
+        pids = registry.get_children_by_parent(parent_pid)
+
+    targets = []
+    for pid in pids:
+        endpoint = registry.get_endpoint_by_pid(pid)
+        if endpoint is not None:
+            targets.append((int(pid), endpoint))
+    return targets
+
+
+async def broadcast_async(message, parent_pid=0, sender_pid=None,
+                          concurrency=FANOUT_CONCURRENCY, timeout=FANOUT_TIMEOUT):
+    return await fan_out(broadcast_targets(parent_pid), message, sender_pid, concurrency, timeout)
+
+
+def broadcast(message, parent_pid=0, sender_pid=None,
+              concurrency=FANOUT_CONCURRENCY, timeout=FANOUT_TIMEOUT):
+    """
+    Blocking broadcast for callers without an event loop (CLI, dashboard threads).
+    """
+    return asyncio.run(broadcast_async(message, parent_pid, sender_pid, concurrency, timeout))
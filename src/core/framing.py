@@ -0,0 +1,176 @@
+import struct
+
+from .config import BUFFER_SIZE, MAX_FRAME_SIZE, CONNECT_TIMEOUT
+from . import compression  # Only the module: compression uses this module's FrameError in turn
+
+# Frame header: message type (1 byte), flags (1 byte), payload length (4 bytes)
+HEADER = struct.Struct("!BBI")
+HEADER_SIZE = HEADER.size
+
+# === Message types ===
+MSG_DATA = 0x01      # Fire-and-forget message
+MSG_REQUEST = 0x02   # Request expecting a reply with the same message id
+MSG_REPLY = 0x03     # Successful reply to a request
+MSG_ERROR = 0x04     # Request handler raised; payload is the error text
+MSG_CANCEL = 0x05    # Caller gave up on a request; payload envelope carries its id
+MSG_BUSY = 0x06      # Receiver's inbox is full; request was not accepted
+MSG_RETRY = 0x07     # Receiver's inbox is full; payload is the suggested retry delay in ms
+MSG_SUBSCRIBE = 0x08    # Broker: payload is a topic pattern
+MSG_UNSUBSCRIBE = 0x09  # Broker: payload is a topic pattern
+MSG_PUBLISH = 0x0A      # Broker: payload is a length-prefixed topic followed by an envelope
+MSG_HELLO = 0x0B        # Compression negotiation: offered algorithms, answered with the chosen one
+MSG_BATCH = 0x0C        # Several length-prefixed envelopes coalesced into one frame
+
+
+class FrameError(Exception):
+    """
+    Raised when a peer sends a malformed or oversized frame.
+    """
+
+
+def encode_frame(payload, msg_type=MSG_DATA, flags=0):
+    """
+    Prefix `payload` with a frame header.
+    """
+    if len(payload) > MAX_FRAME_SIZE:
+        raise FrameError(f"Frame of {len(payload)} bytes exceeds MAX_FRAME_SIZE ({MAX_FRAME_SIZE})")
+    return HEADER.pack(msg_type, flags, len(payload)) + payload
+
+
+class FrameDecoder:
+    """
+    Incremental decoder that turns a byte stream into (msg_type, flags, payload) frames.
+    Feed it whatever the socket returns; partial frames are kept until complete.
+    """
+
+    def __init__(self, max_frame_size=MAX_FRAME_SIZE):
+        self.max_frame_size = max_frame_size
+        self._buffer = bytearray()
+
+    def feed(self, data):
+        """
+        Add received bytes and return every frame completed by them.
+        """
+        self._buffer += data
+        frames = []
+        offset = 0
+        buffered = len(self._buffer)
+        while buffered - offset >= HEADER_SIZE:
+            msg_type, flags, length = HEADER.unpack_from(self._buffer, offset)
+            if length > self.max_frame_size:
+                raise FrameError(f"Incoming frame of {length} bytes exceeds limit ({self.max_frame_size})")
+            end = offset + HEADER_SIZE + length
+            if end > buffered:
+                break
+            frames.append((msg_type, flags, bytes(self._buffer[offset + HEADER_SIZE:end])))
+            offset = end
+        if offset:
+            del self._buffer[:offset]
+        return frames
+
+    @property
+    def pending(self):
+        """
+        Number of buffered bytes that do not yet form a complete frame.
+        """
+        return len(self._buffer)
+
+
+async def iter_frames(reader, chunk_size=BUFFER_SIZE, stats=None):
+    """
+    Yield frames from an asyncio StreamReader until the peer closes the connection.
+    `chunk_size` is only a read size hint; frames of any size up to MAX_FRAME_SIZE are reassembled.
+    Compressed payloads are decompressed transparently (timed into `stats` if given).
+    """
+    decoder = FrameDecoder()
+    while True:
+        data = await reader.read(chunk_size)
+        if not data:
+            if decoder.pending:
+                raise FrameError(f"Connection closed with {decoder.pending} bytes of a partial frame")
+            return
+        for msg_type, flags, payload in decoder.feed(data):
+            yield msg_type, flags, compression.decompress_payload(payload, flags, stats)
+
+
+async def read_frame(reader):
+    """
+    Read exactly one frame from an asyncio StreamReader. Returns None on a clean EOF.
+    """
+    header = await reader.read(HEADER_SIZE)
+    if not header:
+        return None
+    if len(header) < HEADER_SIZE:
+        header += await reader.readexactly(HEADER_SIZE - len(header))
+    msg_type, flags, length = HEADER.unpack(header)
+    if length > MAX_FRAME_SIZE:
+        raise FrameError(f"Incoming frame of {length} bytes exceeds limit ({MAX_FRAME_SIZE})")
+    payload = await reader.readexactly(length) if length else b""
+    return msg_type, flags, compression.decompress_payload(payload, flags)
+
+
+def _recv_exactly(sock, size):
+    chunks = []
+    remaining = size
+    while remaining:
+        chunk = sock.recv(min(remaining, BUFFER_SIZE))
+        if not chunk:
+            raise ConnectionResetError("Peer closed the connection mid-frame")
+        chunks.append(chunk)
+        remaining -= len(chunk)
+    return b"".join(chunks)
+
+
+def recv_frame(sock):
+    """
+    Blocking counterpart of read_frame for plain sockets. Returns None on a clean EOF.
+    """
+    first = sock.recv(HEADER_SIZE)
+    if not first:
+        return None
+    header = first if len(first) == HEADER_SIZE else first + _recv_exactly(sock, HEADER_SIZE - len(first))
+    msg_type, flags, length = HEADER.unpack(header)
+    if length > MAX_FRAME_SIZE:
+        raise FrameError(f"Incoming frame of {length} bytes exceeds limit ({MAX_FRAME_SIZE})")
+    payload = _recv_exactly(sock, length) if length else b""
+    return msg_type, flags, compression.decompress_payload(payload, flags)
+
+
+def negotiate_compression(sock, algorithm, timeout=CONNECT_TIMEOUT):
+    """
+    Client side of the per-connection handshake over a blocking socket.
+    Offers `algorithm` and returns the one the receiver accepted ("" for none).
+    """
+    sock.sendall(encode_frame(algorithm.encode(), MSG_HELLO))
+    previous = sock.gettimeout()
+    sock.settimeout(timeout)
+    try:
+        frame = recv_frame(sock)
+    finally:
+        sock.settimeout(previous)
+    if frame is None or frame[0] != MSG_HELLO:
+        raise FrameError("Peer did not answer the compression handshake")
+    return frame[2].decode()
+
+
+async def negotiate_compression_async(reader, writer, algorithm):
+    """
+    asyncio counterpart of negotiate_compression.
+    """
+    writer.write(encode_frame(algorithm.encode(), MSG_HELLO))
+    await writer.drain()
+    frame = await read_frame(reader)
+    if frame is None or frame[0] != MSG_HELLO:
+        raise FrameError("Peer did not answer the compression handshake")
+    return frame[2].decode()
+
+
+def hello_reply(payload):
+    """
+    Receiver side of the handshake: the HELLO frame answering an offer.
+    """
+    try:
+        offered = [name for name in payload.decode().split(",") if name]
+    except UnicodeDecodeError as e:
+        raise FrameError(f"Malformed compression offer: {e}") from None
+    return encode_frame(compression.choose_algorithm(offered).encode(), MSG_HELLO)
@@ -0,0 +1,168 @@
+import asyncio
+
+from .config import INBOX_CAPACITY, INBOX_WORKERS, INBOX_POLICY, INBOX_RETRY_AFTER, LOG_RATE_LIMIT
+from .codec import Envelope, encode_envelope
+from .framing import encode_frame, MSG_BUSY, MSG_RETRY
+from .logger import log_event, get_logger
+from .rpc import serve_request
+
+POLICIES = ("block", "busy", "retry")
+
+log = get_logger()
+
+
+class Inbox:
+    """
+    Bounded per-endpoint message queue drained by a pool of handler coroutines.
+
+    When the inbox is full the policy decides what happens to new messages:
+    - "block": the connection stops being read until there is room, so the
+      sender is slowed down by socket flow control.
+    - "busy":  requests get a BUSY reply; plain messages are dropped.
+    - "retry": requests get a RETRY reply carrying a delay; plain messages are dropped.
+    With more than one worker, messages may be handled out of order.
+    """
+
+    def __init__(self, handler_callback, capacity=INBOX_CAPACITY, workers=INBOX_WORKERS,
+                 policy=INBOX_POLICY, retry_after=INBOX_RETRY_AFTER):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown inbox policy: {policy}")
+        self.handler_callback = handler_callback
+        self.capacity = capacity
+        self.num_workers = workers
+        self.policy = policy
+        self.retry_after = retry_after
+        self._queue = asyncio.Queue(maxsize=capacity)
+        self._workers = []
+        self._queued = set()  # request message ids waiting in the queue
+        self._running = {}  # request message id -> task
+        self._cancelled = set()
+        self.accepted = 0
+        self.processed = 0
+        self.failed = 0
+        self.dropped = 0
+        self.rejected = 0
+
+    def start(self):
+        for _ in range(self.num_workers):
+            self._workers.append(asyncio.create_task(self._worker()))
+
+    async def stop(self):
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    @property
+    def depth(self):
+        return self._queue.qsize()
+
+    def stats(self):
+        return {
+            "depth": self.depth,
+            "capacity": self.capacity,
+            "policy": self.policy,
+            "accepted": self.accepted,
+            "processed": self.processed,
+            "failed": self.failed,
+            "dropped": self.dropped,
+            "rejected": self.rejected,
+        }
+
+    async def offer(self, envelope, writer=None):
+        """
+        Queue a message. `writer` is given for requests, so the reply (or a
+        BUSY/RETRY rejection) can be written back. Returns True if queued.
+        """
+        item = (envelope, writer)
+        if self.policy == "block":
+            await self._queue.put(item)
+            self._accept(item)
+            return True
+
+        try:
+            self._queue.put_nowait(item)
+            self._accept(item)
+            return True
+        except asyncio.QueueFull:
+            pass
+
+        if writer is None:
+            self.dropped += 1
+            if self.dropped == 1 or self.dropped % 1000 == 0:
+                log_event(f"Inbox full ({self.capacity}), {self.dropped} message(s) dropped so far", level="ERROR")
+            return False
+
+        self.rejected += 1
+        if self.policy == "busy":
+            msg_type, payload = MSG_BUSY, b""
+        else:
+            msg_type, payload = MSG_RETRY, str(int(self.retry_after * 1000)).encode()
+        reply = Envelope(payload, destination=envelope.sender_pid, message_id=envelope.message_id)
+        writer.write(encode_frame(encode_envelope(reply), msg_type))
+        await writer.drain()
+        return False
+
+    def offer_nowait(self, envelope):
+        """
+        Queue a plain message without waiting, whatever the policy; drops it if full.
+        Used for datagrams, which cannot be flow-controlled.
+        """
+        try:
+            self._queue.put_nowait((envelope, None))
+        except asyncio.QueueFull:
+            self.dropped += 1
+            return False
+        self.accepted += 1
+        return True
+
+    def _accept(self, item):
+        envelope, writer = item
+        self.accepted += 1
+        if writer is not None:
+            self._queued.add(envelope.message_id)
+
+    def cancel(self, message_id):
+        """
+        Cancel a queued or running request.
+        """
+        task = self._running.get(message_id)
+        if task:
+            task.cancel()
+        elif message_id in self._queued:
+            self._cancelled.add(message_id)
+
+    async def _worker(self):
+        while True:
+            envelope, writer = await self._queue.get()
+            if writer is not None:
+                self._queued.discard(envelope.message_id)
+            try:
+                if writer is None:
+                    if self.handler_callback:
+                        await self.handler_callback(envelope)
+                elif envelope.message_id in self._cancelled:
+                    self._cancelled.discard(envelope.message_id)
+                    continue
+                elif not writer.is_closing():
+                    task = asyncio.create_task(serve_request(envelope, writer, self.handler_callback))
+                    self._running[envelope.message_id] = task
+                    try:
+                        # wait() only raises if this worker itself is cancelled,
+                        # not when the request was cancelled by its caller.
+                        await asyncio.wait({task})
+                    except asyncio.CancelledError:
+                        task.cancel()
+                        raise
+                    finally:
+                        self._running.pop(envelope.message_id, None)
+                    if not task.cancelled() and task.exception():
+                        raise task.exception()
+                self.processed += 1
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.failed += 1
+                log.error("Inbox handler failed for message %s: %s", envelope.message_id, e, rate=LOG_RATE_LIMIT)
+            finally:
+                self._queue.task_done()
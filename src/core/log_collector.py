@@ -0,0 +1,216 @@
+import json
+import os
+import selectors
+import signal
+import socket
+import threading
+import time
+
+from .config import LOG_COLLECTOR_SOCKET
+from .log_writer import get_log_writer
+
+_READ_SIZE = 65536
+_MAX_LINE = 1024 * 1024
+_SEND_BUFFER = 1024 * 1024  # Room for bursts before records are dropped
+_RETRY_INTERVAL = 1.0  # Seconds before trying an unreachable collector again
+
+
+class CollectorClient:
+    """
+    Non-blocking sender of log records to the collector over a Unix stream
+    socket, one JSON line per record. send() returns False when the collector
+    is not running, so the caller can write the record itself. If the collector
+    is running but cannot keep up (the socket buffer is full), records are
+    dropped and counted rather than blocking the caller.
+    """
+
+    def __init__(self, socket_path=LOG_COLLECTOR_SOCKET, retry_interval=_RETRY_INTERVAL):
+        self.socket_path = socket_path
+        self.retry_interval = retry_interval
+        self._sock = None
+        self._pid = None
+        self._pending = b""  # Unsent tail of a partially written record
+        self._retry_at = 0.0
+        self._lock = threading.Lock()
+        self.sent = 0
+        self.dropped = 0
+        self.fallbacks = 0
+
+    def stats(self):
+        return {"sent": self.sent, "dropped": self.dropped, "fallbacks": self.fallbacks}
+
+    def _connect(self):
+        if self._sock is not None and self._pid == os.getpid():
+            return self._sock
+        # A connection inherited across fork() would interleave two processes' lines.
+        self._sock, self._pending = None, b""
+        if self._retry_at and time.monotonic() < self._retry_at:
+            return None
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            sock.connect(self.socket_path)
+        except OSError:
+            sock.close()
+            self._retry_at = time.monotonic() + self.retry_interval
+            return None
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, _SEND_BUFFER)
+        sock.setblocking(False)
+        self._sock, self._pid, self._retry_at = sock, os.getpid(), 0.0
+        return sock
+
+    def send(self, record):
+        line = (json.dumps(record) + "\n").encode()
+        with self._lock:
+            sock = self._connect()
+            if sock is None:
+                self.fallbacks += 1
+                return False
+            try:
+                if self._pending:
+                    self._pending = self._pending[sock.send(self._pending):]
+                    if self._pending:
+                        self.dropped += 1
+                        return True
+                sent = sock.send(line)
+            except BlockingIOError:
+                self.dropped += 1
+                return True
+            except OSError:
+                # The collector went away; write this record locally.
+                self._close_locked()
+                self._retry_at = time.monotonic() + self.retry_interval
+                self.fallbacks += 1
+                return False
+            self._pending = line[sent:]
+            self.sent += 1
+            return True
+
+    def _close_locked(self):
+        if self._sock is not None and self._pid == os.getpid():
+            self._sock.close()
+        self._sock, self._pending = None, b""
+
+    def close(self):
+        with self._lock:
+            self._close_locked()
+
+
+class LogCollector:
+    """
+    Receives log records from every PortPulse process on a Unix stream socket
+    and hands them to a single LogWriter, which writes them in batches.
+    When the writer falls behind, the collector stops reading, the socket
+    buffers fill up and senders start dropping instead of blocking.
+    """
+
+    def __init__(self, socket_path=LOG_COLLECTOR_SOCKET, writer=None):
+        self.socket_path = socket_path
+        self.writer = writer or get_log_writer()
+        self._server = None
+        self._selector = None
+        self._buffers = {}  # connection -> bytes of an incomplete line
+        self._stopped = threading.Event()
+        self.received = 0
+        self.malformed = 0
+
+    def stats(self):
+        stats = {"received": self.received, "malformed": self.malformed, "clients": len(self._buffers)}
+        stats.update(self.writer.stats())
+        return stats
+
+    def bind(self):
+        os.makedirs(os.path.dirname(self.socket_path), exist_ok=True)
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)  # Stale socket from a previous collector
+        self._server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._server.bind(self.socket_path)
+        self._server.listen(128)
+        self._server.setblocking(False)
+        self._selector = selectors.DefaultSelector()
+        self._selector.register(self._server, selectors.EVENT_READ)
+
+    def serve_forever(self):
+        if self._server is None:
+            self.bind()
+        try:
+            while not self._stopped.is_set():
+                self._poll(0.5)
+            # Keep what senders already wrote into their sockets.
+            while self._poll(0):
+                pass
+        finally:
+            for conn in list(self._buffers):
+                self._drop(conn)
+            self._selector.close()
+            self._server.close()
+            self._server = None
+            if os.path.exists(self.socket_path):
+                os.unlink(self.socket_path)
+            self.writer.flush()
+
+    def _poll(self, timeout):
+        events = self._selector.select(timeout)
+        for key, _ in events:
+            if key.fileobj is self._server:
+                self._accept()
+            else:
+                self._read(key.fileobj)
+        return bool(events)
+
+    def _accept(self):
+        try:
+            conn, _ = self._server.accept()
+        except BlockingIOError:
+            return
+        conn.setblocking(False)
+        self._buffers[conn] = b""
+        self._selector.register(conn, selectors.EVENT_READ)
+
+    def _read(self, conn):
+        try:
+            data = conn.recv(_READ_SIZE)
+        except BlockingIOError:
+            return
+        except OSError:
+            data = b""
+        if not data:
+            self._drop(conn)
+            return
+        buffered = self._buffers[conn] + data
+        *lines, rest = buffered.split(b"\n")
+        if len(rest) > _MAX_LINE:
+            self.malformed += 1
+            rest = b""
+        self._buffers[conn] = rest
+        records = [line for line in lines if line.startswith(b"{")]
+        self.malformed += len(lines) - len(records)
+        if records:
+            self.received += len(records)
+            self.writer.write(b"\n".join(records).decode(errors="replace").split("\n"), block=True)
+
+    def _drop(self, conn):
+        self._selector.unregister(conn)
+        conn.close()
+        if self._buffers.pop(conn, b""):
+            self.malformed += 1  # Connection closed in the middle of a record
+
+    def stop(self):
+        self._stopped.set()
+
+
+def run_log_collector(socket_path=LOG_COLLECTOR_SOCKET):
+    """
+    Run the collector in the current process until interrupted. Processes with
+    LOG_COLLECTOR enabled send their records here instead of appending to the log file themselves.
+    """
+    collector = LogCollector(socket_path)
+    collector.bind()
+    signal.signal(signal.SIGTERM, lambda signum, frame: collector.stop())
+    print(f"[LogCollector] PID: {os.getpid()} collecting on {socket_path}")
+    try:
+        collector.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        collector.writer.close()
+        print(f"[LogCollector] Stopped: {collector.stats()}")
@@ -0,0 +1,316 @@
+import datetime
+import gzip
+import json
+import os
+import re
+import threading
+import time
+
+import portalocker
+
+from .config import (LOG_FILE, LOG_SEGMENT_DIR, LOG_ROTATE_BYTES, LOG_ROTATE_INTERVAL,
+                     LOG_COMPRESS_SEGMENTS, LOG_INDEX_EVERY)
+
+_SEGMENT_NAME = re.compile(r"^logs-(\d+)\.json(\.gz)?$")
+_FINALIZE_GRACE = 5.0  # Seconds a closed segment is left alone for writers that have not yet reopened
+_CLOCK_SKEW = 5.0      # Records from different processes may be this far out of timestamp order
+
+
+def parse_timestamp(value):
+    """
+    Epoch seconds for a log timestamp, an ISO-8601 string (UTC unless it has an
+    offset) or a number.
+    """
+    if isinstance(value, (int, float)):
+        return float(value)
+    parsed = datetime.datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=datetime.timezone.utc)
+    return parsed.timestamp()
+
+
+def _record_time(line):
+    try:
+        return parse_timestamp(json.loads(line)["timestamp"])
+    except (ValueError, KeyError, TypeError):
+        return None
+
+
+class _MemberReader(gzip.GzipFile):
+    """
+    Reads a gzip file from the start of one of its members, closing the underlying file too.
+    """
+
+    def __init__(self, raw):
+        super().__init__(fileobj=raw, mode="rb")
+        self._raw = raw
+
+    def close(self):
+        try:
+            super().close()
+        finally:
+            self._raw.close()
+
+
+class Segment:
+    """
+    One closed log segment: logs-<seq>.json, gzipped once finalized, with a
+    sidecar logs-<seq>.idx.json holding its time range and sparse index.
+    A gzipped segment is a series of gzip members, one per index point, and
+    its index points hold compressed offsets ("members": true), so a reader
+    can start decompressing at any of them.
+    """
+
+    def __init__(self, directory, name):
+        match = _SEGMENT_NAME.match(name)
+        self.path = os.path.join(directory, name)
+        self.seq = int(match.group(1))
+        self.compressed = bool(match.group(2))
+        self.index_path = os.path.join(directory, f"logs-{match.group(1)}.idx.json")
+
+    def open(self, offset=0, index=None):
+        """
+        Open for reading from `offset`, 0 or an index point of `index`.
+        """
+        if not self.compressed:
+            f = open(self.path, "rb")
+            f.seek(offset)
+            return f
+        if index and index.get("members"):
+            raw = open(self.path, "rb")
+            raw.seek(offset)
+            return _MemberReader(raw)
+        f = gzip.open(self.path, "rb")
+        f.seek(offset)  # Indexed before segments were split into members: decompresses up to offset
+        return f
+
+    def load_index(self):
+        """
+        {"first", "last", "records", "points": [[timestamp, offset], ...]} or None if not indexed yet.
+        """
+        try:
+            with open(self.index_path) as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+
+class SegmentedLogStore:
+    """
+    The active log file (LOG_FILE) plus rotated, optionally compressed segments.
+
+    Rotation renames the active file into the segment directory; writers in
+    other processes notice the new inode and reopen LOG_FILE. A closed segment
+    is indexed (and compressed) by a background thread of the rotating process
+    once it has been closed for a few seconds, or by finalize_closed(). Queries
+    only read: they skip indexed segments whose time range does not overlap and
+    start reading at the nearest index point, in compressed segments too, and
+    read segments that are not finalized yet from the start.
+    """
+
+    def __init__(self, path=LOG_FILE, segment_dir=LOG_SEGMENT_DIR, rotate_bytes=LOG_ROTATE_BYTES,
+                 rotate_interval=LOG_ROTATE_INTERVAL, compress=LOG_COMPRESS_SEGMENTS,
+                 index_every=LOG_INDEX_EVERY, finalize_grace=_FINALIZE_GRACE):
+        self.path = path
+        self.segment_dir = segment_dir
+        self.rotate_bytes = rotate_bytes
+        self.rotate_interval = rotate_interval
+        self.compress = compress
+        self.index_every = index_every
+        self.finalize_grace = finalize_grace
+        self._started = {}  # inode of the active file -> timestamp of its first record
+        self._finalizer = None
+        self._finalizer_lock = threading.Lock()
+
+    def _lock(self, name=".rotate.lock"):
+        os.makedirs(self.segment_dir, exist_ok=True)
+        return portalocker.Lock(os.path.join(self.segment_dir, name), timeout=5)
+
+    def segments(self):
+        """
+        Closed segments, oldest first.
+        """
+        try:
+            names = os.listdir(self.segment_dir)
+        except FileNotFoundError:
+            return []
+        return sorted((Segment(self.segment_dir, n) for n in names if _SEGMENT_NAME.match(n)),
+                      key=lambda s: s.seq)
+
+    def should_rotate(self, f):
+        """
+        Whether the open active file `f` has reached the size or age limit.
+        """
+        stat = os.fstat(f.fileno())
+        if self.rotate_bytes and stat.st_size >= self.rotate_bytes:
+            return True
+        if self.rotate_interval and stat.st_size:
+            started = self._started.get(stat.st_ino)
+            if started is None:
+                with open(self.path, "rb") as head:
+                    started = _record_time(head.readline()) or time.time()
+                self._started = {stat.st_ino: started}
+            return time.time() - started >= self.rotate_interval
+        return False
+
+    def rotate(self, inode=None):
+        """
+        Move the active file into a new segment. With `inode`, only if the active
+        file is still that file (another process may have rotated it already).
+        Returns the new Segment, or None if nothing was rotated.
+        """
+        with self._lock():
+            try:
+                stat = os.stat(self.path)
+            except FileNotFoundError:
+                return None
+            if (inode is not None and stat.st_ino != inode) or not stat.st_size:
+                return None
+            existing = self.segments()
+            seq = existing[-1].seq + 1 if existing else 1
+            name = f"logs-{seq:06d}.json"
+            os.rename(self.path, os.path.join(self.segment_dir, name))
+        self.finalize_later()
+        return Segment(self.segment_dir, name)
+
+    def finalize_later(self, grace=None):
+        """
+        Finalize closed segments from a background thread, retrying every
+        `grace` seconds until none is left, so rotating never waits for it.
+        """
+        grace = self.finalize_grace if grace is None else grace
+        with self._finalizer_lock:
+            if self._finalizer is not None and self._finalizer.is_alive():
+                return
+            self._finalizer = threading.Thread(target=self._finalize_pending, args=(grace,),
+                                               name="portpulse-log-finalizer", daemon=True)
+            self._finalizer.start()
+
+    def _finalize_pending(self, grace):
+        pending = True
+        while pending:
+            time.sleep(grace)
+            try:
+                pending = self.finalize_closed(grace)
+            except portalocker.LockException:
+                pass  # Another process is finalizing; look again later
+            except Exception as e:
+                print(f"[Logger] Failed to finalize log segments in {self.segment_dir}: {e}")
+                return
+
+    def finalize_closed(self, grace=None):
+        """
+        Index, and compress if configured, closed segments nobody can still be writing to.
+        Returns how many segments were left for later because they were closed too recently.
+        Finalizers in different processes take turns; rotation does not wait for them.
+        """
+        grace = self.finalize_grace if grace is None else grace
+        with self._lock(".finalize.lock"):
+            now = time.time()
+            pending = 0
+            for segment in self.segments():
+                if segment.compressed or (segment.load_index() and not self.compress):
+                    continue
+                if now - os.stat(segment.path).st_mtime < grace:
+                    pending += 1
+                    continue
+                self._finalize(segment)
+            return pending
+
+    def _finalize(self, segment):
+        index = {"first": None, "last": None, "records": 0, "points": [], "members": self.compress}
+        # Compressing starts a new gzip member at every index point, whose offset is then a compressed one.
+        dst = open(segment.path + ".gz.tmp", "wb") if self.compress else None
+        member = None
+        try:
+            with open(segment.path, "rb") as f:
+                offset = 0
+                for line in f:
+                    ts = _record_time(line)
+                    if ts is not None:
+                        if index["records"] % self.index_every == 0:
+                            if member is not None:
+                                member.close()
+                                member = None
+                            index["points"].append([ts, dst.tell() if dst is not None else offset])
+                        index["first"] = ts if index["first"] is None else min(index["first"], ts)
+                        index["last"] = ts if index["last"] is None else max(index["last"], ts)
+                        index["records"] += 1
+                    offset += len(line)
+                    if dst is not None:
+                        if member is None:
+                            member = gzip.GzipFile(fileobj=dst, mode="wb", mtime=0)
+                        member.write(line)
+            if member is not None:
+                member.close()
+        finally:
+            if dst is not None:
+                dst.close()
+
+        if self.compress:
+            os.rename(segment.path + ".gz.tmp", segment.path + ".gz")
+        tmp = segment.index_path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(index, f)
+        os.rename(tmp, segment.index_path)
+        if self.compress:
+            os.unlink(segment.path)
+
+    def query(self, pid=None, port=None, level=None, since=None, until=None, limit=None):
+        """
+        Yield matching records, oldest first. `since`/`until` are epoch seconds
+        or ISO-8601 timestamps; only segments overlapping that range are read.
+        """
+        since = parse_timestamp(since) if since is not None else None
+        until = parse_timestamp(until) if until is not None else None
+
+        def matches(record):
+            return ((pid is None or record.get("pid") == pid)
+                    and (port is None or record.get("port") == port)
+                    and (level is None or record.get("level") == level))
+
+        count = 0
+        sources = [(segment, segment.load_index()) for segment in self.segments()]
+        sources.append((None, None))  # The active file
+        for segment, index in sources:
+            if index and index["records"]:
+                if since is not None and index["last"] < since:
+                    continue
+                if until is not None and index["first"] > until:
+                    continue
+            offset = 0
+            if index and since is not None:
+                for ts, point in index["points"]:
+                    if ts > since - _CLOCK_SKEW:
+                        break
+                    offset = point
+            try:
+                f = segment.open(offset, index) if segment else open(self.path, "rb")
+            except FileNotFoundError:
+                if segment is None or segment.compressed:
+                    continue
+                # Compressed since it was listed: read the compressed copy from the start.
+                try:
+                    f = Segment(self.segment_dir, os.path.basename(segment.path) + ".gz").open()
+                except FileNotFoundError:
+                    continue
+            with f:
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        break  # Record still being written
+                    try:
+                        record = json.loads(line)
+                        ts = parse_timestamp(record["timestamp"])
+                    except (ValueError, KeyError, TypeError):
+                        continue
+                    if until is not None and ts > until:
+                        if ts > until + _CLOCK_SKEW:
+                            return
+                        continue
+                    if since is not None and ts < since:
+                        continue
+                    if matches(record):
+                        yield record
+                        count += 1
+                        if limit is not None and count >= limit:
+                            return
@@ -0,0 +1,287 @@
+import atexit
+import json
+import multiprocessing.util
+import os
+import queue
+import signal
+import sys
+import threading
+import time
+
+from .config import (LOG_FILE, LOG_QUEUE_SIZE, LOG_BATCH_SIZE, LOG_DURABILITY, LOG_FSYNC_RECORDS,
+                     LOG_FSYNC_INTERVAL_MS)
+from .log_store import SegmentedLogStore
+
+DURABILITY_POLICIES = ("records", "interval", "never")
+FLUSH_SIGNALS = (signal.SIGTERM, signal.SIGHUP)
+
+
+class _FlushRequest:
+    def __init__(self):
+        self.done = threading.Event()
+
+
+class LogWriter:
+    """
+    Background writer for structured log records.
+
+    write() only enqueues the record; a writer thread keeps the log file open,
+    writes whatever has accumulated in one batch and fsyncs according to
+    `durability`:
+    - "records":  after every `fsync_records` records
+    - "interval": at most every `fsync_interval_ms` milliseconds while records arrive
+    - "never":    leave it to the OS (data is still flushed after every batch)
+    When the queue is full, new records are dropped and counted.
+    With a `store`, the file is rotated into segments when it reaches the
+    store's size or age limit (the default store for LOG_FILE uses LOG_ROTATE_*).
+    """
+
+    def __init__(self, path=LOG_FILE, queue_size=LOG_QUEUE_SIZE, batch_size=LOG_BATCH_SIZE,
+                 durability=LOG_DURABILITY, fsync_records=LOG_FSYNC_RECORDS,
+                 fsync_interval_ms=LOG_FSYNC_INTERVAL_MS, store=None):
+        if durability not in DURABILITY_POLICIES:
+            raise ValueError(f"Unknown log durability policy: {durability}")
+        self.path = path
+        self.batch_size = batch_size
+        self.durability = durability
+        self.fsync_records = fsync_records
+        self.fsync_interval = fsync_interval_ms / 1000
+        self.store = store if store is not None or path != LOG_FILE else SegmentedLogStore(path)
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._thread = None
+        self._lock = threading.Lock()
+        self._file = None
+        self._unsynced = 0
+        self._last_fsync = time.monotonic()
+        self.written = 0
+        self.dropped = 0
+        self.fsyncs = 0
+        self.errors = 0
+        self.rotations = 0
+
+    def stats(self):
+        return {
+            "queue_depth": self._queue.qsize(),
+            "written": self.written,
+            "dropped": self.dropped,
+            "fsyncs": self.fsyncs,
+            "errors": self.errors,
+            "rotations": self.rotations,
+        }
+
+    def start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="portpulse-log-writer", daemon=True)
+                self._thread.start()
+
+    def write(self, record, block=False):
+        """
+        Queue a record: a JSON-serialisable dict, an already serialised JSON line, or a list of such lines.
+        Without `block`, returns False and counts the record as dropped if the queue is full.
+        """
+        if self._thread is None:
+            self.start()
+        try:
+            self._queue.put(record, block=block)
+            return True
+        except queue.Full:
+            self.dropped += 1
+            return False
+
+    def flush(self, timeout=5):
+        """
+        Wait until every record queued so far is written and fsynced
+        (unless durability is "never"). Returns False on timeout.
+        """
+        if self._thread is None or not self._thread.is_alive():
+            return True
+        request = _FlushRequest()
+        try:
+            self._queue.put(request, timeout=timeout)
+        except queue.Full:
+            return False
+        return request.done.wait(timeout)
+
+    def close(self, timeout=5):
+        """
+        Flush and stop the writer thread.
+        """
+        if self._thread is None:
+            return
+        self.flush(timeout)
+        try:
+            self._queue.put(None, timeout=timeout)
+        except queue.Full:
+            return
+        self._thread.join(timeout)
+        self._thread = None
+
+    def _open(self):
+        if self._file is not None and self.store is not None:
+            # Another process may have rotated the file away from under us.
+            try:
+                rotated = os.stat(self.path).st_ino != os.fstat(self._file.fileno()).st_ino
+            except FileNotFoundError:
+                rotated = True
+            if rotated:
+                self._close_file()
+        if self._file is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self._file = open(self.path, "a")
+        return self._file
+
+    def _close_file(self):
+        self._sync_safely(force=True)
+        self._file.close()
+        self._file = None
+
+    def _maybe_rotate(self):
+        if self.store is None or not self.store.should_rotate(self._file):
+            return
+        inode = os.fstat(self._file.fileno()).st_ino
+        self._close_file()
+        if self.store.rotate(inode) is not None:
+            self.rotations += 1
+
+    def _fsync_due(self, now):
+        if not self._unsynced or self.durability == "never":
+            return False
+        if self.durability == "records":
+            return self._unsynced >= self.fsync_records
+        return now - self._last_fsync >= self.fsync_interval
+
+    def _fsync(self):
+        if self._file is not None and self._unsynced:
+            os.fsync(self._file.fileno())
+            self.fsyncs += 1
+        self._unsynced = 0
+        self._last_fsync = time.monotonic()
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            timeout = None
+            if self._unsynced and self.durability == "interval":
+                timeout = max(0.0, self._last_fsync + self.fsync_interval - time.monotonic())
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                self._sync_safely()
+                continue
+
+            lines, flushes = [], []
+            while True:
+                if item is None:
+                    stopping = True
+                elif isinstance(item, _FlushRequest):
+                    flushes.append(item)
+                elif isinstance(item, str):
+                    lines.append(item)
+                elif isinstance(item, list):
+                    lines.extend(item)
+                else:
+                    lines.append(json.dumps(item))
+                if stopping or len(lines) >= self.batch_size:
+                    break
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+
+            if lines:
+                self._write_lines(lines)
+            if flushes or stopping:
+                self._sync_safely(force=True)
+            elif self._fsync_due(time.monotonic()):
+                self._sync_safely()
+            for request in flushes:
+                request.done.set()
+
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _write_lines(self, lines):
+        try:
+            f = self._open()
+            f.write("\n".join(lines) + "\n")
+            f.flush()
+            self.written += len(lines)
+            self._unsynced += len(lines)
+            self._maybe_rotate()
+        except Exception as e:
+            self.errors += 1
+            print(f"[Logger] Failed to write to {self.path}: {e}")
+
+    def _sync_safely(self, force=False):
+        if force and self.durability == "never":
+            return
+        try:
+            self._fsync()
+        except OSError as e:
+            self.errors += 1
+            print(f"[Logger] Failed to fsync {self.path}: {e}")
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_log_writer():
+    """
+    Return the process-wide log writer. It is flushed at interpreter exit,
+    when a multiprocessing child finishes, and on SIGTERM/SIGHUP.
+    """
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = LogWriter()
+            # atexit runs handlers in reverse order: the signal is re-raised after close().
+            atexit.register(_reraise_exit_signal)
+            atexit.register(_writer.close)
+            # multiprocessing children leave through os._exit(), which skips atexit.
+            multiprocessing.util.Finalize(_writer, _writer.close, exitpriority=-100)
+            _install_signal_flush()
+        return _writer
+
+
+def _install_signal_flush():
+    """
+    Turn signals that would otherwise kill the process without running exit
+    handlers into a normal exit, so the atexit/Finalize close() drains the
+    writer. Handlers installed by the application are left alone.
+    """
+    if threading.current_thread() is not threading.main_thread():
+        return
+    for signum in FLUSH_SIGNALS:
+        if signal.getsignal(signum) == signal.SIG_DFL:
+            signal.signal(signum, _exit_on_signal)
+
+
+_exit_signal = None
+
+
+def _exit_on_signal(signum, frame):
+    # The interrupted code may hold the writer's queue lock, so nothing here
+    # touches the writer: unwinding releases it and the exit handlers flush.
+    global _exit_signal
+    _exit_signal = signum
+    signal.signal(signum, signal.SIG_DFL)
+    sys.exit(128 + signum)
+
+
+def _reraise_exit_signal():
+    # Die by the signal after all, so the parent sees how the process ended.
+    if _exit_signal is not None:
+        os.kill(os.getpid(), _exit_signal)
+
+
+def _reset_after_fork():
+    # The writer thread and the queue's lock belong to the parent.
+    global _writer, _writer_lock
+    _writer = None
+    _writer_lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
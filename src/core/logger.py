@@ -1,7 +1,25 @@
 import os
+import sys
 import json
+import time
 import datetime
-from .config import LOG_DIR, LOG_FILE, LOG_LEVEL
+import threading
+from .config import LOG_DIR, LOG_FILE, LOG_LEVEL, LOG_COLLECTOR
+from .log_writer import get_log_writer
+from .log_collector import CollectorClient
+
+_collector_client = None
+_collector_lock = threading.Lock()
+
+def get_collector_client():
+    """
+    Returns the process-wide client of the log collector (used when LOG_COLLECTOR is enabled).
+    """
+    global _collector_client
+    with _collector_lock:
+        if _collector_client is None:
+            _collector_client = CollectorClient()
+        return _collector_client
 
 '''
 def ensure_log_dir():
@@ -14,10 +32,32 @@ def ensure_log_dir():
     except Exception as e:
         print(f"[Logger] Failed to create log directory {LOG_DIR}: {e}")
 '''
-def log_event(message: str, pid: int = None, port: int = None, level: str = LOG_LEVEL):
+LEVELS = {"DEBUG": 10, "INFO": 20, "WARNING": 30, "ERROR": 40}
+_threshold = LEVELS.get(LOG_LEVEL, LEVELS["INFO"])
+
+def set_log_level(level):
+    """
+    Changes the minimum level written by this process.
+    """
+    global _threshold
+    _threshold = LEVELS[level.upper()]
+
+def is_enabled(level):
     """
-    Appends a structured log entry to the log file.
+    Whether records at `level` are written; unknown levels always are.
     """
+    return LEVELS.get(level, LEVELS["ERROR"]) >= _threshold
+
+def log_event(message: str, pid: int = None, port: int = None, level: str = "INFO"):
+    """
+    Queues a structured log entry for the background log writer, which
+    appends it to the log file (see LOG_DURABILITY in config.py).
+    With LOG_COLLECTOR enabled the entry goes to the log collector process
+    instead, falling back to the local writer when no collector is running.
+    Entries below LOG_LEVEL are discarded.
+    """
+    if LEVELS.get(level, LEVELS["ERROR"]) < _threshold:
+        return
     log_entry = {
         "timestamp": datetime.datetime.utcnow().isoformat() + "Z",
         "pid": pid or os.getpid(),
@@ -26,38 +66,203 @@ def log_event(message: str, pid: int = None, port: int = None, level: str = LOG_
         "message": message
     }
 
-    try:
-        with open(LOG_FILE, "a") as f:
-            json.dump(log_entry, f)
-            f.write("\n")
-            f.flush()
-            os.fsync(f.fileno())
-    except Exception as e:
-        print(f"[Logger] Failed to write to {LOG_FILE}: {e}")
+    if LOG_COLLECTOR and get_collector_client().send(log_entry):
+        return
+    get_log_writer().write(log_entry)
 
-def read_latest_logs(n=50):
+class _CallSite:
     """
-    Reads the last n log entries.
+    Sampling counter and token bucket of one call site.
     """
-    if not os.path.exists(LOG_FILE):
-        print(f"[Logger] Log file {LOG_FILE} does not exist")
-        return []
+    __slots__ = ("calls", "tokens", "updated", "suppressed")
 
-    try:
-        with open(LOG_FILE, "r") as f:
-            lines = f.readlines()[-n:]
-    except Exception as e:
-        print(f"[Logger] Failed to read {LOG_FILE}: {e}")
-        return []
+    def __init__(self, rate):
+        self.calls = 0
+        self.tokens = rate
+        self.updated = time.monotonic()
+        self.suppressed = 0
+
+_call_sites = {}
+
+class Logger:
+    """
+    Leveled logging facade over log_event for hot paths.
+
+    Disabled levels return after one integer comparison. The message is
+    formatted (`message % args`, or `message()` if it is callable) only once
+    the record will be written. Per call site (or per `key`):
+    - `sample=N` writes 1 in N calls,
+    - `rate=R` allows R records per second (token bucket, bursts of up to R);
+      the next record written mentions how many were suppressed.
+    Counters are updated without a lock, so under heavy threading they are approximate.
+    """
+
+    def __init__(self, pid=None, port=None):
+        self.pid = pid
+        self.port = port
 
+    def debug(self, message, *args, **options):
+        if _threshold <= 10:
+            self._log("DEBUG", message, args, **options)
+
+    def info(self, message, *args, **options):
+        if _threshold <= 20:
+            self._log("INFO", message, args, **options)
+
+    def warning(self, message, *args, **options):
+        if _threshold <= 30:
+            self._log("WARNING", message, args, **options)
+
+    def error(self, message, *args, **options):
+        self._log("ERROR", message, args, **options)
+
+    def _log(self, level, message, args, sample=None, rate=None, key=None, pid=None, port=None):
+        suffix = ""
+        if sample or rate:
+            if key is None:
+                caller = sys._getframe(2)
+                key = (caller.f_code, caller.f_lineno)
+            site = _call_sites.get(key)
+            if site is None:
+                site = _call_sites[key] = _CallSite(rate or 0)
+            site.calls += 1
+            if sample and (site.calls - 1) % sample:
+                return
+            if rate:
+                now = time.monotonic()
+                site.tokens = min(rate, site.tokens + (now - site.updated) * rate)
+                site.updated = now
+                if site.tokens < 1:
+                    site.suppressed += 1
+                    return
+                site.tokens -= 1
+                if site.suppressed:
+                    suffix = f" ({site.suppressed} similar suppressed)"
+                    site.suppressed = 0
+            if sample and sample > 1:
+                suffix += f" [1 in {sample}]"
+
+        if callable(message):
+            message = message()
+        elif args:
+            message = message % args
+        log_event(message + suffix, pid=pid or self.pid, port=port or self.port, level=level)
+
+def get_logger(pid=None, port=None):
+    """
+    Returns a Logger whose records default to `pid` and `port`.
+    """
+    return Logger(pid, port)
+
+def flush_logs(timeout=5):
+    """
+    Blocks until every queued log entry has been written (and fsynced, unless LOG_DURABILITY is "never").
+    """
+    return get_log_writer().flush(timeout)
+
+def log_stats():
+    """
+    Queue depth and written/dropped counters of this process's log writer
+    (and of its collector client when LOG_COLLECTOR is enabled).
+    """
+    stats = get_log_writer().stats()
+    if LOG_COLLECTOR:
+        stats["collector"] = get_collector_client().stats()
+    return stats
+
+TAIL_BLOCK_SIZE = 8192
+
+def _parse_lines(lines):
     logs = []
     for line in lines:
+        if not line.strip():
+            continue
         try:
             logs.append(json.loads(line))
         except json.JSONDecodeError as e:
             print(f"[Logger] Invalid JSON in log file: {e}")
             continue
-    return logs[::-1]
+    return logs
+
+def _tail_lines(f, n, block_size=TAIL_BLOCK_SIZE):
+    """
+    Returns (last n complete lines oldest first, offset just past the last one),
+    reading the binary file `f` backwards in blocks, so the cost depends on n and not on the file size.
+    A trailing line without its newline (still being written) is left out.
+    """
+    end = f.seek(0, os.SEEK_END)
+    position, data = end, b""
+    complete_end = None
+    while position > 0:
+        step = min(block_size, position)
+        position -= step
+        f.seek(position)
+        data = f.read(step) + data
+        if complete_end is None:
+            newline = data.rfind(b"\n")
+            if newline == -1:
+                continue
+            complete_end = position + newline + 1
+        # n + 1 newlines in the window guarantee n complete lines after the first one.
+        if data.count(b"\n", 0, complete_end - position) > n:
+            break
+    if complete_end is None:
+        return [], 0
+    lines = data[:complete_end - position].splitlines()
+    return (lines[-n:] if n else []), complete_end
+
+def read_latest_logs(n=50, path=LOG_FILE):
+    """
+    Reads the last n log entries, newest first, without reading the whole file.
+    """
+    if not os.path.exists(path):
+        print(f"[Logger] Log file {path} does not exist")
+        return []
+
+    try:
+        with open(path, "rb") as f:
+            lines, _ = _tail_lines(f, n)
+    except Exception as e:
+        print(f"[Logger] Failed to read {path}: {e}")
+        return []
+
+    return _parse_lines(lines)[::-1]
+
+class LogFollower:
+    """
+    Incremental reader for the log file: each read_new() returns only the
+    entries appended since the previous call (oldest first). The first call
+    returns the last `initial` entries. A file that shrank or was replaced
+    (truncated or rotated) is read again from its start.
+    """
+
+    def __init__(self, path=LOG_FILE, initial=0):
+        self.path = path
+        self.initial = initial
+        self.offset = None
+        self._inode = None
+
+    def read_new(self):
+        try:
+            with open(self.path, "rb") as f:
+                stat = os.fstat(f.fileno())
+                if self.offset is None:
+                    lines, self.offset = _tail_lines(f, self.initial)
+                    self._inode = stat.st_ino
+                    return _parse_lines(lines)
+                if stat.st_ino != self._inode or stat.st_size < self.offset:
+                    self.offset, self._inode = 0, stat.st_ino
+                f.seek(self.offset)
+                data = f.read()
+        except FileNotFoundError:
+            return []
+        except Exception as e:
+            print(f"[Logger] Failed to read {self.path}: {e}")
+            return []
+
+        complete = data.rfind(b"\n") + 1  # Leave a partially written last line for next time
+        self.offset += complete
+        return _parse_lines(data[:complete].splitlines())
 
 def initialize_logger():
     """
@@ -1,48 +1,206 @@
 import asyncio
-from .logger import log_event
+import os
+import struct
+import weakref
+from .logger import log_event, get_logger
+from .framing import iter_frames, FrameError, hello_reply, MSG_DATA, MSG_REQUEST, MSG_CANCEL, MSG_HELLO, MSG_BATCH
+from .batching import BatchingSender, decode_batch
+from .client import AsyncPortPulseClient
+from .compression import get_compression_stats
+from .endpoint import LOCALHOST, endpoint_for_port, start_endpoint_server
+from .codec import Envelope, encode_envelope, decode_envelope
+from .inbox import Inbox
+from .datagram import DatagramListener, get_datagram_sender
+from .config import USE_TCP, COMPRESSION, LOG_MESSAGE_SAMPLE, LOG_RATE_LIMIT
+
+log = get_logger()
+
+def _decode(payload):
+    """
+    decode_envelope() for a received frame; a payload that is no usable envelope is a FrameError.
+    """
+    try:
+        return decode_envelope(payload)
+    except (struct.error, ValueError, TypeError) as e:
+        raise FrameError(f"Malformed envelope: {e!r}") from e
 
 class MessageQueue:
     """
-    Handles message passing between processes using TCP sockets.
+    Handles message passing between processes using TCP or Unix domain sockets
+    (selected by TRANSPORT in config.py). Every message travels as a length-prefixed frame, so one connection can
+    carry many messages of any size. Frame payloads are codec envelopes, and
+    handlers receive the decoded Envelope. For request frames, the handler's
+    return value is sent back as the reply on the same connection.
+    Each listening endpoint queues incoming messages in a bounded Inbox.
+    With USE_TCP set to False, messages travel as UDP datagrams instead
+    (fire-and-forget only; requests need a stream transport).
+    Stream senders may opt in to compression (COMPRESSION in config.py); the
+    algorithm is agreed per connection and receivers decompress transparently.
+    High-rate producers can use send_batched(), which coalesces messages for
+    the same destination into one frame; listeners unpack batches before
+    handing each message to the inbox.
+    Senders keep one persistent connection per destination and event loop
+    (see AsyncPortPulseClient) instead of connecting for every message.
     """
 
-    async def send_message(self, host, port, message):
+    def __init__(self):
+        self.inboxes = {}  # port -> Inbox of each listener started by this queue
+        self.datagram_listeners = {}  # port -> DatagramListener when USE_TCP is False
+        self.batcher = None  # BatchingSender, created on first send_batched()
+        self._clients = weakref.WeakKeyDictionary()  # event loop -> {(host, compression): AsyncPortPulseClient}
+
+    def inbox_stats(self, port):
+        """
+        Queue depth and drop counters for the listener on `port`.
+        """
+        inbox = self.inboxes.get(port)
+        return inbox.stats() if inbox else None
+
+    def client(self, host=LOCALHOST, compression=COMPRESSION):
+        """
+        The AsyncPortPulseClient this queue uses on the running event loop,
+        so repeated sends reuse one persistent connection per destination.
+        """
+        clients = self._clients.setdefault(asyncio.get_running_loop(), {})
+        client = clients.get((host, compression))
+        if client is None:
+            client = clients[(host, compression)] = AsyncPortPulseClient(host=host, compression=compression)
+        return client
+
+    async def close_connections(self):
+        """
+        Close the persistent connections opened on the running event loop.
+        """
+        clients = self._clients.pop(asyncio.get_running_loop(), {})
+        await asyncio.gather(*(client.close() for client in clients.values()))
+
+    async def send_message(self, host, port, message, sender_pid=None, compression=COMPRESSION):
+        if not USE_TCP:
+            try:
+                get_datagram_sender().send(port, encode_envelope(Envelope(message, sender_pid=sender_pid)))
+                log.info("Datagram sent to port %s: %s", port, message, port=port, sample=LOG_MESSAGE_SAMPLE)
+            except Exception as e:
+                log.error("Failed to send datagram to port %s: %s", port, e, port=port, rate=LOG_RATE_LIMIT)
+                raise
+            return
         try:
-            reader, writer = await asyncio.open_connection(host, port)
-            writer.write(message.encode())
-            await writer.drain()
-            writer.close()
-            await writer.wait_closed()
-            log_event(f"Message sent to port {port}: {message}", port=port)
+            await self.client(host, compression).send(endpoint_for_port(port), message, sender_pid)
+            log.info("Message sent to port %s: %s", port, message, port=port, sample=LOG_MESSAGE_SAMPLE)
+        except Exception as e:
+            log.error("Failed to send message to port %s: %s", port, e, port=port, rate=LOG_RATE_LIMIT)
+            raise
+
+    def batching_sender(self, **options):
+        """
+        The BatchingSender used by send_batched(). `options` (max_messages,
+        max_bytes, linger, compression) override the BATCH_* defaults when it is first created.
+        """
+        if self.batcher is None:
+            self.batcher = BatchingSender(**options)
+        return self.batcher
+
+    def send_batched(self, port, message, sender_pid=None):
+        """
+        Queue a message for `port` (or an Endpoint) to be sent in a batch; returns
+        without waiting for the network. Call flush_batches() to force delivery.
+        """
+        self.batching_sender().send(port, encode_envelope(Envelope(message, sender_pid=sender_pid)))
+
+    def flush_batches(self, timeout=None):
+        """
+        Send every message queued by send_batched() and wait until it is written.
+        """
+        return self.batcher.flush(timeout) if self.batcher else True
+
+    async def send_messages(self, host, port, messages, sender_pid=None):
+        """
+        Pipelines several messages over the persistent connection to `port`.
+        """
+        try:
+            await self.client(host).send_many(endpoint_for_port(port), messages, sender_pid)
+            log_event(f"{len(messages)} messages sent to port {port}", port=port)
         except Exception as e:
-            log_event(f"Failed to send message to port {port}: {e}", port=port, level="ERROR")
+            log.error("Failed to send messages to port %s: %s", port, e, port=port, rate=LOG_RATE_LIMIT)
             raise
 
-    async def start_message_listener(self, port, message_handler):
+    async def start_message_listener(self, port, message_handler, inbox=None):
         """
-        Starts a TCP server to receive messages on a given port.
-        `message_handler` is a callback function.
+        Starts a server to receive messages on a given port, or on the port's
+        Unix socket path when TRANSPORT is "unix".
+        `message_handler` is a callback function, run by the inbox workers.
+        Pass `inbox` to override the INBOX_* defaults from config.py.
         """
-        server = await asyncio.start_server(
-            lambda r, w: self._handle_client(r, w, message_handler),
-            host='127.0.0.1',
-            port=port
+        inbox = inbox or Inbox(message_handler)
+        inbox.start()
+        self.inboxes[port] = inbox
+        if not USE_TCP:
+            await self._serve_datagrams(port, inbox)
+            return
+
+        endpoint = endpoint_for_port(port)
+        server = await start_endpoint_server(
+            endpoint,
+            lambda r, w: self._handle_client(r, w, inbox, port)
         )
 
         addr = server.sockets[0].getsockname()
         log_event(f"Listening for messages on {addr}", port=port)
 
-        async with server:
-            await server.serve_forever()
-
-    async def _handle_client(self, reader, writer, handler_callback):
-        data = await reader.read(1024)
-        message = data.decode()
-        peername = writer.get_extra_info('peername')
-        log_event(f"Received message from {peername}: {message}")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            await inbox.stop()
+            if endpoint.path and os.path.exists(endpoint.path):
+                os.unlink(endpoint.path)
 
-        if handler_callback:
-            await handler_callback(message)
+    async def _serve_datagrams(self, port, inbox):
+        listener = DatagramListener(port, inbox)
+        listener.start()
+        self.datagram_listeners[port] = listener
+        try:
+            await asyncio.Future()  # Serve until cancelled
+        finally:
+            listener.close()
+            await inbox.stop()
 
-        writer.close()
-        await writer.wait_closed()
+    async def _handle_client(self, reader, writer, inbox, port=None):
+        """
+        Serves one connection until the peer closes it, queueing every message sent on it.
+        Requests are answered on this connection by the inbox workers, so one
+        connection can have many outstanding.
+        """
+        peername = writer.get_extra_info('peername') or writer.get_extra_info('sockname')
+        try:
+            stats = get_compression_stats(port) if port is not None else None
+            async for msg_type, flags, payload in iter_frames(reader, stats=stats):
+                if msg_type == MSG_DATA:
+                    envelope = _decode(payload)
+                    log.info("Received message from %s (sender_pid %s): %s", peername, envelope.sender_pid,
+                             envelope.text, sample=LOG_MESSAGE_SAMPLE)
+                    await inbox.offer(envelope)
+                elif msg_type == MSG_BATCH:
+                    bodies = decode_batch(payload)
+                    log.info("Received batch of %d messages from %s", len(bodies), peername, sample=LOG_MESSAGE_SAMPLE)
+                    for body in bodies:
+                        await inbox.offer(_decode(body))
+                elif msg_type == MSG_REQUEST:
+                    envelope = _decode(payload)
+                    log.info("Received request %s from %s (sender_pid %s)", envelope.message_id, peername,
+                             envelope.sender_pid, sample=LOG_MESSAGE_SAMPLE)
+                    await inbox.offer(envelope, writer)
+                elif msg_type == MSG_CANCEL:
+                    inbox.cancel(_decode(payload).message_id)
+                elif msg_type == MSG_HELLO:
+                    writer.write(hello_reply(payload))
+                    await writer.drain()
+                else:
+                    log.error("Ignoring frame of unknown type %s from %s", msg_type, peername, rate=LOG_RATE_LIMIT)
+        except (ConnectionResetError, FrameError) as e:
+            log.error("Connection from %s dropped: %s", peername, e, rate=LOG_RATE_LIMIT)
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionResetError:
+                pass
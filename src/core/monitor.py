@@ -1,7 +1,7 @@
 import os
 import time
 from src.core.logger import read_latest_logs
-from src.core.process_registry import ProcessRegistry
+from src.core.process_registry import get_registry
 from .config import MONITOR_REFRESH_RATE
 
 
@@ -12,7 +12,11 @@ class ProcessMonitor:
 
     def __init__(self, refresh_rate=MONITOR_REFRESH_RATE):
         self.refresh_rate = refresh_rate
-        self.registry = ProcessRegistry()
+
+    @property
+    def registry(self):
+        # Looked up on each use to follow a fallback from the registry daemon
+        return get_registry()
 
     def check_process_alive(self, pid):
         """
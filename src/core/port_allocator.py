@@ -1,24 +1,84 @@
+import mmap
 import socket
 import os
+import struct
+import time
+from collections import namedtuple
+from contextlib import contextmanager
+
 import portalocker  # Ensure this is installed: pip install portalocker
 
+from .config import PORT_LEASE_TTL, PORT_SWEEP_INTERVAL
+
+_MAGIC = b"PPB2"
+_HEADER = struct.Struct("!4sII")  # magic, next-fit cursor (the port to try next), time of the last sweep
+_BITMAP_BYTES = 65536 // 8       # One bit per TCP port, so allocators with different ranges can share a file
+_LEASE = struct.Struct("!II")    # holder pid (0: unknown), expiry in epoch seconds (0: none)
+_LEASES = _HEADER.size + _BITMAP_BYTES  # Offset of the lease table, one entry per port
+_SIZE = _LEASES + 65536 * _LEASE.size
+_V1_MAGIC, _V1_SIZE = b"PPB1", 8 + _BITMAP_BYTES  # Bitmap without leases of the previous version
+
+# A leased port: its holder, when the lease expires (0: never) and the
+# holder's state: "alive", "dead", "expired" or "unknown" (imported from
+# an older tracking file).
+Lease = namedtuple("Lease", ["port", "pid", "expires", "status"])
+
+
+def _live_pids():
+    """
+    PIDs of all running processes from a single /proc listing, or None without /proc.
+    """
+    try:
+        return {int(name) for name in os.listdir("/proc") if name.isdigit()}
+    except OSError:
+        return None
+
+
+def _is_alive(pid, live):
+    if live is not None:
+        return pid in live
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
 class PortAllocator:
     """
     Cross-platform port allocator that assigns and tracks ports across processes
     using file locking and availability checking.
+
+    Used ports are bits in a memory-mapped bitmap file, changed only under the
+    allocator lock. Allocation is next-fit: the search starts where the previous
+    one stopped and skips full bytes at once, and only the chosen candidate is
+    bind()-probed, so its cost does not grow as the range fills.
+
+    Every used port is leased to a holder PID, optionally until an expiry the
+    holder pushes back with renew(). Ports of holders that exited without
+    releasing them, or whose lease expired, are reclaimed by a sweep that runs
+    at most every `sweep_interval` seconds during allocation, whenever the
+    range is exhausted, and on reclaim(). The holders are checked against one
+    listing of /proc rather than one syscall per port.
     """
 
     def __init__(self, start_port=5000, end_port=6000,
                  lockfile='/tmp/port_allocator.lock',
-                 used_ports_file='/tmp/used_ports.txt'):
+                 used_ports_file='/tmp/used_ports.txt',
+                 bitmap_file='/tmp/used_ports.bitmap',
+                 lease_ttl=PORT_LEASE_TTL, sweep_interval=PORT_SWEEP_INTERVAL):
         self.start_port = start_port
         self.end_port = end_port
         self.lockfile = lockfile
-        self.used_ports_file = used_ports_file
+        self.used_ports_file = used_ports_file  # Tracking file of earlier versions, imported once
+        self.bitmap_file = bitmap_file
+        self.lease_ttl = lease_ttl
+        self.sweep_interval = sweep_interval
+        self._map = None
 
-        os.makedirs(os.path.dirname(self.used_ports_file), exist_ok=True)
-        if not os.path.exists(self.used_ports_file):
-            open(self.used_ports_file, 'w').close()
+        os.makedirs(os.path.dirname(self.bitmap_file), exist_ok=True)
 
     def is_port_available(self, port):
         """
@@ -37,50 +97,237 @@ class PortAllocator:
         Return the next available and unused port within the defined range.
         Locks the operation to prevent conflicts across processes.
         """
-        with portalocker.Lock(self.lockfile, timeout=5):
-            used_ports = self._read_used_ports()
-            for port in range(self.start_port, self.end_port):
-                if port not in used_ports and self.is_port_available(port):
-                    used_ports.add(port)
-                    self._write_used_ports(used_ports)
-                    return port
+        return self.get_free_ports(1)[0]
+
+    def get_free_ports(self, count, holder=None, ttl=None):
+        """
+        Allocate `count` ports under a single lock, e.g. for a parent and its children.
+        Either all of them are allocated or none (RuntimeError).
+        The ports are leased to `holder` (default: the calling process) for
+        `ttl` seconds (default: the allocator's lease_ttl; 0: no expiry).
+        """
+        holder = os.getpid() if holder is None else holder
+        ttl = self.lease_ttl if ttl is None else ttl
+        with self._locked() as bitmap:
+            now = int(time.time())
+            swept = False
+            if now - _HEADER.unpack_from(bitmap)[2] >= self.sweep_interval:
+                self._sweep(bitmap, now)
+                swept = True
+            ports = self._allocate(bitmap, count)
+            if ports is None and not swept and self._sweep(bitmap, now):
+                ports = self._allocate(bitmap, count)
+            if ports is not None:
+                for port in ports:
+                    _LEASE.pack_into(bitmap, _LEASES + port * _LEASE.size, holder, now + ttl if ttl else 0)
+                return ports
         raise RuntimeError("No available ports found in the defined range.")
 
+    def _allocate(self, bitmap, count):
+        """
+        Mark `count` free ports as used and return them, or None (marking nothing).
+        """
+        magic, cursor, swept = _HEADER.unpack_from(bitmap)
+        if not self.start_port <= cursor < self.end_port:
+            cursor = self.start_port
+        ports = []
+        # Next-fit: from the cursor to the end of the range, then wrap around to the cursor.
+        for port, end in ((cursor, self.end_port), (self.start_port, cursor)):
+            while len(ports) < count:
+                candidate = self._next_clear(bitmap, port, end)
+                if candidate is None:
+                    break
+                port = candidate + 1
+                # Taken by something outside the allocator: skip it, but leave it unmarked.
+                if self.is_port_available(candidate):
+                    self._set(bitmap, candidate, True)
+                    ports.append(candidate)
+            if len(ports) == count:
+                _HEADER.pack_into(bitmap, 0, magic, port if port < self.end_port else self.start_port, swept)
+                return ports
+        for port in ports:
+            self._set(bitmap, port, False)
+        return None
+
+    def assign_ports(self, holders):
+        """
+        Hand leases over to other processes, e.g. from a parent to the
+        children it started: `holders` maps each port to its new holder PID.
+        """
+        with self._locked() as bitmap:
+            for port, pid in holders.items():
+                if self._is_set(bitmap, port):
+                    offset = _LEASES + port * _LEASE.size
+                    _LEASE.pack_into(bitmap, offset, pid, _LEASE.unpack_from(bitmap, offset)[1])
+
+    def renew(self, ports, ttl=None):
+        """
+        Heartbeat: extend the leases on `ports` to `ttl` seconds from now.
+        """
+        ttl = self.lease_ttl if ttl is None else ttl
+        with self._locked() as bitmap:
+            expires = int(time.time()) + ttl if ttl else 0
+            for port in ports:
+                if self._is_set(bitmap, port):
+                    offset = _LEASES + port * _LEASE.size
+                    _LEASE.pack_into(bitmap, offset, _LEASE.unpack_from(bitmap, offset)[0], expires)
+
     def release_port(self, port):
         """
         Release a port from the used list so it can be reused later.
         """
+        with self._locked() as bitmap:
+            self._set(bitmap, port, False)
+            _LEASE.pack_into(bitmap, _LEASES + port * _LEASE.size, 0, 0)
+
+    def reclaim(self):
+        """
+        Sweep now: release every port (in any range) whose holder is gone or
+        whose lease expired, and return those ports.
+        """
+        with self._locked() as bitmap:
+            return self._sweep(bitmap, int(time.time()))
+
+    def used_ports(self):
+        """
+        Ports currently allocated within the defined range.
+        """
+        with self._locked() as bitmap:
+            return list(self._set_ports(bitmap, self.start_port, self.end_port))
+
+    def leases(self):
+        """
+        Leases on the ports of the defined range, with the state of their holders.
+        """
+        live = _live_pids()
+        with self._locked() as bitmap:
+            now = int(time.time())
+            leases = []
+            for port in self._set_ports(bitmap, self.start_port, self.end_port):
+                pid, expires = _LEASE.unpack_from(bitmap, _LEASES + port * _LEASE.size)
+                leases.append(Lease(port, pid, expires, self._status(pid, expires, now, live)))
+            return leases
+
+    @staticmethod
+    def _status(pid, expires, now, live):
+        if pid == 0:
+            return "unknown"
+        if expires and expires <= now:
+            return "expired"
+        return "alive" if _is_alive(pid, live) else "dead"
+
+    def _sweep(self, bitmap, now):
+        live = _live_pids()
+        reclaimed = []
+        for port in self._set_ports(bitmap, 0, 65536):
+            pid, expires = _LEASE.unpack_from(bitmap, _LEASES + port * _LEASE.size)
+            status = self._status(pid, expires, now, live)
+            # Imported ports have no holder to check; they are kept while something listens on them.
+            if status in ("dead", "expired") or (status == "unknown" and self.is_port_available(port)):
+                self._set(bitmap, port, False)
+                _LEASE.pack_into(bitmap, _LEASES + port * _LEASE.size, 0, 0)
+                reclaimed.append(port)
+        magic, cursor, _ = _HEADER.unpack_from(bitmap)
+        _HEADER.pack_into(bitmap, 0, magic, cursor, now)
+        return reclaimed
+
+    @contextmanager
+    def _locked(self):
         with portalocker.Lock(self.lockfile, timeout=5):
-            used_ports = self._read_used_ports()
-            if port in used_ports:
-                used_ports.remove(port)
-                self._write_used_ports(used_ports)
+            yield self._bitmap()
+
+    def _bitmap(self):
+        """
+        The shared bitmap, creating it (and importing the tracking file of an
+        older version) on first use. Only called with the lock held.
+        """
+        if self._map is not None:
+            return self._map
+        fd = os.open(self.bitmap_file, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            size = os.fstat(fd).st_size
+            if size != _SIZE:
+                previous = os.pread(fd, _V1_SIZE, 0) if size == _V1_SIZE else b""
+                os.ftruncate(fd, 0)
+                os.ftruncate(fd, _SIZE)
+                created = True
+            else:
+                created = False
+            bitmap = mmap.mmap(fd, _SIZE)
+        finally:
+            os.close(fd)
+        if created or bitmap[:4] != _MAGIC:
+            _HEADER.pack_into(bitmap, 0, _MAGIC, self.start_port, int(time.time()))
+            if created and previous[:4] == _V1_MAGIC:
+                # Same bit layout behind a shorter header; the holders were not recorded.
+                bitmap[_HEADER.size:_LEASES] = previous[8:]
+            else:
+                for port in self._read_used_ports():
+                    self._set(bitmap, port, True)
+        self._map = bitmap
+        return bitmap
+
+    @staticmethod
+    def _set(bitmap, port, used):
+        offset = _HEADER.size + (port >> 3)
+        if used:
+            bitmap[offset] |= 1 << (port & 7)
+        else:
+            bitmap[offset] &= ~(1 << (port & 7)) & 0xFF
+
+    @staticmethod
+    def _is_set(bitmap, port):
+        return bool(bitmap[_HEADER.size + (port >> 3)] & (1 << (port & 7)))
+
+    @staticmethod
+    def _set_ports(bitmap, start, end):
+        """
+        Ports in [start, end) whose bit is set, skipping empty bytes.
+        """
+        first = start >> 3
+        for i, byte in enumerate(bitmap[_HEADER.size + first:_HEADER.size + ((end - 1) >> 3) + 1]):
+            if byte:
+                base = (first + i) << 3
+                for bit in range(8):
+                    if byte >> bit & 1 and start <= base + bit < end:
+                        yield base + bit
+
+    @staticmethod
+    def _next_clear(bitmap, port, end):
+        """
+        First port in [port, end) whose bit is clear, or None.
+        """
+        last = _HEADER.size + ((end - 1) >> 3) + 1
+        while port < end:
+            offset = _HEADER.size + (port >> 3)
+            byte = bitmap[offset] | ((1 << (port & 7)) - 1)  # Ignore the bits below `port`
+            if byte != 0xFF:
+                found = (port & ~7) + (~byte & (byte + 1)).bit_length() - 1
+                return found if found < end else None
+            # Skip the following full bytes in one C-level scan.
+            following = bitmap[offset + 1:last]
+            full = len(following) - len(following.lstrip(b"\xff"))
+            port = ((port >> 3) + 1 + full) << 3
+        return None
 
     def _read_used_ports(self):
         """
-        Read the list of currently used ports from the tracking file.
+        Read the list of ports used according to the tracking file of earlier versions.
         """
         try:
             with open(self.used_ports_file, 'r') as f:
                 content = f.read().strip()
                 return set(map(int, content.split())) if content else set()
+        except FileNotFoundError:
+            return set()
         except Exception as e:
             print(f"[PortAllocator] Failed to read used ports: {e}")
             return set()
 
-    def _write_used_ports(self, ports):
-        """
-        Write the set of used ports back to the file.
-        """
-        try:
-            with open(self.used_ports_file, 'w') as f:
-                f.write(' '.join(map(str, sorted(ports))))
-        except Exception as e:
-            print(f"[PortAllocator] Failed to write used ports: {e}")
-
     def reset(self):
         """
-        (Optional) Reset the used ports file – useful for testing or dev.
+        (Optional) Reset the used ports bitmap – useful for testing or dev.
         """
-        with portalocker.Lock(self.lockfile, timeout=5):
-            open(self.used_ports_file, 'w').close()
+        with self._locked() as bitmap:
+            bitmap[:] = bytes(len(bitmap))
+            _HEADER.pack_into(bitmap, 0, _MAGIC, self.start_port, int(time.time()))
@@ -1,43 +1,94 @@
 import multiprocessing
 import os
-import socket
 import asyncio
 import signal
-import json
 import threading
 
 from .port_allocator import PortAllocator
-from .logger import log_event
+from .logger import log_event, get_logger
 from .monitor import ProcessMonitor
 from .message_handler import MessageQueue
-from .process_registry import ProcessRegistry
-
-def send_message_to_process(pid, message, sender_pid=None):
+from .process_registry import get_registry
+from .connection_pool import get_connection_pool
+from .codec import Envelope, encode_envelope
+from .client import get_client
+from .config import RPC_TIMEOUT, USE_TCP, COMPRESSION, LOG_MESSAGE_SAMPLE, LOG_RATE_LIMIT, PORT_LEASE_TTL
+from .datagram import get_datagram_sender
+from .endpoint import endpoint_for_port
+from .shm_transport import ShmChannel, ShmChannelFull, channel_for, register_channel, close_channels
+from .config import USE_SHM_CHANNELS
+
+log = get_logger()
+
+def send_message_to_process(pid, message, sender_pid=None, compression=COMPRESSION):
     """
-    Sends a message to a process using its registered port.
-    Looks up the port via the persistent ProcessRegistry.
+    Sends a message to a process using its registered endpoint.
+    Resolves the TCP port or Unix socket path through the process-wide registry cache
+    and reuses a pooled connection to it when one is open.
+    Payloads above COMPRESSION_THRESHOLD are compressed with `compression` if the receiver agrees.
+    With USE_TCP set to False the message is sent as a single UDP datagram.
+    A child spawned by this process with USE_SHM_CHANNELS enabled is sent to over
+    its shared-memory channel instead, falling back to the socket while the ring is full.
     """
-    registry = ProcessRegistry()
-    port = registry.get_port_by_pid(pid)
-
-    if port is None or port <= 0:
+    channel = channel_for(pid)
+    if channel is not None:
+        try:
+            channel.send(encode_envelope(Envelope(message, sender_pid=sender_pid, destination=pid)))
+            log.info("Message sent to PID %s over shared memory from sender_pid %s", pid, sender_pid,
+                     pid=pid, sample=LOG_MESSAGE_SAMPLE)
+            return True
+        except (ShmChannelFull, ValueError) as e:
+            log.warning("Shared-memory send to PID %s failed, using its socket: %s", pid, e,
+                        pid=pid, rate=LOG_RATE_LIMIT)
+
+    registry = get_registry()
+    endpoint = registry.get_endpoint_by_pid(pid)
+    port = endpoint.port if endpoint else None
+
+    if endpoint is None:
         print(f"[send_message_to_process] No valid port found for PID {pid}")
         log_event(f"No valid port found for PID {pid}", pid=pid, level="ERROR")
         return False
 
     try:
-        with socket.create_connection(("localhost", port), timeout=2) as sock:
-            payload = json.dumps({"message": message, "sender_pid": sender_pid}).encode()
-            sock.sendall(payload)
+        envelope = Envelope(message, sender_pid=sender_pid, destination=pid)
+        if USE_TCP:
+            get_connection_pool().send_frame(endpoint, encode_envelope(envelope), compression=compression)
+        else:
+            get_datagram_sender().send(port, encode_envelope(envelope))
         print(f"[send_message_to_process] Message sent to PID {pid} on port {port}")
-        log_event(f"Message sent to PID {pid} on port {port} from sender_pid {sender_pid}", 
-                 pid=pid, port=port)
+        log.info("Message sent to PID %s on port %s from sender_pid %s", pid, port, sender_pid,
+                 pid=pid, port=port, sample=LOG_MESSAGE_SAMPLE)
         return True
     except Exception as e:
         print(f"[send_message_to_process] Failed to send message to PID {pid} on port {port}: {e}")
-        log_event(f"Failed to send message to PID {pid}: {e}", pid=pid, port=port, level="ERROR")
+        log.error("Failed to send message to PID %s: %s", pid, e, pid=pid, port=port, rate=LOG_RATE_LIMIT)
         return False
 
+def send_request_to_process(pid, message, sender_pid=None, timeout=RPC_TIMEOUT):
+    """
+    Sends a request to a process and waits for the reply from its handler,
+    over the process-wide client's persistent connection.
+    Returns the reply Envelope, or None if the process could not be reached,
+    the handler failed, or no reply arrived within `timeout` seconds.
+    """
+    registry = get_registry()
+    endpoint = registry.get_endpoint_by_pid(pid)
+    if endpoint is None:
+        print(f"[send_request_to_process] No valid port found for PID {pid}")
+        log_event(f"No valid port found for PID {pid}", pid=pid, level="ERROR")
+        return None
+
+    try:
+        reply = get_client().request(pid, message, timeout=timeout, sender_pid=sender_pid)
+        log.info("Request to PID %s on port %s answered", pid, endpoint.port, pid=pid, port=endpoint.port,
+                 sample=LOG_MESSAGE_SAMPLE)
+        return reply
+    except Exception as e:
+        print(f"[send_request_to_process] Request to PID {pid} failed: {e!r}")
+        log.error("Request to PID %s failed: %r", pid, e, pid=pid, port=endpoint.port, rate=LOG_RATE_LIMIT)
+        return None
+
 class Handler:
     """
     Handler class fetches the number of parent and child processes.
@@ -61,10 +112,14 @@ class ProcessCreator:
         self.port_allocator = PortAllocator(start_port=5000)
         self.parent_processes = []
         self.process_registry = {}  # pid -> (process, port) for local tracking
-        self.registry = ProcessRegistry()  # Global persistent registry
         self.loop = None  # To store the asyncio event loop for signal handling
         self.terminate_event = threading.Event()  # For graceful termination in threads
 
+    @property
+    def registry(self):
+        # Global persistent registry, looked up on each use to follow a fallback from the daemon
+        return get_registry()
+
     def main_process(self):
         return os.getpid()
 
@@ -73,22 +128,46 @@ class ProcessCreator:
         Track each launched process for future reference or termination.
         Also register in the shared persistent registry.
         """
-        if proc_obj and hasattr(proc_obj, 'pid'):
-            self.process_registry[proc_obj.pid] = (proc_obj, port)
-            self.registry.register_process(proc_obj.pid, port or -1, parent_pid)
-            log_event(f"Registered process PID {proc_obj.pid} with port {port}", pid=proc_obj.pid, port=port)
-        else:
-            print(f"[ProcessCreator] Invalid process object for registration: {proc_obj}")
+        self.register_processes([(proc_obj, port, parent_pid)])
 
-    def child_handler(self, child_id, port):
+    def register_processes(self, processes):
+        """
+        Track and register (process, port, parent_pid) entries, writing them
+        to the shared registry in one transaction.
+        """
+        with self.registry.batch():
+            for proc_obj, port, parent_pid in processes:
+                if proc_obj and hasattr(proc_obj, 'pid'):
+                    self.process_registry[proc_obj.pid] = (proc_obj, port)
+                    socket_path = endpoint_for_port(port).path if port and port > 0 else None
+                    self.registry.register_process(proc_obj.pid, port or -1, parent_pid, socket_path=socket_path)
+                else:
+                    print(f"[ProcessCreator] Invalid process object for registration: {proc_obj}")
+        for proc_obj, port, _ in processes:
+            if proc_obj and hasattr(proc_obj, 'pid'):
+                log_event(f"Registered process PID {proc_obj.pid} with port {port}", pid=proc_obj.pid, port=port)
+
+    async def renew_port_leases(self, ports):
+        """
+        Heartbeat keeping this process's port leases from expiring (with PORT_LEASE_TTL set).
+        """
+        while not self.terminate_event.is_set():
+            await asyncio.sleep(PORT_LEASE_TTL / 3)
+            try:
+                self.port_allocator.renew(ports)
+            except Exception as e:
+                log.warning("Renewing port leases %s failed: %s", ports, e, rate=LOG_RATE_LIMIT)
+
+    def child_handler(self, child_id, port, shm_channel=None):
         """
         Function run inside each child process.
-        - Starts TCP listener
+        - Starts TCP listener (and the shared-memory listener if a channel is given)
         - Logs lifecycle events
         - Registers with monitor and registry
         - Runs until SIGINT or SIGTERM
         """
         pid = os.getpid()
+        close_channels()  # Inherited from the parent; only the parent writes to them
         log_event(f"Child-{child_id} started", pid=pid, port=port)
         print(f"[Child-{child_id}] PID: {pid} running on port {port}")
 
@@ -111,14 +190,21 @@ class ProcessCreator:
         signal.signal(signal.SIGTERM, safe_exit)
 
         async def handle_incoming(msg):
-            print(f"[Child-{child_id}] Received: {msg}")
-            log_event(f"Child-{child_id} handled msg: {msg}", pid=pid, port=port)
+            print(f"[Child-{child_id}] Received from PID {msg.sender_pid}: {msg.text}")
+            log.info("Child-%s handled msg %s from PID %s: %s", child_id, msg.message_id, msg.sender_pid, msg.text,
+                     pid=pid, port=port, sample=LOG_MESSAGE_SAMPLE)
+            return f"Child-{child_id} (PID {pid}) received: {msg.text}"
 
         async def run_child():
             queue = MessageQueue()
             try:
                 asyncio.create_task(queue.start_message_listener(port, handle_incoming))
                 log_event(f"Child-{child_id} started TCP listener on port {port}", pid=pid, port=port)
+                if shm_channel:
+                    asyncio.create_task(shm_channel.serve(handle_incoming))
+                    log_event(f"Child-{child_id} started shared-memory listener", pid=pid, port=port)
+                if PORT_LEASE_TTL:
+                    asyncio.create_task(self.renew_port_leases([port]))
                 while not self.terminate_event.is_set():
                     await asyncio.sleep(1)
             except Exception as e:
@@ -133,23 +219,25 @@ class ProcessCreator:
         finally:
             log_event(f"Child-{child_id} exiting", pid=pid, port=port)
             self.port_allocator.release_port(port)
+            if shm_channel:
+                shm_channel.close()
 
-    def parent_handler(self, parent_id, num_children):
+    def parent_handler(self, parent_id, num_children, parent_port=None):
         """
         Function run inside each parent process.
         - Spawns TCP listener for itself
         - Spawns multiple child processes
         - Registers all in monitor and registry
         - Runs until SIGINT or SIGTERM
+        `parent_port` is the port allocated (and registered) by the creating process;
+        one is allocated here if it is not given.
         """
         pid = os.getpid()
-        parent_port = self.port_allocator.get_next_free_port()
+        if parent_port is None:
+            parent_port = self.port_allocator.get_next_free_port()
         log_event(f"Parent-{parent_id} started", pid=pid, port=parent_port)
         print(f"[Parent-{parent_id}] PID: {pid} running on port {parent_port}")
 
-        # Update registry with parent's port
-        self.registry.register_process(pid, parent_port)
-
         try:
             monitor = ProcessMonitor()
             monitor.register_process(pid, parent_port, role=f"parent-{parent_id}")
@@ -164,6 +252,7 @@ class ProcessCreator:
                     proc.terminate()
                     log_event(f"Parent-{parent_id} terminated child", pid=child_pid)
             self.port_allocator.release_port(parent_port)
+            close_channels()
             if self.loop:
                 self.loop.stop()
                 self.loop.close()
@@ -173,25 +262,40 @@ class ProcessCreator:
         signal.signal(signal.SIGTERM, safe_exit)
 
         async def handle_incoming(msg):
-            print(f"[Parent-{parent_id}] Received: {msg}")
-            log_event(f"Parent-{parent_id} handled msg: {msg}", pid=pid, port=parent_port)
+            print(f"[Parent-{parent_id}] Received from PID {msg.sender_pid}: {msg.text}")
+            log.info("Parent-%s handled msg %s from PID %s: %s", parent_id, msg.message_id, msg.sender_pid, msg.text,
+                     pid=pid, port=parent_port, sample=LOG_MESSAGE_SAMPLE)
+            return f"Parent-{parent_id} (PID {pid}) received: {msg.text}"
 
         async def run_parent():
             queue = MessageQueue()
             try:
                 asyncio.create_task(queue.start_message_listener(port=parent_port, message_handler=handle_incoming))
                 log_event(f"Parent-{parent_id} started TCP listener on port {parent_port}", pid=pid, port=parent_port)
+                if PORT_LEASE_TTL:
+                    asyncio.create_task(self.renew_port_leases([parent_port]))
                 child_processes = []
-                for i in range(num_children):
-                    child_port = self.port_allocator.get_next_free_port()
+                child_ports = self.port_allocator.get_free_ports(num_children) if num_children else []
+                for i, child_port in enumerate(child_ports):
+                    # Created before the fork so that the child inherits both ends
+                    shm_channel = ShmChannel() if USE_SHM_CHANNELS else None
                     child = multiprocessing.Process(
-                        target=self.child_handler, args=(i + 1, child_port)
+                        target=self.child_handler, args=(i + 1, child_port, shm_channel)
                     )
                     child_processes.append((child, child_port))
                     child.start()
-                    self.register_process(child, child_port, parent_pid=pid)
+                    if shm_channel:
+                        register_channel(child.pid, shm_channel)
                     log_event(f"Parent-{parent_id} started child-{i+1} with PID {child.pid} on port {child_port}", pid=pid, port=child_port)
 
+                # The children hold their ports from now on, so a crashed child's port is reclaimed
+                self.port_allocator.assign_ports({child_port: child.pid for child, child_port in child_processes})
+
+                # Register the parent with its port and all of its children in one commit
+                with self.registry.batch():
+                    self.registry.register_process(pid, parent_port, socket_path=endpoint_for_port(parent_port).path)
+                    self.register_processes([(child, child_port, pid) for child, child_port in child_processes])
+
                 while not self.terminate_event.is_set():
                     await asyncio.sleep(1)
             except Exception as e:
@@ -206,6 +310,7 @@ class ProcessCreator:
         finally:
             log_event(f"Parent-{parent_id} exiting", pid=pid, port=parent_port)
             self.port_allocator.release_port(parent_port)
+            close_channels()
 
     def create_parent_processes(self):
         """
@@ -224,15 +329,18 @@ class ProcessCreator:
         num_parents, num_children = self.handler.get_processes()
         log_event(f"Creating {num_parents} parent(s) with {num_children} child(ren) each")
 
-        for i in range(num_parents):
-            parent_port = self.port_allocator.get_next_free_port()
+        started = []
+        parent_ports = self.port_allocator.get_free_ports(num_parents) if num_parents else []
+        for i, parent_port in enumerate(parent_ports):
             parent = multiprocessing.Process(
-                target=self.parent_handler, args=(i + 1, num_children)
+                target=self.parent_handler, args=(i + 1, num_children, parent_port)
             )
             parent.start()
             self.parent_processes.append(parent)
-            self.register_process(parent, parent_port)
+            started.append((parent, parent_port, None))
             log_event(f"Started parent-{i+1} with PID {parent.pid} on port {parent_port}", pid=parent.pid, port=parent_port)
+        self.port_allocator.assign_ports({port: parent.pid for parent, port, _ in started})
+        self.register_processes(started)
 
         try:
             for parent in self.parent_processes:
@@ -1,117 +1,469 @@
 import json
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
 from pathlib import Path
 
+from .config import REGISTRY_BUSY_TIMEOUT, REGISTRY_DAEMON
+from .endpoint import Endpoint
+from .logger import log_event
+from .registry_client import RegistryClient
+from .registry_index import RegistryIndex
+
 # Path to store the registry data
+REGISTRY_DB = Path(__file__).parent / "process_registry.db"
+# Registry file of earlier versions, imported into REGISTRY_DB when the database is created
 REGISTRY_FILE = Path(__file__).parent / "process_registry.json"
 
+SCHEMA_VERSION = 1
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS processes (
+    pid  INTEGER PRIMARY KEY,
+    port INTEGER NOT NULL,             -- -1 until a parent known only from its children registers
+    role TEXT NOT NULL                 -- "parent" or "child"
+);
+CREATE TABLE IF NOT EXISTS ports (
+    port        INTEGER PRIMARY KEY,
+    pid         INTEGER NOT NULL,
+    socket_path TEXT                   -- NULL for TCP
+);
+CREATE INDEX IF NOT EXISTS ports_by_pid ON ports (pid);
+CREATE TABLE IF NOT EXISTS edges (
+    child_pid  INTEGER PRIMARY KEY,
+    parent_pid INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS edges_by_parent ON edges (parent_pid);
+CREATE TABLE IF NOT EXISTS services (name TEXT PRIMARY KEY, pid INTEGER NOT NULL);
+"""
+
+# Tables with their key column and column count, as used by merge().
+_TABLES = (("ports", "port", 3), ("processes", "pid", 3), ("edges", "child_pid", 2), ("services", "name", 2))
+
+# Connections inherited across fork(): never used or closed by the child,
+# as closing them could release locks or checkpoint on the parent's behalf.
+_inherited = []
+
 class ProcessRegistry:
-    def __init__(self):
-        self.registry = {
-            "port_to_pid": {},         # Maps port -> pid
-            "parent_to_children": {},  # Maps parent_pid -> [child_pid, ...]
-            "parents": {},             # Maps parent_pid -> { port, children }
-            "children": {}             # Maps child_pid -> { port, parent }
-        }
-        self._load_registry()
+    """
+    Registry of PortPulse processes shared by every process on the host.
+
+    State lives in a SQLite database in WAL mode: readers never block, and
+    each mutation is a single short transaction touching only its own rows,
+    so concurrent parents and children cannot lose each other's updates.
+    """
 
-    def _load_registry(self):
-        if REGISTRY_FILE.exists():
-            with open(REGISTRY_FILE, 'r') as f:
-                self.registry = json.load(f)
+    def __init__(self, path=REGISTRY_DB, legacy_file=REGISTRY_FILE):
+        self.path = Path(path)
+        self.legacy_file = Path(legacy_file) if legacy_file else None
+        self._conn = None
+        self._pid = None
+        self._lock = threading.RLock()
+        self._batch_depth = 0
+        self._connect()
 
-        # Ensure all required keys exist even if file was from old version
-        self.registry.setdefault("port_to_pid", {})
-        self.registry.setdefault("parent_to_children", {})
-        self.registry.setdefault("parents", {})
-        self.registry.setdefault("children", {})
+    def _connect(self):
+        if self._conn is not None and self._pid == os.getpid():
+            return self._conn
+        if self._conn is not None:
+            _inherited.append(self._conn)
+        conn = sqlite3.connect(self.path, timeout=REGISTRY_BUSY_TIMEOUT, isolation_level=None,
+                               check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn, self._pid = conn, os.getpid()
+        self._create_schema()
+        return conn
 
-    def _save_registry(self):
-        with open(REGISTRY_FILE, 'w') as f:
-            json.dump(self.registry, f, indent=4)
+    def _create_schema(self):
+        with self._transaction() as db:
+            for statement in _SCHEMA.split(";"):
+                if statement.strip():
+                    db.execute(statement)
+            row = db.execute("SELECT value FROM meta WHERE key = 'schema_version'").fetchone()
+            if row is None:
+                db.execute("INSERT INTO meta VALUES ('schema_version', ?)", (str(SCHEMA_VERSION),))
+                self._import_legacy(db)
 
-    def register_process(self, pid, port, parent_pid=None):
+    @contextmanager
+    def _transaction(self):
+        """
+        One write transaction; the write lock is taken up front (BEGIN IMMEDIATE)
+        so concurrent writers wait for each other instead of failing on upgrade.
+        Inside batch() the batch's transaction is used instead.
+        """
+        with self._lock:
+            db = self._connect()
+            if self._batch_depth:
+                yield db
+                return
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                yield db
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+            db.execute("COMMIT")
+
+    def _query(self, sql, params=()):
+        with self._lock:
+            return self._connect().execute(sql, params).fetchall()
+
+    def _import_legacy(self, db):
+        """
+        Import the JSON registry written by earlier versions.
+        """
+        if self.legacy_file is None or not self.legacy_file.exists():
+            return
+        try:
+            with open(self.legacy_file, "r") as f:
+                legacy = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"[ProcessRegistry] Could not import {self.legacy_file}: {e}")
+            return
+
+        endpoints = legacy.get("endpoints", {})
+        for port, pid in legacy.get("port_to_pid", {}).items():
+            db.execute("INSERT OR REPLACE INTO ports VALUES (?, ?, ?)", (int(port), int(pid), endpoints.get(port)))
+        for pid, info in legacy.get("parents", {}).items():
+            db.execute("INSERT OR REPLACE INTO processes VALUES (?, ?, 'parent')", (int(pid), int(info["port"])))
+        for pid, info in legacy.get("children", {}).items():
+            db.execute("INSERT OR REPLACE INTO processes VALUES (?, ?, 'child')", (int(pid), int(info["port"])))
+            db.execute("INSERT OR REPLACE INTO edges VALUES (?, ?)", (int(pid), int(info["parent"])))
+        for parent_pid, children in legacy.get("parent_to_children", {}).items():
+            for child_pid in children:
+                db.execute("INSERT OR IGNORE INTO edges VALUES (?, ?)", (int(child_pid), int(parent_pid)))
+        for name, pid in legacy.get("services", {}).items():
+            db.execute("INSERT OR REPLACE INTO services VALUES (?, ?)", (name, int(pid)))
+        print(f"[ProcessRegistry] Imported {self.legacy_file} into {self.path}")
+
+    def register_process(self, pid, port, parent_pid=None, socket_path=None):
         pid = int(pid)
         port = int(port)
-        self.registry["port_to_pid"][str(port)] = pid
-
-        if parent_pid is None:
-            # Parent registration
-            self.registry["parents"][str(pid)] = {
-                "port": port,
-                "children": []
-            }
-        else:
-            # Child registration
-            parent_pid = str(parent_pid)
-            self.registry["children"][str(pid)] = {
-                "port": port,
-                "parent": int(parent_pid)
-            }
-            self.registry["parents"].setdefault(parent_pid, {"port": -1, "children": []})
-            self.registry["parents"][parent_pid]["children"].append(pid)
-            self.registry["parent_to_children"].setdefault(parent_pid, []).append(pid)
-
-        self._save_registry()
+        with self._transaction() as db:
+            db.execute("INSERT OR REPLACE INTO ports VALUES (?, ?, ?)", (port, pid, socket_path or None))
+            if parent_pid is None:
+                # Parent registration
+                db.execute("INSERT OR REPLACE INTO processes VALUES (?, ?, 'parent')", (pid, port))
+            else:
+                # Child registration
+                parent_pid = int(parent_pid)
+                db.execute("INSERT OR REPLACE INTO processes VALUES (?, ?, 'child')", (pid, port))
+                db.execute("INSERT OR IGNORE INTO processes VALUES (?, -1, 'parent')", (parent_pid,))
+                db.execute("INSERT OR REPLACE INTO edges VALUES (?, ?)", (pid, parent_pid))
+
+    @contextmanager
+    def batch(self):
+        """
+        Apply every update made inside the block in one transaction: other
+        processes see all of them or none, and the database is written once.
+        Other threads using this registry wait until the block ends; batches nest.
+        """
+        with self._lock, self._transaction():
+            self._batch_depth += 1
+            try:
+                yield self
+            finally:
+                self._batch_depth -= 1
+
+    def register_many(self, processes):
+        """
+        Register (pid, port[, parent_pid[, socket_path]]) tuples in one transaction.
+        """
+        with self.batch():
+            for process in processes:
+                self.register_process(*process)
 
     def get_pid_by_port(self, port):
-        return self.registry["port_to_pid"].get(str(port))
+        rows = self._query("SELECT pid FROM ports WHERE port = ?", (int(port),))
+        return rows[0][0] if rows else None
 
     def get_port_by_pid(self, pid):
-        pid = str(pid)
+        pid = int(pid)
+        rows = self._query("SELECT port FROM processes WHERE pid = ?", (pid,))
+        if rows:
+            return rows[0][0]
+        # Fallback for processes that only have a port mapping
+        rows = self._query("SELECT port FROM ports WHERE pid = ? LIMIT 1", (pid,))
+        return rows[0][0] if rows else None
+
+    def get_endpoint_by_port(self, port):
+        """
+        Resolve a port to the Endpoint its process listens on (TCP or Unix socket).
+        """
+        rows = self._query("SELECT socket_path FROM ports WHERE port = ?", (int(port),))
+        return Endpoint(int(port), rows[0][0] if rows else None)
+
+    def get_endpoint_by_pid(self, pid):
+        port = self.get_port_by_pid(pid)
+        if port is None or port <= 0:
+            return None
+        return self.get_endpoint_by_port(port)
 
-        if pid in self.registry["parents"]:
-            return self.registry["parents"][pid]["port"]
-        if pid in self.registry["children"]:
-            return self.registry["children"][pid]["port"]
+    def register_service(self, name, pid):
+        """
+        Publish a well-known service (such as the broker) under `name`.
+        The process itself must already be registered.
+        """
+        with self._transaction() as db:
+            db.execute("INSERT OR REPLACE INTO services VALUES (?, ?)", (name, int(pid)))
 
-        # Fallback using reverse lookup from port_to_pid
-        for port, mapped_pid in self.registry["port_to_pid"].items():
-            if mapped_pid == int(pid):
-                return int(port)
+    def unregister_service(self, name):
+        with self._transaction() as db:
+            db.execute("DELETE FROM services WHERE name = ?", (name,))
 
-        return None
+    def get_service_pid(self, name):
+        rows = self._query("SELECT pid FROM services WHERE name = ?", (name,))
+        return rows[0][0] if rows else None
 
     def get_children_by_parent(self, parent_pid):
-        return self.registry["parent_to_children"].get(str(parent_pid), [])
+        rows = self._query("SELECT child_pid FROM edges WHERE parent_pid = ? ORDER BY child_pid", (int(parent_pid),))
+        return [child_pid for (child_pid,) in rows]
 
     def remove_process(self, port):
-        pid = self.registry["port_to_pid"].pop(str(port), None)
-        if pid is not None:
-            pid_str = str(pid)
-            self.registry["children"].pop(pid_str, None)
-            for parent in self.registry["parents"].values():
-                if pid in parent["children"]:
-                    parent["children"].remove(pid)
+        """
+        Remove the process registered on `port`: its port mapping, its entry
+        (when this is the port it is registered with) and its link to its parent.
+        """
+        port = int(port)
+        with self._transaction() as db:
+            row = db.execute("SELECT pid FROM ports WHERE port = ?", (port,)).fetchone()
+            db.execute("DELETE FROM ports WHERE port = ?", (port,))
+            if row is not None:
+                pid = row[0]
+                db.execute("DELETE FROM processes WHERE pid = ? AND port = ?", (pid, port))
+                db.execute("DELETE FROM edges WHERE child_pid = ?", (pid,))
+
+    def remove_parent_and_children(self, parent_pid):
+        parent_pid = int(parent_pid)
+        with self._transaction() as db:
+            children = "SELECT child_pid FROM edges WHERE parent_pid = ?"
+            db.execute(f"DELETE FROM ports WHERE pid IN ({children})", (parent_pid,))
+            db.execute(f"DELETE FROM processes WHERE pid IN ({children})", (parent_pid,))
+            db.execute("DELETE FROM edges WHERE parent_pid = ?", (parent_pid,))
+            db.execute("DELETE FROM ports WHERE pid = ?", (parent_pid,))
+            db.execute("DELETE FROM processes WHERE pid = ?", (parent_pid,))
+            db.execute("DELETE FROM edges WHERE child_pid = ?", (parent_pid,))
+
+    def get_all_parents(self):
+        return self._select_parents()
+
+    def get_all_children(self):
+        return self._select_children()
+
+    def _select_parents(self):
+        parents = {}
+        for pid, port in self._query("SELECT pid, port FROM processes WHERE role = 'parent' ORDER BY pid"):
+            parents[str(pid)] = {"port": port, "children": []}
+        for child_pid, parent_pid in self._query("SELECT child_pid, parent_pid FROM edges ORDER BY child_pid"):
+            if str(parent_pid) in parents:
+                parents[str(parent_pid)]["children"].append(child_pid)
+        return parents
+
+    def _select_children(self):
+        rows = self._query("SELECT p.pid, p.port, e.parent_pid FROM processes p JOIN edges e ON e.child_pid = p.pid "
+                           "WHERE p.role = 'child' ORDER BY p.pid")
+        return {str(pid): {"port": port, "parent": parent_pid} for pid, port, parent_pid in rows}
 
-            for children in self.registry["parent_to_children"].values():
-                if pid in children:
-                    children.remove(pid)
+    def list_all_processes(self):
+        """
+        Snapshot of the whole registry in the layout of the former JSON file.
+        """
+        parent_to_children = {}
+        for child_pid, parent_pid in self._query("SELECT child_pid, parent_pid FROM edges ORDER BY child_pid"):
+            parent_to_children.setdefault(str(parent_pid), []).append(child_pid)
+        ports = self._query("SELECT port, pid, socket_path FROM ports ORDER BY port")
+        return {
+            "port_to_pid": {str(port): pid for port, pid, _ in ports},
+            "parent_to_children": parent_to_children,
+            "parents": self._select_parents(),
+            "children": self._select_children(),
+            "endpoints": {str(port): path for port, _, path in ports if path},
+            "services": dict(self._query("SELECT name, pid FROM services")),
+        }
+
+    def rows(self):
+        """
+        Every row of the registry, in the form RegistryIndex.from_rows() takes.
+        """
+        with self._lock:
+            db = self._connect()
+            db.execute("BEGIN")  # One read snapshot across the tables
+            try:
+                return {
+                    "ports": db.execute("SELECT port, pid, socket_path FROM ports").fetchall(),
+                    "processes": db.execute("SELECT pid, port, role FROM processes").fetchall(),
+                    "edges": db.execute("SELECT child_pid, parent_pid FROM edges").fetchall(),
+                    "services": db.execute("SELECT name, pid FROM services").fetchall(),
+                }
+            finally:
+                db.execute("COMMIT")
+
+    def merge(self, base, rows):
+        """
+        Write the changes that turned `base` into `rows` (both as returned by
+        rows()) in one transaction. Rows changed only in the database since
+        `base` was read are left as they are.
+        """
+        with self._transaction() as db:
+            for table, key, columns in _TABLES:
+                before = {row[0]: tuple(row) for row in base[table]}
+                after = {row[0]: tuple(row) for row in rows[table]}
+                db.executemany(f"DELETE FROM {table} WHERE {key} = ?",
+                               [(gone,) for gone in before.keys() - after.keys()])
+                db.executemany(f"INSERT OR REPLACE INTO {table} VALUES ({', '.join('?' * columns)})",
+                               [row for name, row in after.items() if before.get(name) != row])
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                if self._pid == os.getpid():
+                    self._conn.close()
+                else:
+                    _inherited.append(self._conn)
+            self._conn = None
+
+    def __del__(self):
+        # The connection's statement cache is a reference cycle; close it now rather than at the next GC.
+        self.close()
+
+class CachedProcessRegistry(ProcessRegistry):
+    """
+    ProcessRegistry for long-lived senders. Reads are answered from an
+    in-memory RegistryIndex, reloaded only when another connection changed
+    the database, which SQLite reports through PRAGMA data_version (read
+    from the WAL shared memory, not the file). Writes through this instance
+    are committed and then applied to the index in place.
+    """
+
+    def __init__(self, path=REGISTRY_DB, legacy_file=REGISTRY_FILE):
+        self._index = None
+        self._version = None
+        self.reloads = 0
+        super().__init__(path, legacy_file)
+
+    def _current(self):
+        with self._lock:
+            db = self._connect()
+            version = (db, db.execute("PRAGMA data_version").fetchone()[0])
+            if self._index is None or version != self._version:
+                if db.in_transaction:
+                    self._index = self._load(db)
+                else:
+                    db.execute("BEGIN")  # One read snapshot across the queries below
+                    try:
+                        self._index = self._load(db)
+                    finally:
+                        db.execute("COMMIT")
+                self._version = version
+                self.reloads += 1
+            return self._index
+
+    def _load(self, db):
+        return RegistryIndex.from_rows(
+            db.execute("SELECT port, pid, socket_path FROM ports"),
+            db.execute("SELECT pid, port, role FROM processes"),
+            db.execute("SELECT child_pid, parent_pid FROM edges"),
+            db.execute("SELECT name, pid FROM services"),
+        )
+
+    @contextmanager
+    def batch(self):
+        # Writes are applied to the index as they are made; if the batch is rolled back, reload instead.
+        with self._lock:
+            try:
+                with super().batch():
+                    yield self
+            except BaseException:
+                self._index = None
+                raise
+
+    def _apply(self, method, *args):
+        """
+        Apply a committed write to the index; a failed write leaves it untouched.
+        """
+        if self._index is not None:
+            getattr(self._index, method)(*args)
+
+    def register_process(self, pid, port, parent_pid=None, socket_path=None):
+        with self._lock:
+            super().register_process(pid, port, parent_pid, socket_path)
+            self._apply("register", int(pid), int(port), None if parent_pid is None else int(parent_pid), socket_path)
 
-        self._save_registry()
+    def register_service(self, name, pid):
+        with self._lock:
+            super().register_service(name, pid)
+            self._apply("register_service", name, int(pid))
+
+    def unregister_service(self, name):
+        with self._lock:
+            super().unregister_service(name)
+            self._apply("unregister_service", name)
+
+    def remove_process(self, port):
+        with self._lock:
+            super().remove_process(port)
+            self._apply("remove_port", int(port))
 
     def remove_parent_and_children(self, parent_pid):
-        parent_pid = str(parent_pid)
+        with self._lock:
+            super().remove_parent_and_children(parent_pid)
+            self._apply("remove_tree", int(parent_pid))
+
+    def get_pid_by_port(self, port):
+        return self._current().port_to_pid.get(int(port))
+
+    def get_port_by_pid(self, pid):
+        return self._current().port_of(int(pid))
 
-        children = self.registry["parent_to_children"].pop(parent_pid, [])
-        for child_pid in children:
-            self.registry["children"].pop(str(child_pid), None)
+    def get_endpoint_by_port(self, port):
+        return Endpoint(int(port), self._current().endpoints.get(int(port)))
 
-            ports_to_remove = [port for port, pid in self.registry["port_to_pid"].items() if pid == child_pid]
-            for port in ports_to_remove:
-                self.registry["port_to_pid"].pop(port, None)
+    def get_endpoint_by_pid(self, pid):
+        return self._current().endpoint_of(int(pid))
 
-        self.registry["parents"].pop(parent_pid, None)
-        ports_to_remove = [port for port, pid in self.registry["port_to_pid"].items() if pid == int(parent_pid)]
-        for port in ports_to_remove:
-            self.registry["port_to_pid"].pop(port, None)
+    def get_service_pid(self, name):
+        return self._current().services.get(name)
 
-        self._save_registry()
+    def get_children_by_parent(self, parent_pid):
+        return self._current().children(int(parent_pid))
 
     def get_all_parents(self):
-        return self.registry["parents"]
+        return self._current().parents()
 
     def get_all_children(self):
-        return self.registry["children"]
+        return self._current().child_processes()
 
     def list_all_processes(self):
-        return self.registry
+        return self._current().as_dict()
+
+_registry = None
+_registry_lock = threading.Lock()
+
+def get_registry():
+    """
+    Returns the process-wide registry: a RegistryClient when REGISTRY_DAEMON
+    is enabled and the daemon is running, else a CachedProcessRegistry.
+    Start the daemon before the processes that should use it. Once the
+    daemon stops answering, the process falls back to the database, into
+    which a stopping daemon merges its state.
+    """
+    global _registry
+    with _registry_lock:
+        if isinstance(_registry, RegistryClient) and not _registry.connected() and not _registry.ping():
+            _registry.close()
+            _registry = CachedProcessRegistry()
+            log_event("Registry daemon unreachable, using the registry database", level="WARNING")
+        if _registry is None:
+            client = RegistryClient() if REGISTRY_DAEMON else None
+            _registry = client if client is not None and client.ping() else CachedProcessRegistry()
+        return _registry
+
+def _reset_after_fork():
+    # The instance reconnects by itself; only the lock may have been held by another thread.
+    global _registry_lock
+    _registry_lock = threading.Lock()
+
+os.register_at_fork(after_in_child=_reset_after_fork)
@@ -0,0 +1,211 @@
+import json
+import os
+import socket
+import threading
+from contextlib import contextmanager
+
+from .config import REGISTRY_SOCKET, CONNECT_TIMEOUT
+from .endpoint import Endpoint
+
+
+class RegistryError(Exception):
+    """
+    The registry daemon rejected a request.
+    """
+
+
+class RegistryClient:
+    """
+    ProcessRegistry API backed by the registry daemon: every call is one
+    JSON line over a Unix stream socket, answered from the daemon's memory.
+    Inside batch(), updates are collected and sent as a single request when
+    the block ends; reads inside the block do not see them yet.
+    Replies are waited for at most `timeout` seconds, so a hung daemon fails
+    calls with TimeoutError instead of blocking them.
+    """
+
+    def __init__(self, socket_path=REGISTRY_SOCKET, timeout=CONNECT_TIMEOUT):
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self._sock = None
+        self._file = None
+        self._pid = None
+        self._lock = threading.RLock()
+        self._batch = None
+
+    def _connect(self):
+        if self.connected():
+            return self._file
+        # A connection inherited across fork() would mix up two processes' replies.
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        try:
+            sock.connect(self.socket_path)
+        except OSError:
+            sock.close()
+            raise
+        self._sock, self._file, self._pid = sock, sock.makefile("rwb"), os.getpid()
+        return self._file
+
+    def _disconnect(self):
+        if self._sock is not None and self._pid == os.getpid():
+            self._file.close()
+            self._sock.close()
+        self._sock = self._file = None
+
+    def call(self, op, *args, retry=True):
+        """
+        Send one request and return its result. A request that fails before it
+        is written is retried on a new connection; one that may already have
+        reached the daemon only with `retry` (requests safe to apply twice).
+        A timeout is never retried.
+        """
+        request = (json.dumps({"op": op, "args": args}) + "\n").encode()
+        with self._lock:
+            for attempt in (1, 2):
+                sent = False
+                try:
+                    f = self._connect()
+                    sent = True
+                    f.write(request)
+                    f.flush()
+                    line = f.readline()
+                    if not line:
+                        raise ConnectionError("registry daemon closed the connection")
+                    break
+                except OSError as e:
+                    self._disconnect()
+                    if attempt == 2 or isinstance(e, TimeoutError) or (sent and not retry):
+                        raise
+        reply = json.loads(line)
+        if not reply["ok"]:
+            raise RegistryError(reply["error"])
+        return reply["result"]
+
+    def connected(self):
+        """
+        Whether this process holds an open connection; a failed call drops it.
+        """
+        return self._sock is not None and self._pid == os.getpid()
+
+    def ping(self):
+        """
+        Whether the daemon is reachable.
+        """
+        try:
+            self.call("ping")
+            return True
+        except (OSError, RegistryError):
+            return False
+
+    def _write(self, op, *args):
+        with self._lock:
+            if self._batch is not None and self._pid == os.getpid():
+                self._batch.append([op, args])
+                return
+        self.call(op, *args, retry=False)
+
+    @contextmanager
+    def batch(self):
+        """
+        Send every update made inside the block as one request, applied atomically.
+        """
+        with self._lock:
+            if self._batch is not None:
+                yield self
+                return
+            self._connect()
+            self._batch = []
+            try:
+                yield self
+                operations = self._batch
+            finally:
+                self._batch = None
+            if operations:
+                self.call("batch", operations, retry=False)
+
+    def register_process(self, pid, port, parent_pid=None, socket_path=None):
+        self._write("register", int(pid), int(port), None if parent_pid is None else int(parent_pid),
+                    socket_path or None)
+
+    def register_many(self, processes):
+        with self.batch():
+            for process in processes:
+                self.register_process(*process)
+
+    def register_service(self, name, pid):
+        self._write("register_service", name, int(pid))
+
+    def unregister_service(self, name):
+        self._write("unregister_service", name)
+
+    def remove_process(self, port):
+        self._write("remove_port", int(port))
+
+    def remove_parent_and_children(self, parent_pid):
+        self._write("remove_tree", int(parent_pid))
+
+    def get_pid_by_port(self, port):
+        return self.call("get_pid_by_port", int(port))
+
+    def get_port_by_pid(self, pid):
+        return self.call("get_port_by_pid", int(pid))
+
+    def get_endpoint_by_port(self, port):
+        return Endpoint(int(port), self.call("get_socket_path", int(port)))
+
+    def get_endpoint_by_pid(self, pid):
+        endpoint = self.call("get_endpoint_by_pid", int(pid))
+        return Endpoint(*endpoint) if endpoint else None
+
+    def get_service_pid(self, name):
+        return self.call("get_service_pid", name)
+
+    def get_children_by_parent(self, parent_pid):
+        return self.call("get_children_by_parent", int(parent_pid))
+
+    def get_all_parents(self):
+        return self.call("get_all_parents")
+
+    def get_all_children(self):
+        return self.call("get_all_children")
+
+    def list_all_processes(self):
+        return self.call("list_all_processes")
+
+    def subscribe(self):
+        """
+        Yield every change applied by the daemon from now on, as
+        {"seq", "op", "args"} dicts, on a connection of its own. Blocks
+        between changes; ends when the daemon goes away or stops answering pings.
+        """
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        with sock:
+            sock.connect(self.socket_path)
+            sock.sendall(b'{"op": "subscribe", "args": []}\n')
+            lines = self._read_lines(sock)
+            reply = json.loads(next(lines, b'{"ok": false, "error": "closed"}'))
+            if not reply["ok"]:
+                raise RegistryError(reply["error"])
+            for line in lines:
+                yield json.loads(line)
+
+    def _read_lines(self, sock):
+        # A quiet subscription is fine as long as the daemon still answers a ping.
+        buffer = b""
+        while True:
+            try:
+                chunk = sock.recv(65536)
+            except TimeoutError:
+                if self.ping():
+                    continue
+                return
+            if not chunk:
+                return
+            *lines, buffer = (buffer + chunk).split(b"\n")
+            yield from lines
+
+    def close(self):
+        with self._lock:
+            self._disconnect()
@@ -0,0 +1,275 @@
+import asyncio
+import inspect
+import json
+import os
+import signal
+
+from .config import REGISTRY_SOCKET, REGISTRY_STATE_DIR, REGISTRY_SNAPSHOT_EVERY, REGISTRY_SUBSCRIBER_BUFFER
+from .logger import log_event
+from .process_registry import ProcessRegistry
+from .registry_index import RegistryIndex
+
+_PID = _PORT = (int,)
+_OPTIONAL_PID = (int, type(None))
+
+# Updates a client may send, each naming the RegistryIndex method applying
+# it, with the types its arguments must have (trailing ones may be left out).
+WRITES = {
+    "register": (_PID, _PORT, _OPTIONAL_PID, (str, type(None))),
+    "remove_port": (_PORT,),
+    "remove_tree": (_PID,),
+    "register_service": ((str,), _PID),
+    "unregister_service": ((str,),),
+}
+
+READS = {
+    "ping": lambda index: True,
+    "get_pid_by_port": lambda index, port: index.port_to_pid.get(port),
+    "get_port_by_pid": lambda index, pid: index.port_of(pid),
+    "get_socket_path": lambda index, port: index.endpoints.get(port),
+    "get_endpoint_by_pid": lambda index, pid: index.endpoint_of(pid),
+    "get_service_pid": lambda index, name: index.services.get(name),
+    "get_children_by_parent": lambda index, parent_pid: index.children(parent_pid),
+    "get_all_parents": lambda index: index.parents(),
+    "get_all_children": lambda index: index.child_processes(),
+    "list_all_processes": lambda index: index.as_dict(),
+}
+
+
+class RegistryDaemon:
+    """
+    Holds the process registry in memory and serves it over a Unix socket
+    (one JSON request and one JSON reply per line, see RegistryClient).
+
+    Every update is appended to a journal and fsynced before it is
+    acknowledged; every `snapshot_every` updates the whole state is written
+    to a snapshot and the journal starts over. After a crash, the snapshot
+    is loaded and the journal replayed. A clean stop merges the daemon's
+    changes into the registry database (so processes that do not use the
+    daemon see them, and rows they wrote meanwhile survive) and removes both
+    files; the next daemon starts from the database.
+    Subscribers receive every update as a {"seq", "op", "args"} line.
+    """
+
+    def __init__(self, socket_path=REGISTRY_SOCKET, state_dir=REGISTRY_STATE_DIR,
+                 snapshot_every=REGISTRY_SNAPSHOT_EVERY, database=None):
+        self.socket_path = socket_path
+        self.state_dir = state_dir
+        self.snapshot_every = snapshot_every
+        self.database = database
+        self.snapshot_path = os.path.join(state_dir, "snapshot.json")
+        self.journal_path = os.path.join(state_dir, "journal.jsonl")
+        self.index = RegistryIndex()
+        self.base = RegistryIndex().rows()  # Database rows the state started from
+        self.seq = 0
+        self._snapshot_seq = 0
+        self._journal = None
+        self._subscribers = set()
+        self._handlers = set()  # Tasks serving connected clients
+        self._server = None
+        self.requests = 0
+
+    def stats(self):
+        return {"seq": self.seq, "requests": self.requests, "subscribers": len(self._subscribers),
+                "processes": len(self.index.processes)}
+
+    def recover(self):
+        """
+        Rebuild the in-memory state from the snapshot and journal (or the database).
+        """
+        os.makedirs(self.state_dir, exist_ok=True)
+        try:
+            with open(self.snapshot_path) as f:
+                snapshot = json.load(f)
+            self.index = RegistryIndex.from_rows(**snapshot["rows"])
+            self.base = snapshot.get("base", self.base)
+            self.seq = self._snapshot_seq = snapshot["seq"]
+        except FileNotFoundError:
+            self.index = RegistryIndex.from_rows(**self._database().rows())
+            self.base = self.index.rows()
+
+        valid = 0
+        replayed = 0
+        if os.path.exists(self.journal_path):
+            with open(self.journal_path, "rb") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        break  # Torn write at the end of the journal
+                    if not line.endswith(b"\n"):
+                        break
+                    if entry["seq"] > self.seq:
+                        try:
+                            self._check(entry["op"], entry["args"])
+                        except (KeyError, TypeError, ValueError) as e:
+                            # Written by a daemon that journaled updates before validating them
+                            log_event(f"Registry journal entry {entry.get('seq')} is invalid, "
+                                      f"dropping it and the rest of the journal: {e}", level="ERROR")
+                            break
+                        self._apply(entry["op"], entry["args"])
+                        self.seq = entry["seq"]
+                        replayed += 1
+                    valid += len(line)
+        self._journal = open(self.journal_path, "ab")
+        self._journal.truncate(valid)
+        log_event(f"Registry daemon recovered {len(self.index.processes)} processes (seq {self.seq}, "
+                  f"{replayed} journal entries replayed)")
+
+    def _database(self):
+        return self.database or ProcessRegistry()
+
+    def _apply(self, op, args):
+        if op == "batch":
+            for sub_op, sub_args in args[0]:
+                self._apply(sub_op, sub_args)
+        else:
+            getattr(self.index, op)(*args)
+
+    def _check(self, op, args):
+        """
+        Raise unless the update (every part of a batch) can be applied, so
+        that applying it never fails halfway.
+        """
+        if not isinstance(args, list):
+            raise TypeError(f"{op} arguments must be a list")
+        if op == "batch":
+            if len(args) != 1 or not isinstance(args[0], list):
+                raise ValueError("batch takes one list of [op, args] pairs")
+            for pair in args[0]:
+                if not isinstance(pair, list) or len(pair) != 2 or pair[0] == "batch":
+                    raise ValueError("batch takes one list of [op, args] pairs")
+                self._check(*pair)
+        elif op not in WRITES:
+            raise ValueError(f"Unknown registry operation: {op}")
+        else:
+            inspect.signature(getattr(self.index, op)).bind(*args)  # TypeError on a wrong argument count
+            for i, (arg, types) in enumerate(zip(args, WRITES[op])):
+                if not isinstance(arg, types) or isinstance(arg, bool):
+                    raise TypeError(f"{op} argument {i + 1} has the wrong type: {arg!r}")
+
+    def update(self, op, args):
+        """
+        Validate, apply and journal one update (or a batch, atomically), then notify subscribers.
+        Only updates that were applied reach the journal, so recovery can always replay it.
+        """
+        self._check(op, args)
+        self._apply(op, args)
+        self.seq += 1
+        line = (json.dumps({"seq": self.seq, "op": op, "args": args}) + "\n").encode()
+        self._journal.write(line)
+        self._journal.flush()
+        os.fsync(self._journal.fileno())
+        for writer in list(self._subscribers):
+            if writer.transport.get_write_buffer_size() > REGISTRY_SUBSCRIBER_BUFFER:
+                self._subscribers.discard(writer)
+                writer.close()  # Too slow; it can reconnect and reread the state
+            else:
+                writer.write(line)
+        if self.seq - self._snapshot_seq >= self.snapshot_every:
+            self.snapshot()
+
+    def snapshot(self):
+        """
+        Write the whole state to the snapshot and start a new journal.
+        """
+        tmp = self.snapshot_path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump({"seq": self.seq, "rows": self.index.rows(), "base": self.base}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.rename(tmp, self.snapshot_path)
+        self._journal.truncate(0)
+        self._snapshot_seq = self.seq
+
+    def handle(self, op, args):
+        if op in READS:
+            return READS[op](self.index, *args)
+        self.update(op, list(args))
+        return self.seq
+
+    async def _serve_client(self, reader, writer):
+        self._handlers.add(asyncio.current_task())
+        try:
+            while line := await reader.readline():
+                self.requests += 1
+                try:
+                    request = json.loads(line)
+                    op, args = request["op"], request.get("args", [])
+                    if op == "subscribe":
+                        reply = {"ok": True, "result": self.seq}
+                    else:
+                        reply = {"ok": True, "result": self.handle(op, args)}
+                except Exception as e:
+                    op, reply = None, {"ok": False, "error": f"{type(e).__name__}: {e}"}
+                writer.write((json.dumps(reply) + "\n").encode())
+                if op == "subscribe":
+                    self._subscribers.add(writer)
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except asyncio.CancelledError:
+            pass
+        finally:
+            self._handlers.discard(asyncio.current_task())
+            self._subscribers.discard(writer)
+            writer.close()
+
+    async def serve(self):
+        if self._journal is None:
+            self.recover()
+        os.makedirs(os.path.dirname(self.socket_path), exist_ok=True)
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)  # Stale socket from a previous daemon
+        self._server = await asyncio.start_unix_server(self._serve_client, path=self.socket_path)
+        async with self._server:
+            try:
+                await self._server.serve_forever()
+            except asyncio.CancelledError:
+                pass
+            for task in list(self._handlers):
+                task.cancel()
+            await asyncio.gather(*self._handlers, return_exceptions=True)
+
+    def stop(self):
+        if self._server is not None:
+            self._server.close()
+
+    def close(self):
+        """
+        Merge the state into the registry database, then drop the snapshot, journal and socket.
+        """
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+        if self._journal is None:
+            return
+        self.snapshot()  # Still recoverable if writing the database fails
+        self._journal.close()
+        self._journal = None
+        self._database().merge(self.base, self.index.rows())
+        os.unlink(self.journal_path)
+        os.unlink(self.snapshot_path)
+
+
+def run_registry_daemon(socket_path=REGISTRY_SOCKET):
+    """
+    Run the registry daemon in the current process until interrupted.
+    Processes with REGISTRY_DAEMON enabled use it instead of the registry database.
+    """
+    daemon = RegistryDaemon(socket_path)
+    daemon.recover()
+
+    async def main():
+        loop = asyncio.get_running_loop()
+        loop.add_signal_handler(signal.SIGTERM, daemon.stop)
+        await daemon.serve()
+
+    print(f"[RegistryDaemon] PID: {os.getpid()} serving on {socket_path}")
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        signal.signal(signal.SIGTERM, signal.SIG_IGN)  # Let a repeated SIGTERM not interrupt the write-back
+        daemon.close()
+        print(f"[RegistryDaemon] Stopped: {daemon.stats()}")
@@ -0,0 +1,157 @@
+from .endpoint import Endpoint
+
+
+class RegistryIndex:
+    """
+    In-memory model of the process registry with two-way indexes, so that
+    lookups and single-process updates are O(1) and removing a process tree
+    is O(children), however many processes are registered:
+    - port -> pid and pid -> set of ports
+    - pid -> (port, role) for registered parents and children
+    - parent -> set of children and child -> parent
+    Mutations follow the same rules as the SQLite-backed ProcessRegistry.
+    """
+
+    def __init__(self):
+        self.port_to_pid = {}
+        self.pid_ports = {}       # pid -> set of ports mapped to it
+        self.endpoints = {}       # port -> unix socket path (absent for TCP)
+        self.processes = {}       # pid -> (port, "parent" | "child")
+        self.children_of = {}     # parent pid -> set of child pids
+        self.parent_of = {}       # child pid -> parent pid
+        self.services = {}        # service name -> pid
+
+    @classmethod
+    def from_rows(cls, ports, processes, edges, services):
+        """
+        Build an index from (port, pid, socket_path), (pid, port, role),
+        (child_pid, parent_pid) and (name, pid) rows.
+        """
+        index = cls()
+        for port, pid, socket_path in ports:
+            index._map_port(port, pid, socket_path)
+        for pid, port, role in processes:
+            index.processes[pid] = (port, role)
+        for child_pid, parent_pid in edges:
+            index._link(child_pid, parent_pid)
+        index.services.update(services)
+        return index
+
+    def rows(self):
+        """
+        The index as JSON-serialisable rows, the inverse of from_rows().
+        """
+        return {
+            "ports": [[port, pid, self.endpoints.get(port)] for port, pid in self.port_to_pid.items()],
+            "processes": [[pid, port, role] for pid, (port, role) in self.processes.items()],
+            "edges": [[child_pid, parent_pid] for child_pid, parent_pid in self.parent_of.items()],
+            "services": [[name, pid] for name, pid in self.services.items()],
+        }
+
+    def _map_port(self, port, pid, socket_path=None):
+        previous = self.port_to_pid.get(port)
+        if previous is not None and previous != pid:
+            self._unmap_port_of(previous, port)
+        self.port_to_pid[port] = pid
+        self.pid_ports.setdefault(pid, set()).add(port)
+        if socket_path:
+            self.endpoints[port] = socket_path
+        else:
+            self.endpoints.pop(port, None)
+
+    def _unmap_port_of(self, pid, port):
+        ports = self.pid_ports.get(pid)
+        if ports is not None:
+            ports.discard(port)
+            if not ports:
+                del self.pid_ports[pid]
+
+    def _link(self, child_pid, parent_pid):
+        self._unlink(child_pid)
+        self.parent_of[child_pid] = parent_pid
+        self.children_of.setdefault(parent_pid, set()).add(child_pid)
+
+    def _unlink(self, child_pid):
+        parent_pid = self.parent_of.pop(child_pid, None)
+        if parent_pid is not None:
+            siblings = self.children_of[parent_pid]
+            siblings.discard(child_pid)
+            if not siblings:
+                del self.children_of[parent_pid]
+
+    def register(self, pid, port, parent_pid=None, socket_path=None):
+        self._map_port(port, pid, socket_path)
+        if parent_pid is None:
+            self.processes[pid] = (port, "parent")
+        else:
+            self.processes[pid] = (port, "child")
+            self.processes.setdefault(parent_pid, (-1, "parent"))
+            self._link(pid, parent_pid)
+
+    def remove_port(self, port):
+        pid = self.port_to_pid.pop(port, None)
+        self.endpoints.pop(port, None)
+        if pid is not None:
+            self._unmap_port_of(pid, port)
+            if self.processes.get(pid, (None,))[0] == port:
+                del self.processes[pid]
+            self._unlink(pid)
+
+    def _forget(self, pid):
+        for port in self.pid_ports.pop(pid, ()):
+            self.port_to_pid.pop(port, None)
+            self.endpoints.pop(port, None)
+        self.processes.pop(pid, None)
+        self._unlink(pid)
+
+    def remove_tree(self, parent_pid):
+        for child_pid in list(self.children_of.get(parent_pid, ())):
+            self._forget(child_pid)
+        self._forget(parent_pid)
+
+    def register_service(self, name, pid):
+        self.services[name] = pid
+
+    def unregister_service(self, name):
+        self.services.pop(name, None)
+
+    def port_of(self, pid):
+        """
+        The port a process registered with, else any port mapped to it.
+        """
+        process = self.processes.get(pid)
+        if process is not None:
+            return process[0]
+        ports = self.pid_ports.get(pid)
+        return min(ports) if ports else None
+
+    def endpoint_of(self, pid):
+        port = self.port_of(pid)
+        if port is None or port <= 0:
+            return None
+        return Endpoint(port, self.endpoints.get(port))
+
+    def children(self, parent_pid):
+        return sorted(self.children_of.get(parent_pid, ()))
+
+    def parents(self):
+        return {str(pid): {"port": port, "children": self.children(pid)}
+                for pid, (port, role) in sorted(self.processes.items()) if role == "parent"}
+
+    def child_processes(self):
+        return {str(pid): {"port": port, "parent": self.parent_of[pid]}
+                for pid, (port, role) in sorted(self.processes.items())
+                if role == "child" and pid in self.parent_of}
+
+    def as_dict(self):
+        """
+        The registry in the layout of the former JSON file.
+        """
+        return {
+            "port_to_pid": {str(port): pid for port, pid in sorted(self.port_to_pid.items())},
+            "parent_to_children": {str(parent): self.children(parent) for parent in sorted(self.children_of)},
+            "parents": self.parents(),
+            "children": self.child_processes(),
+            "endpoints": {str(port): path for port, path in sorted(self.endpoints.items())},
+            "services": dict(self.services),
+        }
@@ -0,0 +1,178 @@
+import asyncio
+import json
+import os
+
+from .config import RPC_TIMEOUT, LOG_RATE_LIMIT
+from .codec import Envelope, encode_envelope, decode_envelope
+from .endpoint import open_endpoint_connection
+from .compression import compress_payload
+from .framing import (encode_frame, iter_frames, FrameError, MSG_DATA, MSG_REQUEST, MSG_REPLY, MSG_ERROR,
+                      MSG_CANCEL, MSG_BUSY, MSG_RETRY)
+from .logger import get_logger
+
+log = get_logger()
+
+
+class RpcError(Exception):
+    """
+    Raised on the caller's side when the remote handler failed.
+    """
+
+
+class EndpointBusy(RpcError):
+    """
+    The receiver's inbox was full and it rejected the request (inbox policy "busy").
+    """
+
+
+class RetryLater(RpcError):
+    """
+    The receiver's inbox was full and asked the caller to retry after `retry_after` seconds.
+    """
+
+    def __init__(self, retry_after):
+        super().__init__(f"Endpoint busy, retry after {retry_after:.3f}s")
+        self.retry_after = retry_after
+
+
+def reply_payload(value):
+    """
+    Convert a handler's return value into reply bytes.
+    """
+    if value is None:
+        return b""
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return bytes(value)
+    if isinstance(value, str):
+        return value.encode()
+    return json.dumps(value).encode()
+
+
+async def serve_request(envelope, writer, handler_callback):
+    """
+    Run the handler for one request and write its reply (or error) back on the
+    same connection, tagged with the request's message id.
+    """
+    try:
+        result = await handler_callback(envelope) if handler_callback else None
+        msg_type, payload = MSG_REPLY, reply_payload(result)
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        log.error("Request %s from PID %s failed: %s", envelope.message_id, envelope.sender_pid, e, rate=LOG_RATE_LIMIT)
+        msg_type, payload = MSG_ERROR, str(e).encode()
+
+    if writer.is_closing():
+        return
+    reply = Envelope(payload, sender_pid=os.getpid(), destination=envelope.sender_pid,
+                     message_id=envelope.message_id)
+    writer.write(encode_frame(encode_envelope(reply), msg_type))
+    await writer.drain()
+
+
+class RpcConnection:
+    """
+    Client side of request/reply over one persistent connection.
+    Many requests may be outstanding at once; replies are matched to callers by message id.
+    Plain messages can be sent on the same connection with send().
+    """
+
+    def __init__(self, reader, writer, sender_pid=None, compression=""):
+        self.reader = reader
+        self.writer = writer
+        self.sender_pid = sender_pid if sender_pid is not None else os.getpid()
+        self.compression = compression  # Algorithm the peer accepted, "" for none
+        self.stats = None  # CompressionStats to record into, if any
+        self._pending = {}  # message id -> Future
+        self._reader_task = asyncio.create_task(self._read_replies())
+
+    @classmethod
+    async def open(cls, endpoint, sender_pid=None):
+        reader, writer = await open_endpoint_connection(endpoint)
+        return cls(reader, writer, sender_pid)
+
+    @property
+    def outstanding(self):
+        return len(self._pending)
+
+    @property
+    def closed(self):
+        return self._reader_task.done() or self.writer.is_closing()
+
+    def _frame(self, envelope, msg_type):
+        data, flags = compress_payload(encode_envelope(envelope), self.compression, stats=self.stats)
+        return encode_frame(data, msg_type, flags)
+
+    async def send(self, messages, sender_pid=None, destination=None):
+        """
+        Send one or more plain (fire-and-forget) messages, written in a single batch.
+        """
+        if isinstance(messages, (str, bytes, bytearray, memoryview)):
+            messages = [messages]
+        sender_pid = sender_pid if sender_pid is not None else self.sender_pid
+        self.writer.write(b"".join(
+            self._frame(Envelope(message, sender_pid=sender_pid, destination=destination), MSG_DATA)
+            for message in messages
+        ))
+        await self.writer.drain()
+
+    async def request(self, message, timeout=RPC_TIMEOUT, destination=None, sender_pid=None):
+        """
+        Send a request and wait for its reply Envelope.
+        Raises RpcError if the remote handler failed, EndpointBusy or RetryLater
+        if the receiver's inbox was full, and asyncio.TimeoutError on timeout;
+        on timeout or cancellation the remote side is asked to cancel the handler.
+        """
+        if self._reader_task.done():
+            raise ConnectionResetError("RPC connection is closed")
+        sender_pid = sender_pid if sender_pid is not None else self.sender_pid
+        envelope = Envelope(message, sender_pid=sender_pid, destination=destination)
+        future = asyncio.get_running_loop().create_future()
+        self._pending[envelope.message_id] = future
+        try:
+            self.writer.write(self._frame(envelope, MSG_REQUEST))
+            await self.writer.drain()
+            return await asyncio.wait_for(future, timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError):
+            self._send_cancel(envelope.message_id)
+            raise
+        finally:
+            self._pending.pop(envelope.message_id, None)
+
+    def _send_cancel(self, message_id):
+        if not self.writer.is_closing():
+            cancel = Envelope(b"", sender_pid=self.sender_pid, message_id=message_id)
+            self.writer.write(encode_frame(encode_envelope(cancel), MSG_CANCEL))
+
+    async def _read_replies(self):
+        error = ConnectionResetError("RPC connection closed by peer")
+        try:
+            async for msg_type, flags, payload in iter_frames(self.reader):
+                if msg_type not in (MSG_REPLY, MSG_ERROR, MSG_BUSY, MSG_RETRY):
+                    continue
+                envelope = decode_envelope(payload)
+                future = self._pending.get(envelope.message_id)
+                if future is None or future.done():
+                    continue  # Caller already timed out or cancelled
+                if msg_type == MSG_REPLY:
+                    future.set_result(envelope)
+                elif msg_type == MSG_BUSY:
+                    future.set_exception(EndpointBusy("Endpoint busy"))
+                elif msg_type == MSG_RETRY:
+                    future.set_exception(RetryLater(int(envelope.text or 0) / 1000))
+                else:
+                    future.set_exception(RpcError(envelope.text))
+        except (ConnectionResetError, FrameError) as e:
+            error = e
+        finally:
+            for future in self._pending.values():
+                if not future.done():
+                    future.set_exception(error)
+
+    async def close(self):
+        self._reader_task.cancel()
+        self.writer.close()
+        try:
+            await self.writer.wait_closed()
+        except ConnectionResetError:
+            pass
@@ -0,0 +1,255 @@
+import asyncio
+import os
+import struct
+from multiprocessing import shared_memory
+
+from .config import SHM_RING_CAPACITY
+from .logger import log_event
+from .codec import decode_envelope
+
+# Ring layout: producer cursor and consumer cursor live on separate cache
+# lines, followed by the data region. Cursors only ever grow; the position
+# inside the data region is cursor % capacity.
+HEAD_OFFSET = 0
+TAIL_OFFSET = 64
+DATA_OFFSET = 128
+
+_CURSOR = struct.Struct("<Q")
+_LENGTH = struct.Struct("<I")
+_WRAP = 0xFFFFFFFF  # Record length marking "skip to the start of the region"
+
+_channels = {}  # destination pid -> ShmChannel this process writes to
+
+
+def _aligned(size):
+    return (size + 7) & ~7
+
+
+class ShmChannelFull(Exception):
+    """
+    Raised when the ring has no room for a payload until the receiver catches up.
+    """
+
+
+class ShmRingBuffer:
+    """
+    Lock-free single-producer/single-consumer ring buffer in shared memory.
+    Each record is a 4-byte length followed by the payload, padded to 8 bytes.
+    """
+
+    def __init__(self, capacity=SHM_RING_CAPACITY, name=None):
+        if capacity % 8:
+            raise ValueError("Ring capacity must be a multiple of 8 bytes")
+        if name is None:
+            self._shm = shared_memory.SharedMemory(create=True, size=DATA_OFFSET + capacity)
+            _CURSOR.pack_into(self._shm.buf, HEAD_OFFSET, 0)
+            _CURSOR.pack_into(self._shm.buf, TAIL_OFFSET, 0)
+            self.owner = True
+        else:
+            self._shm = shared_memory.SharedMemory(name=name)
+            self.owner = False
+        self.capacity = capacity
+
+    @property
+    def name(self):
+        return self._shm.name
+
+    def _load(self, offset):
+        return _CURSOR.unpack_from(self._shm.buf, offset)[0]
+
+    def _store(self, offset, value):
+        _CURSOR.pack_into(self._shm.buf, offset, value)
+
+    def used(self):
+        return self._load(HEAD_OFFSET) - self._load(TAIL_OFFSET)
+
+    def write(self, payload):
+        """
+        Copy `payload` into the ring. Returns False if there is not enough free space.
+        Only one process may write to a given ring.
+        """
+        length = len(payload)
+        record = _aligned(_LENGTH.size + length)
+        if record > self.capacity:
+            raise ValueError(f"Payload of {length} bytes does not fit a {self.capacity}-byte ring")
+
+        head = self._load(HEAD_OFFSET)
+        tail = self._load(TAIL_OFFSET)
+        pos = head % self.capacity
+        contiguous = self.capacity - pos
+        needed = record if record <= contiguous else contiguous + record
+        if head - tail + needed > self.capacity:
+            return False
+
+        buf = self._shm.buf
+        if record > contiguous:
+            _LENGTH.pack_into(buf, DATA_OFFSET + pos, _WRAP)
+            head += contiguous
+            pos = 0
+
+        start = DATA_OFFSET + pos
+        _LENGTH.pack_into(buf, start, length)
+        buf[start + _LENGTH.size:start + _LENGTH.size + length] = payload
+        # Publish only after the record is fully written.
+        self._store(HEAD_OFFSET, head + record)
+        return True
+
+    def consume(self):
+        """
+        Yield a memoryview over each pending record, in order, without copying.
+        A view is only valid until the next iteration; the record's space is
+        released once the consumer moves on.
+        """
+        buf = self._shm.buf
+        tail = self._load(TAIL_OFFSET)
+        head = self._load(HEAD_OFFSET)
+        while tail < head:
+            pos = tail % self.capacity
+            length = _LENGTH.unpack_from(buf, DATA_OFFSET + pos)[0]
+            if length == _WRAP:
+                tail += self.capacity - pos
+                self._store(TAIL_OFFSET, tail)
+                continue
+
+            start = DATA_OFFSET + pos + _LENGTH.size
+            view = buf[start:start + length]
+            try:
+                yield view
+            finally:
+                view.release()
+            tail += _aligned(_LENGTH.size + length)
+            self._store(TAIL_OFFSET, tail)
+            if tail >= head:
+                head = self._load(HEAD_OFFSET)
+
+    def close(self, unlink=False):
+        self._shm.close()
+        if unlink:
+            self._shm.unlink()
+
+
+class Doorbell:
+    """
+    Wakes the receiver's event loop: an eventfd where available, a pipe otherwise.
+    """
+
+    def __init__(self):
+        if hasattr(os, "eventfd"):
+            self._read_fd = self._write_fd = os.eventfd(0, os.EFD_NONBLOCK | os.EFD_CLOEXEC)
+        else:
+            self._read_fd, self._write_fd = os.pipe()
+            os.set_blocking(self._read_fd, False)
+            os.set_blocking(self._write_fd, False)
+
+    def fileno(self):
+        return self._read_fd
+
+    def ring(self):
+        try:
+            if self._read_fd == self._write_fd:
+                os.eventfd_write(self._write_fd, 1)
+            else:
+                os.write(self._write_fd, b"\x01")
+        except BlockingIOError:
+            pass  # Receiver already has a pending wakeup
+
+    def clear(self):
+        try:
+            if self._read_fd == self._write_fd:
+                os.eventfd_read(self._read_fd)
+            else:
+                while os.read(self._read_fd, 4096):
+                    pass
+        except BlockingIOError:
+            pass
+
+    def close(self):
+        os.close(self._read_fd)
+        if self._write_fd != self._read_fd:
+            os.close(self._write_fd)
+
+
+class ShmChannel:
+    """
+    One-way bulk channel from a parent to a child process: a shared-memory ring
+    plus a doorbell. Create it before forking the child so both ends inherit it.
+    Sending never waits: when the ring is full the caller decides whether to
+    retry later or fall back to a socket.
+    """
+
+    def __init__(self, capacity=SHM_RING_CAPACITY):
+        self.ring = ShmRingBuffer(capacity)
+        self.doorbell = Doorbell()
+        self._creator_pid = os.getpid()
+
+    def send(self, payload):
+        """
+        Write `payload` into the ring and ring the doorbell.
+        Raises ShmChannelFull instead of waiting when there is no room for it.
+        """
+        if isinstance(payload, str):
+            payload = payload.encode()
+        if not self.ring.write(payload):
+            self.doorbell.ring()  # Make sure the receiver is draining
+            raise ShmChannelFull(f"Shared-memory ring {self.ring.name} is full")
+        self.doorbell.ring()
+
+    async def serve(self, handler_callback, zero_copy=False):
+        """
+        Decode every record as an Envelope and pass it to `handler_callback`, the
+        same callback used by MessageQueue.start_message_listener. With
+        `zero_copy=True` the envelope payload is a memoryview into the ring that
+        is only valid until the handler returns.
+        """
+        loop = asyncio.get_running_loop()
+        wakeup = asyncio.Event()
+        loop.add_reader(self.doorbell.fileno(), wakeup.set)
+        log_event(f"Listening for shared-memory messages on {self.ring.name}")
+        try:
+            while True:
+                for view in self.ring.consume():
+                    envelope = decode_envelope(view, copy=not zero_copy)
+                    try:
+                        await handler_callback(envelope)
+                    finally:
+                        if zero_copy:
+                            envelope.payload.release()
+                await wakeup.wait()
+                wakeup.clear()
+                self.doorbell.clear()
+        finally:
+            loop.remove_reader(self.doorbell.fileno())
+
+    def close(self):
+        """
+        Release this process's mapping; the creating process also unlinks the segment.
+        """
+        self.doorbell.close()
+        self.ring.close(unlink=self.ring.owner and os.getpid() == self._creator_pid)
+
+    def __reduce__(self):
+        raise TypeError("ShmChannel must be inherited by a forked child, not pickled")
+
+
+def register_channel(pid, channel):
+    """
+    Make `channel` the route for messages this process sends to `pid`.
+    """
+    _channels[pid] = channel
+
+
+def channel_for(pid):
+    """
+    The channel this process writes to for `pid`, or None.
+    """
+    return _channels.get(pid)
+
+
+def close_channels():
+    """
+    Close every registered channel. A forked child calls this first, since it
+    inherits its siblings' channels but must never write to them.
+    """
+    for channel in _channels.values():
+        channel.close()
+    _channels.clear()
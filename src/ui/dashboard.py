@@ -1,12 +1,16 @@
 import tkinter as tk
 from tkinter import ttk, scrolledtext, messagebox
 import multiprocessing
+import queue
 import threading
+import time
 from ..core.config import MONITOR_REFRESH_RATE, UI_UPDATE_INTERVAL, MAX_LOG_LINES_IN_UI
-from ..core.logger import read_latest_logs, log_event
-from ..core.process_registry import ProcessRegistry
-from ..core.process_manager import ProcessCreator, ProcessTerminator, send_message_to_process
+from ..core.logger import LogFollower, log_event
+from ..core.process_registry import get_registry
+from ..core.process_manager import ProcessCreator, ProcessTerminator
 from ..core.message_handler import MessageQueue
+from ..core.fanout import broadcast_async
+from ..core.client import get_client
 
 # Custom colors and styles
 BG_COLOR = "#f0f4f8"  # Light blue-gray background
@@ -22,10 +26,19 @@ class DashboardUI:
         self.root.configure(bg=BG_COLOR)
         self.root.geometry("800x600")  # Set a reasonable initial size
 
-        self.registry = ProcessRegistry()
         self.creator = ProcessCreator()
         self.message_queue = MessageQueue()
         self.terminator = ProcessTerminator()
+        self.client = get_client()  # One event loop and persistent connections for every send
+        self.log_follower = LogFollower(initial=MAX_LOG_LINES_IN_UI)
+        self.notices = queue.Queue()  # (title, text) posted by other threads, shown from update_ui on the Tk thread
+        # With the registry daemon, redraw the process table on changes instead of on every tick
+        self.registry_changed = threading.Event()
+        self.registry_changed.set()
+        self.table_updated = 0.0
+        self.watching_registry = hasattr(self.registry, "subscribe")
+        if self.watching_registry:
+            threading.Thread(target=self._watch_registry, daemon=True).start()
         
         # Main frame with padding
         self.main_frame = ttk.Frame(self.root, padding="20", style="Main.TFrame")
@@ -206,6 +219,18 @@ class DashboardUI:
 
         ttk.Button(control_frame, text="📨 Send Child", command=self.send_child_message).grid(row=13, column=0, columnspan=2, pady=5)
 
+        # Broadcast Section
+        ttk.Label(control_frame, text="Broadcast").grid(row=14, column=0, columnspan=2, pady=5, sticky=tk.W)
+        ttk.Label(control_frame, text="Parent PID (0 = all):").grid(row=15, column=0, sticky=tk.E)
+        self.broadcast_parent_pid = tk.StringVar(value="0")
+        ttk.Entry(control_frame, textvariable=self.broadcast_parent_pid, width=10).grid(row=15, column=1, sticky=tk.W)
+
+        ttk.Label(control_frame, text="Message:").grid(row=16, column=0, sticky=tk.E)
+        self.broadcast_content = tk.StringVar(value="Hello, everyone!")
+        ttk.Entry(control_frame, textvariable=self.broadcast_content, width=20).grid(row=16, column=1, sticky=tk.W)
+
+        ttk.Button(control_frame, text="📢 Broadcast", command=self.broadcast_message).grid(row=17, column=0, columnspan=2, pady=5)
+
     def update_process_table(self):
         """Update the process status table using ProcessRegistry."""
         for item in self.tree.get_children():
@@ -227,13 +252,15 @@ class DashboardUI:
         return None  # Return actual last target PID if implemented
 
     def refresh_logs(self):
-        """Refresh the logs display."""
-        self.logs_text.delete(1.0, tk.END)
-        logs = read_latest_logs(n=MAX_LOG_LINES_IN_UI)
+        """Add entries appended since the last refresh (newest first) and trim to MAX_LOG_LINES_IN_UI."""
+        logs = self.log_follower.read_new()[-MAX_LOG_LINES_IN_UI:]
+        if not logs:
+            return
         for log in logs:
             log_line = f"{log['timestamp']} | PID {log['pid']} | {log['level']}: {log['message']}\n"
-            self.logs_text.insert(tk.END, log_line, (log['level'].lower() if log['level'] in ['INFO', 'ERROR'] else 'default'))
-        self.logs_text.see(tk.END)
+            self.logs_text.insert("1.0", log_line, (log['level'].lower() if log['level'] in ['INFO', 'ERROR'] else 'default'))
+        self.logs_text.delete(f"{MAX_LOG_LINES_IN_UI + 1}.0", tk.END)
+        self.logs_text.see("1.0")  # Newest entries are at the top
 
     def clear_logs(self):
         """Clear the logs display."""
@@ -266,6 +293,7 @@ class DashboardUI:
                 port = self.creator.port_allocator.get_next_free_port()
                 child = multiprocessing.Process(target=self.creator.child_handler, args=(1, port))
                 child.start()
+                self.creator.port_allocator.assign_ports({port: child.pid})  # Reclaimable if the child dies
                 self.creator.register_process(child, port)
         except Exception as e:
             print(f"[ERROR] Failed to create process: {e}")
@@ -279,25 +307,26 @@ class DashboardUI:
             if not self.check_process_alive(target_pid):
                 messagebox.showerror("Error", f"Process PID {target_pid} is not alive.", parent=self.root)
                 return
-            threading.Thread(target=self._send_message_thread, args=(target_pid, message), daemon=True).start()
+            print(f"📬 Sending: '{message}' to PID {target_pid}")
+            future = self.client.send_nowait(target_pid, message)
+            future.add_done_callback(lambda f: self._on_sent(f, target_pid, message))
         except ValueError:
             messagebox.showerror("Error", "Invalid PID number", parent=self.root)
         except Exception as e:
             messagebox.showerror("Error", f"Failed to send message: {e}", parent=self.root)
             log_event(f"Failed to send message to PID {target_pid}: {e}", pid=target_pid, level="ERROR")
 
-    def _send_message_thread(self, target_pid, message):
-        """Helper method to send a message in a separate thread."""
-        print(f"📬 Sending: '{message}' to PID {target_pid}")
-        try:
-            success = send_message_to_process(target_pid, message)
-            if success:
+    def _on_sent(self, future, target_pid, message, from_pid=None):
+        """Log the outcome of a send submitted to the shared client."""
+        error = future.exception()
+        if error is None:
+            if from_pid is None:
                 log_event(f"Message sent via dashboard: {message}", pid=target_pid)
             else:
-                log_event(f"Failed to send message to PID {target_pid}", pid=target_pid, level="ERROR")
-        except Exception as e:
-            print(f"[ERROR] Failed to send message: {e}")
-            log_event(f"Failed to send message to PID {target_pid}: {e}", pid=target_pid, level="ERROR")
+                log_event(f"Child message sent from PID {from_pid} to PID {target_pid}: {message}", pid=from_pid)
+        else:
+            print(f"[ERROR] Failed to send message: {error}")
+            log_event(f"Failed to send message to PID {target_pid}: {error}", pid=target_pid, level="ERROR")
 
     def send_child_message(self):
         """Send a message from one child to another."""
@@ -308,28 +337,41 @@ class DashboardUI:
             if not self.check_process_alive(from_pid) or not self.check_process_alive(to_pid):
                 messagebox.showerror("Error", "One or both PIDs are not alive.", parent=self.root)
                 return
-            threading.Thread(target=self._send_child_message_thread, args=(from_pid, to_pid, message), daemon=True).start()
+            print(f"📩 Sending: '{message}' from PID {from_pid} to PID {to_pid}")
+            future = self.client.send_nowait(to_pid, message, sender_pid=from_pid)
+            future.add_done_callback(lambda f: self._on_sent(f, to_pid, message, from_pid))
         except ValueError:
             messagebox.showerror("Error", "Invalid PID number", parent=self.root)
         except Exception as e:
             messagebox.showerror("Error", f"Failed to send child message: {e}", parent=self.root)
             log_event(f"Failed to send child message: {e}", level="ERROR")
 
-    def _send_child_message_thread(self, from_pid, to_pid, message):
-        """Helper method to send a child-to-child message in a separate thread."""
-        print(f"📩 Sending: '{message}' from PID {from_pid} to PID {to_pid}")
+    def broadcast_message(self):
+        """Broadcast a message to all processes or to one parent's children."""
         try:
-            registry = ProcessRegistry()
-            to_port = registry.get_port_by_pid(to_pid)
-            if to_port:
-                send_message_to_process(to_pid, message, sender_pid=from_pid)
-                log_event(f"Child message sent from PID {from_pid} to PID {to_pid}: {message}", 
-                         pid=from_pid, port=to_port)
-            else:
-                log_event(f"Failed to send child message: Invalid target PID {to_pid}", level="ERROR")
-        except Exception as e:
-            print(f"[ERROR] Failed to send child message: {e}")
-            log_event(f"Failed to send child message to PID {to_pid}: {e}", pid=from_pid, level="ERROR")
+            parent_pid = int(self.broadcast_parent_pid.get())
+        except ValueError:
+            messagebox.showerror("Error", "Invalid parent PID", parent=self.root)
+            return
+        message = self.broadcast_content.get()
+        print(f"📢 Broadcasting: '{message}' (parent PID {parent_pid})")
+        future = self.client.submit(broadcast_async(message, parent_pid=parent_pid))
+        future.add_done_callback(self._on_broadcast)
+
+    def _on_broadcast(self, future):
+        """Show the fan-out report once the broadcast has finished on the client's loop."""
+        error = future.exception()
+        if error is None:
+            report = future.result()
+            self.notices.put(("Broadcast", report.summary()))  # Tk may only be used from its own thread
+        else:
+            print(f"[ERROR] Failed to broadcast: {error}")
+            log_event(f"Failed to broadcast message: {error}", level="ERROR")
+
+    @property
+    def registry(self):
+        """The process-wide registry, looked up on each use to follow a fallback from the daemon."""
+        return get_registry()
 
     def cleanup(self):
         """Clean up processes on window close."""
@@ -337,12 +379,36 @@ class DashboardUI:
         self.creator.terminate_all()
         self.root.destroy()
 
+    def _watch_registry(self):
+        """Flag registry changes pushed by the registry daemon; fall back to polling if it goes away."""
+        try:
+            for _ in self.registry.subscribe():
+                self.registry_changed.set()
+        except Exception as e:
+            log_event(f"Registry subscription ended: {e}", level="WARNING")
+        self.watching_registry = False
+
     def update_ui(self):
         """Periodically update the UI."""
-        self.update_process_table()
+        # Liveness of registered processes still has to be polled, but only every MONITOR_REFRESH_RATE seconds
+        stale = time.monotonic() - self.table_updated >= MONITOR_REFRESH_RATE
+        if not self.watching_registry or self.registry_changed.is_set() or stale:
+            self.registry_changed.clear()
+            self.table_updated = time.monotonic()
+            self.update_process_table()
         self.refresh_logs()
+        self.show_notices()
         self.root.after(UI_UPDATE_INTERVAL, self.update_ui)
 
+    def show_notices(self):
+        """Show results posted by background threads (e.g. broadcast reports)."""
+        while True:
+            try:
+                title, text = self.notices.get_nowait()
+            except queue.Empty:
+                return
+            messagebox.showinfo(title, text, parent=self.root)
+
 def launch_dashboard():
     """Launch the Tkinter dashboard."""
     root = tk.Tk()
@@ -0,0 +1,25 @@
+import socket
+import pytest
+from src.core import log_writer
+
+@pytest.fixture(autouse=True)
+def log_file(tmp_path, monkeypatch):
+    """
+    Send the records logged during a test to tmp_path instead of the repository's logs/.
+    """
+    writer = log_writer.LogWriter(path=str(tmp_path / "portpulse-logs" / "logs.json"))
+    monkeypatch.setattr(log_writer, "_writer", writer)
+    yield writer.path
+    writer.close()
+
+@pytest.fixture
+def unused_port():
+    """
+    Returns a function picking a free port from the OS's ephemeral range, away
+    from the 5000-6000 range running PortPulse instances allocate from.
+    """
+    def pick(kind=socket.SOCK_STREAM):
+        with socket.socket(socket.AF_INET, kind) as s:
+            s.bind(("127.0.0.1", 0))
+            return s.getsockname()[1]
+    return pick
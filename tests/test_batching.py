@@ -0,0 +1,45 @@
+import asyncio
+from src.core.batching import encode_batch, decode_batch
+from src.core.connection_pool import ConnectionPool
+from src.core.message_handler import MessageQueue
+from src.core.endpoint import Endpoint
+
+def test_batch_roundtrip():
+    bodies = [b"one", b"", b"three" * 100]
+    assert decode_batch(encode_batch(bodies)) == bodies
+
+def test_batches_flush_on_size_and_linger(unused_port):
+    port = unused_port()
+    received = []
+
+    async def handler(envelope):
+        received.append(envelope.text)
+
+    async def run():
+        queue = MessageQueue()
+        listener = asyncio.create_task(queue.start_message_listener(port, handler))
+        await asyncio.sleep(0.1)
+        pool = ConnectionPool()
+        batcher = queue.batching_sender(pool=pool, max_messages=10, linger=0.05)
+        try:
+            for i in range(25):
+                queue.send_batched(port, f"msg-{i}")
+            await asyncio.to_thread(queue.flush_batches, 5)
+            for _ in range(20):
+                if len(received) == 25:
+                    break
+                await asyncio.sleep(0.05)
+            # A lone message goes out on its own once the linger time has passed.
+            queue.send_batched(Endpoint(port, None), "late")
+            await asyncio.sleep(0.3)
+        finally:
+            await asyncio.to_thread(batcher.close)
+            pool.close_all()
+            listener.cancel()
+        return batcher.stats()
+
+    stats = asyncio.run(run())
+    assert sorted(received[:25]) == sorted(f"msg-{i}" for i in range(25))
+    assert received[25:] == ["late"]
+    assert stats["messages"] == 26 and stats["failed"] == 0
+    assert stats["batches"] == 4
@@ -0,0 +1,88 @@
+import asyncio
+import pytest
+from src.core.broker import Broker, BrokerClient, topic_matches, validate_pattern
+from src.core.endpoint import Endpoint
+from src.core.framing import encode_frame, MSG_PUBLISH, MSG_SUBSCRIBE, MSG_UNSUBSCRIBE
+
+def test_topic_wildcards():
+    assert topic_matches("jobs.*.created", "jobs.eu.created")
+    assert not topic_matches("jobs.*.created", "jobs.eu.west.created")
+    assert topic_matches("jobs.#", "jobs")
+    assert topic_matches("jobs.#", "jobs.eu.created")
+    assert not topic_matches("jobs.eu", "jobs.eu.created")
+
+def test_hash_only_allowed_as_last_segment():
+    validate_pattern("jobs.#")
+    validate_pattern("#")
+    with pytest.raises(ValueError):
+        validate_pattern("jobs.#.created")
+
+    async def run():
+        client = BrokerClient(None, None)
+        with pytest.raises(ValueError):
+            await client.subscribe("a.#.b")
+
+    asyncio.run(run())
+
+def test_publish_fans_out_to_matching_subscribers(unused_port):
+    port = unused_port()
+
+    async def run():
+        broker = Broker(port)
+        server = asyncio.create_task(broker.serve())
+        await asyncio.sleep(0.1)
+        endpoint = Endpoint(port, None)
+        eu = await BrokerClient.connect(endpoint)
+        everything = await BrokerClient.connect(endpoint)
+        publisher = await BrokerClient.connect(endpoint)
+        try:
+            await eu.subscribe("jobs.eu.*")
+            await everything.subscribe("#")
+            await asyncio.sleep(0.05)
+            await publisher.publish("jobs.us.created", "us-1")
+            await publisher.publish("jobs.eu.created", "eu-1")
+
+            async def first(client, count):
+                received = []
+                async for topic, envelope in client.messages():
+                    received.append((topic, envelope.text))
+                    if len(received) == count:
+                        return received
+
+            assert await asyncio.wait_for(first(eu, 1), 2) == [("jobs.eu.created", "eu-1")]
+            assert await asyncio.wait_for(first(everything, 2), 2) == [
+                ("jobs.us.created", "us-1"), ("jobs.eu.created", "eu-1")]
+            assert broker.stats()["published"] == 2
+            assert broker.stats()["delivered"] == 3
+        finally:
+            for client in (eu, everything, publisher):
+                await client.close()
+            server.cancel()
+
+    asyncio.run(run())
+
+def test_malformed_frames_drop_only_their_connection(unused_port):
+    port = unused_port()
+
+    async def run():
+        broker = Broker(port)
+        server = asyncio.create_task(broker.serve())
+        await asyncio.sleep(0.1)
+        try:
+            for frame in (encode_frame(b"\x00", MSG_PUBLISH), encode_frame(b"\x00\x02\xff\xfe", MSG_PUBLISH),
+                          encode_frame(b"\xff", MSG_SUBSCRIBE), encode_frame(b"\xff", MSG_UNSUBSCRIBE)):
+                reader, writer = await asyncio.open_connection("127.0.0.1", port)
+                writer.write(frame)
+                assert await asyncio.wait_for(reader.read(), 2) == b""  # Closed by the broker
+                writer.close()
+            client = await BrokerClient.connect(Endpoint(port, None))
+            await client.subscribe("jobs.#")
+            await asyncio.sleep(0.05)
+            await client.publish("jobs.eu", "still serving")
+            topic, envelope = await asyncio.wait_for(client.messages().__anext__(), 2)
+            assert (topic, envelope.text) == ("jobs.eu", "still serving")
+            await client.close()
+        finally:
+            server.cancel()
+
+    asyncio.run(run())
@@ -0,0 +1,60 @@
+import asyncio
+from src.core.client import AsyncPortPulseClient, PortPulseClient
+from src.core.message_handler import MessageQueue
+from src.core.endpoint import Endpoint
+
+def test_async_client_reuses_one_connection(unused_port):
+    port = unused_port()
+    received = []
+    connections = []
+
+    async def handler(envelope):
+        received.append(envelope.text)
+        return envelope.text.upper()
+
+    async def run():
+        queue = MessageQueue()
+        original = queue._handle_client
+
+        async def counting_handle_client(reader, writer, inbox, port=None):
+            connections.append(writer)
+            await original(reader, writer, inbox, port)
+
+        queue._handle_client = counting_handle_client
+        listener = asyncio.create_task(queue.start_message_listener(port, handler))
+        await asyncio.sleep(0.1)
+        client = AsyncPortPulseClient()
+        endpoint = Endpoint(port, None)
+        try:
+            await client.send(endpoint, "one")
+            await client.send_many(endpoint, ["two", "three"])
+            reply = await client.request(endpoint, "four")
+            await queue.send_message("127.0.0.1", port, "five")
+            await queue.send_message("127.0.0.1", port, "six")
+            await asyncio.sleep(0.1)
+        finally:
+            await client.close()
+            await queue.close_connections()
+            listener.cancel()
+        return reply
+
+    reply = asyncio.run(run())
+    assert reply.text == "FOUR"
+    assert sorted(received) == sorted(["one", "two", "three", "four", "five", "six"])
+    assert len(connections) == 2  # one for the client, one for the queue's sends
+
+def test_sync_facade_runs_on_background_loop(unused_port):
+    port = unused_port()
+
+    async def handler(envelope):
+        return f"echo {envelope.text}"
+
+    client = PortPulseClient()
+    listener = client.submit(MessageQueue().start_message_listener(port, handler))
+    try:
+        client.submit(asyncio.sleep(0.1)).result()
+        assert client.request(Endpoint(port, None), "hi").text == "echo hi"
+        client.send(Endpoint(port, None), "fire-and-forget")
+    finally:
+        listener.cancel()
+        client.close()
@@ -0,0 +1,26 @@
+import json
+import pytest
+from src.core.codec import Envelope, get_codec, encode_envelope, decode_envelope
+
+@pytest.mark.parametrize("codec", ["binary", "json"])
+def test_envelope_round_trip(codec):
+    envelope = Envelope(b"\x00\xffraw bytes", sender_pid=42, destination=7)
+    decoded = decode_envelope(get_codec(codec).encode(envelope))
+    assert decoded.payload == b"\x00\xffraw bytes"
+    assert decoded.sender_pid == 42
+    assert decoded.destination == 7
+    assert decoded.message_id == envelope.message_id
+    assert decoded.timestamp == pytest.approx(envelope.timestamp)
+
+def test_binary_zero_copy_payload():
+    data = encode_envelope(Envelope("hello"), codec="binary")
+    decoded = decode_envelope(memoryview(data), copy=False)
+    assert isinstance(decoded.payload, memoryview)
+    assert decoded.text == "hello"
+    assert decoded.sender_pid is None
+
+def test_legacy_and_bare_payloads():
+    legacy = json.dumps({"message": "hi", "sender_pid": 5}).encode()
+    assert decode_envelope(legacy).text == "hi"
+    assert decode_envelope(legacy).sender_pid == 5
+    assert decode_envelope(b"plain text").text == "plain text"
@@ -0,0 +1,64 @@
+import asyncio
+import lzma
+import zlib
+from src.core import compression
+from src.core.compression import compress_payload, decompress_payload, CompressionStats, FLAG_ZLIB, FLAG_LZMA
+from src.core.connection_pool import ConnectionPool
+from src.core.message_handler import MessageQueue
+from src.core.endpoint import Endpoint
+from src.core.framing import FrameError
+from src.core.codec import Envelope, encode_envelope
+
+def test_roundtrip_and_threshold():
+    payload = b"port-pulse " * 1000
+    for algorithm, flag in (("zlib", FLAG_ZLIB), ("lzma", FLAG_LZMA)):
+        data, flags = compress_payload(payload, algorithm, threshold=100)
+        assert flags == flag and len(data) < len(payload)
+        assert decompress_payload(data, flags) == payload
+
+    stats = CompressionStats()
+    data, flags = compress_payload(b"small", "zlib", threshold=100, stats=stats)
+    assert (data, flags) == (b"small", 0)
+    assert stats.messages == 1 and stats.compressed == 0
+
+def test_incompressible_payload_sent_as_is():
+    payload = bytes(range(256))
+    data, flags = compress_payload(payload, "zlib", threshold=0)
+    assert (data, flags) == (payload, 0)
+
+def test_negotiated_compression_end_to_end(unused_port):
+    port = unused_port()
+    received = []
+    message = "x" * 20000
+
+    async def handler(envelope):
+        received.append(envelope.text)
+
+    async def run():
+        listener = asyncio.create_task(MessageQueue().start_message_listener(port, handler))
+        await asyncio.sleep(0.1)
+        pool = ConnectionPool()
+        try:
+            for _ in range(2):
+                await asyncio.to_thread(pool.send_frame, Endpoint(port, None),
+                                        encode_envelope(Envelope(message)), compression="zlib")
+            await MessageQueue().send_message("127.0.0.1", port, message, compression="lzma")
+            await asyncio.sleep(0.1)
+        finally:
+            pool.close_all()
+            listener.cancel()
+
+    asyncio.run(run())
+    assert received == [message] * 3
+
+def test_decompression_is_bounded(monkeypatch):
+    monkeypatch.setattr(compression, "MAX_FRAME_SIZE", 1000)
+    for flag, data in ((FLAG_ZLIB, zlib.compress(b"\0" * 1_000_000)), (FLAG_LZMA, lzma.compress(b"\0" * 1_000_000))):
+        assert len(data) < 1000
+        for payload in (data, data[:len(data) // 2], b"not compressed"):
+            try:
+                decompress_payload(payload, flag)
+                assert False, "decompressed a bomb or a corrupt payload"
+            except FrameError:
+                pass
+    assert decompress_payload(zlib.compress(b"x" * 1000), FLAG_ZLIB) == b"x" * 1000
@@ -0,0 +1,137 @@
+import asyncio
+import time
+from src.core.codec import Envelope, encode_envelope
+from src.core.connection_pool import ConnectionPool
+from src.core.endpoint import Endpoint
+from src.core.framing import FrameError
+from src.core.message_handler import MessageQueue
+
+def tracking_pool():
+    pool = ConnectionPool()
+    opened = []
+    connect = pool._connect
+    pool._connect = lambda endpoint: opened.append(connect(endpoint)) or opened[-1]
+    return pool, opened
+
+def frame(text):
+    return encode_envelope(Envelope(text))
+
+def test_failed_frame_closes_the_connection(monkeypatch, unused_port):
+    port = unused_port()
+    pool, opened = tracking_pool()
+    monkeypatch.setattr("src.core.framing.MAX_FRAME_SIZE", 10)
+
+    async def handler(envelope):
+        pass
+
+    async def run():
+        listener = asyncio.create_task(MessageQueue().start_message_listener(port, handler))
+        await asyncio.sleep(0.1)
+        try:
+            await asyncio.to_thread(pool.send_frame, Endpoint(port, None), b"x" * 100)
+            assert False, "oversized frame sent"
+        except FrameError:
+            pass
+        finally:
+            pool.close_all()
+            listener.cancel()
+
+    asyncio.run(run())
+    assert len(opened) == 1 and opened[0].fileno() == -1
+    assert pool._idle == {}
+
+def test_reuses_one_connection_per_endpoint(unused_port):
+    port = unused_port()
+    pool, opened = tracking_pool()
+    received = []
+
+    async def handler(envelope):
+        received.append(envelope.text)
+
+    async def run():
+        listener = asyncio.create_task(MessageQueue().start_message_listener(port, handler))
+        await asyncio.sleep(0.1)
+        endpoint = Endpoint(port, None)
+        try:
+            await asyncio.to_thread(pool.send_frame, endpoint, frame("one"))
+            await asyncio.to_thread(pool.send_frame, port, frame("two"))  # A bare port names the same TCP endpoint
+            assert len(opened) == 1 and pool.idle_count(endpoint) == 1
+            await asyncio.sleep(0.1)
+        finally:
+            pool.close_all()
+            listener.cancel()
+
+    asyncio.run(run())
+    assert received == ["one", "two"]
+
+def test_evicts_idle_connections(unused_port):
+    port = unused_port()
+    pool, opened = tracking_pool()
+    pool.idle_timeout = 0.05
+    received = []
+
+    async def handler(envelope):
+        received.append(envelope.text)
+
+    async def run():
+        listener = asyncio.create_task(MessageQueue().start_message_listener(port, handler))
+        await asyncio.sleep(0.1)
+        endpoint = Endpoint(port, None)
+        try:
+            await asyncio.to_thread(pool.send_frame, endpoint, frame("one"))
+            await asyncio.sleep(0.1)
+            pool.evict_idle()
+            assert pool.idle_count() == 0 and opened[0].fileno() == -1
+            await asyncio.to_thread(pool.send_frame, endpoint, frame("two"))
+            assert len(opened) == 2
+            await asyncio.sleep(0.1)
+        finally:
+            pool.close_all()
+            listener.cancel()
+
+    asyncio.run(run())
+    assert received == ["one", "two"]
+
+def test_retries_once_on_a_fresh_connection(unused_port):
+    class DeadSocket:
+        closed = False
+
+        def sendall(self, data):
+            raise BrokenPipeError("peer went away")
+
+        def close(self):
+            self.closed = True
+
+    port = unused_port()
+    pool, opened = tracking_pool()
+    pool._is_alive = lambda sock: True  # The peer died after the liveness check
+    dead = DeadSocket()
+    endpoint = Endpoint(port, None)
+    pool._idle[endpoint] = [(dead, time.monotonic())]
+    received = []
+
+    async def handler(envelope):
+        received.append(envelope.text)
+
+    async def run():
+        listener = asyncio.create_task(MessageQueue().start_message_listener(port, handler))
+        await asyncio.sleep(0.1)
+        try:
+            await asyncio.to_thread(pool.send_frame, endpoint, frame("payload"))
+            await asyncio.sleep(0.1)
+        finally:
+            pool.close_all()
+            listener.cancel()
+
+    asyncio.run(run())
+    assert dead.closed and len(opened) == 1
+    assert received == ["payload"]
+
+def test_fresh_connection_failure_is_not_retried(unused_port):
+    pool, opened = tracking_pool()
+    try:
+        pool.send_frame(Endpoint(unused_port(), None), frame("payload"))  # Nothing listens there
+        assert False, "sent to a closed port"
+    except ConnectionRefusedError:
+        pass
+    assert pool.idle_count() == 0
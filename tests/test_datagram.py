@@ -0,0 +1,47 @@
+import asyncio
+import socket
+import pytest
+from src.core.codec import Envelope, encode_envelope
+from src.core.datagram import DatagramSender, DatagramListener, DatagramTooLarge
+from src.core.inbox import Inbox
+
+def test_datagrams_delivered_in_batches_with_loss_count(unused_port):
+    port = unused_port(socket.SOCK_DGRAM)
+    received = []
+
+    async def handler(envelope):
+        received.append(envelope.text)
+
+    async def run():
+        inbox = Inbox(handler, workers=1)
+        inbox.start()
+        listener = DatagramListener(port, inbox)
+        listener.start()
+        sender = DatagramSender()
+        try:
+            for i in range(10):
+                sender.send(port, encode_envelope(Envelope(f"beat-{i}")))
+            next(sender._sequences[port])  # Simulate one datagram lost in transit
+            sender.send(port, encode_envelope(Envelope("beat-last")))
+            for _ in range(50):
+                if len(received) == 11:
+                    break
+                await asyncio.sleep(0.01)
+            assert received[:10] == [f"beat-{i}" for i in range(10)]
+            stats = listener.stats()
+            assert stats["received"] == 11
+            assert stats["lost"] == 1
+            assert stats["avg_batch"] > 1
+        finally:
+            sender.close()
+            listener.close()
+            await inbox.stop()
+
+    asyncio.run(run())
+
+def test_oversized_datagram_rejected(unused_port):
+    port = unused_port(socket.SOCK_DGRAM)
+    sender = DatagramSender(max_size=64)
+    with pytest.raises(DatagramTooLarge):
+        sender.send(port, b"x" * 100)
+    sender.close()
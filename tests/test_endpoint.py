@@ -0,0 +1,49 @@
+import asyncio
+import os
+import pytest
+from src.core import message_handler
+from src.core.client import AsyncPortPulseClient
+from src.core.codec import Envelope, encode_envelope
+from src.core.config import SOCKET_DIR
+from src.core.connection_pool import ConnectionPool
+from src.core.endpoint import Endpoint, endpoint_for_port, as_endpoint
+from src.core.message_handler import MessageQueue
+
+def test_endpoint_for_port_per_transport():
+    assert endpoint_for_port(5100, "tcp") == Endpoint(5100, None)
+    assert endpoint_for_port(5100, "unix") == Endpoint(5100, os.path.join(SOCKET_DIR, "portpulse-5100.sock"))
+    assert as_endpoint(Endpoint(5100, "/tmp/x.sock")).path == "/tmp/x.sock"
+    with pytest.raises(ValueError):
+        endpoint_for_port(5100, "carrier-pigeon")
+
+def test_messages_over_unix_socket(tmp_path, monkeypatch):
+    path = str(tmp_path / "portpulse-1.sock")
+    endpoint = Endpoint(1, path)  # The port only names the process; nothing binds it
+    monkeypatch.setattr(message_handler, "endpoint_for_port", lambda port: Endpoint(port, path))
+    open(path, "w").close()  # Stale socket file left by a dead process
+    received = []
+
+    async def handler(envelope):
+        received.append(envelope.text)
+        return envelope.text.upper()
+
+    async def run():
+        listener = asyncio.create_task(MessageQueue().start_message_listener(1, handler))
+        await asyncio.sleep(0.1)
+        pool = ConnectionPool()
+        client = AsyncPortPulseClient()
+        try:
+            await asyncio.to_thread(pool.send_frame, endpoint, encode_envelope(Envelope("pooled")))
+            reply = await client.request(endpoint, "request")
+            await asyncio.sleep(0.05)
+        finally:
+            pool.close_all()
+            await client.close()
+            listener.cancel()
+            await asyncio.gather(listener, return_exceptions=True)
+        return reply
+
+    reply = asyncio.run(run())
+    assert reply.text == "REQUEST"
+    assert sorted(received) == ["pooled", "request"]
+    assert not os.path.exists(path)  # Removed when the listener stops
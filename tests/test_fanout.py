@@ -0,0 +1,67 @@
+import asyncio
+from src.core import fanout
+from src.core.endpoint import Endpoint
+from src.core.fanout import fan_out, broadcast_targets
+from src.core.framing import read_frame
+
+def test_partial_failure_is_reported_per_target(unused_port):
+    received = []
+
+    async def handle(reader, writer):
+        received.append(await read_frame(reader))
+        writer.close()
+
+    async def run():
+        server = await asyncio.start_server(handle, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        async with server:
+            report = await fan_out([(1, Endpoint(port, None)), (2, Endpoint(unused_port(), None))], "hello")
+            await asyncio.sleep(0.05)
+        return report
+
+    report = asyncio.run(run())
+    assert [r.pid for r in report.delivered] == [1]
+    assert [r.pid for r in report.failed] == [2] and report.failed[0].error
+    assert len(received) == 1
+
+def test_encoding_errors_fail_only_their_target(monkeypatch, unused_port):
+    monkeypatch.setattr("src.core.framing.MAX_FRAME_SIZE", 10)
+    report = asyncio.run(fan_out([(1, Endpoint(unused_port(), None))], "x" * 100))
+    assert report.failed[0].error.startswith("FrameError")
+
+def test_hung_target_times_out_without_stalling_others(monkeypatch):
+    async def deliver(endpoint, frame):
+        if endpoint.port == 2:
+            await asyncio.sleep(10)
+
+    monkeypatch.setattr(fanout, "_deliver", deliver)
+    targets = [(pid, Endpoint(pid, None)) for pid in (1, 2, 3)]
+    report = asyncio.run(fan_out(targets, "hello", timeout=0.2))
+    assert [r.pid for r in report.delivered] == [1, 3]
+    assert report.failed[0].pid == 2 and "timed out" in report.failed[0].error
+    assert report.elapsed < 1
+
+def test_concurrency_is_capped(monkeypatch):
+    in_flight = []
+    peak = []
+
+    async def deliver(endpoint, frame):
+        in_flight.append(endpoint)
+        peak.append(len(in_flight))
+        await asyncio.sleep(0.01)
+        in_flight.remove(endpoint)
+
+    monkeypatch.setattr(fanout, "_deliver", deliver)
+    report = asyncio.run(fan_out([(pid, Endpoint(pid, None)) for pid in range(20)], "hello", concurrency=3))
+    assert len(report.delivered) == 20
+    assert max(peak) == 3
+
+def test_broadcast_targets_each_process_once_and_skips_services():
+    class Registry:
+        def list_all_processes(self):
+            return {"port_to_pid": {"5000": 10, "5001": 10, "5002": 11, "5003": 12}, "services": {"broker": 12}}
+
+        def get_endpoint_by_pid(self, pid):
+            return Endpoint(5000 + pid, None)
+
+    assert [pid for pid, _ in broadcast_targets(registry=Registry())] == [10, 11]
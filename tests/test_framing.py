@@ -0,0 +1,58 @@
+import asyncio
+import pytest
+from src.core.codec import Envelope, encode_envelope
+from src.core.framing import encode_frame, FrameDecoder, FrameError, MSG_DATA, MSG_HELLO
+from src.core.message_handler import MessageQueue
+
+def test_pipelined_frames():
+    decoder = FrameDecoder()
+    stream = encode_frame(b"first") + encode_frame(b"second") + encode_frame(b"")
+    frames = decoder.feed(stream)
+    assert [payload for _, _, payload in frames] == [b"first", b"second", b""]
+    assert all(msg_type == MSG_DATA for msg_type, _, _ in frames)
+    assert decoder.pending == 0
+
+def test_large_frame_reassembled_from_chunks():
+    payload = bytes(range(256)) * 1000
+    stream = encode_frame(payload)
+    decoder = FrameDecoder()
+    frames = []
+    for i in range(0, len(stream), 1024):
+        frames.extend(decoder.feed(stream[i:i + 1024]))
+    assert len(frames) == 1
+    assert frames[0][2] == payload
+
+def test_oversized_frame_rejected():
+    decoder = FrameDecoder(max_frame_size=8)
+    with pytest.raises(FrameError):
+        decoder.feed(encode_frame(b"x" * 9))
+
+def test_listener_survives_malformed_frames(unused_port):
+    port = unused_port()
+    received = []
+
+    async def handler(envelope):
+        received.append(envelope.text)
+
+    async def run():
+        listener = asyncio.create_task(MessageQueue().start_message_listener(port, handler))
+        await asyncio.sleep(0.1)
+        try:
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.write(encode_frame(b"\xff", MSG_HELLO))
+            assert await asyncio.wait_for(reader.read(), 2) == b""  # Closed by the listener
+            writer.close()
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.write(encode_frame(b'{"message": 5}'))  # Not an older envelope after all: delivered as is
+            writer.write(encode_frame(encode_envelope(Envelope("still serving"))))
+            await writer.drain()
+            for _ in range(50):
+                if len(received) == 2:
+                    break
+                await asyncio.sleep(0.01)
+            writer.close()
+        finally:
+            listener.cancel()
+
+    asyncio.run(run())
+    assert received == ['{"message": 5}', "still serving"]
@@ -0,0 +1,27 @@
+import json
+import threading
+from src.core.log_collector import CollectorClient, LogCollector
+from src.core.log_writer import LogWriter
+
+def test_records_from_clients_written_by_collector(tmp_path):
+    socket_path = str(tmp_path / "collector.sock")
+    log_path = tmp_path / "logs.json"
+    client = CollectorClient(socket_path)
+    assert not client.send({"message": "no collector yet"})  # The caller falls back to direct writes
+
+    collector = LogCollector(socket_path, writer=LogWriter(path=str(log_path), durability="never"))
+    collector.bind()
+    thread = threading.Thread(target=collector.serve_forever)
+    thread.start()
+    try:
+        client = CollectorClient(socket_path)
+        for i in range(100):
+            assert client.send({"message": f"event-{i}"})
+    finally:
+        collector.stop()
+        thread.join()
+    collector.writer.close()
+
+    messages = [json.loads(line)["message"] for line in log_path.read_text().splitlines()]
+    assert messages == [f"event-{i}" for i in range(100)]
+    assert collector.stats()["received"] == 100
@@ -0,0 +1,59 @@
+import json
+import os
+import time
+from src.core.log_store import SegmentedLogStore
+from src.core.log_writer import LogWriter
+
+def _record(i, pid):
+    return {"timestamp": f"2026-01-01T00:{i // 60:02d}:{i % 60:02d}Z", "pid": pid, "port": 5000 + pid,
+            "level": "ERROR" if i % 10 == 0 else "INFO", "message": f"event-{i}"}
+
+def test_rotation_index_and_query(tmp_path):
+    path = str(tmp_path / "logs.json")
+    store = SegmentedLogStore(path, segment_dir=str(tmp_path / "segments"), rotate_bytes=4096,
+                              rotate_interval=0, compress=True, index_every=10)
+    writer = LogWriter(path=path, batch_size=20, durability="never", store=store)
+    for i in range(600):
+        writer.write(_record(i, pid=i % 3))
+        if i % 20 == 19:
+            writer.flush()
+    writer.close()
+    assert writer.stats()["rotations"] > 2
+
+    for segment in store.segments():
+        os.utime(segment.path, (0, 0))  # Pretend every segment was closed long ago
+    store.finalize_closed()
+    segments = store.segments()
+    assert all(s.compressed and s.load_index()["records"] for s in segments)
+    for segment in segments:
+        index = segment.load_index()
+        assert index["members"] and len(index["points"]) > 1
+        for ts, offset in index["points"]:
+            # Each index point starts a gzip member that decompresses on its own
+            with segment.open(offset, index) as f:
+                assert json.loads(f.readline())["timestamp"] == time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(ts))
+
+    everything = list(store.query())
+    assert [r["message"] for r in everything] == [f"event-{i}" for i in range(600)]
+
+    window = list(store.query(pid=1, since="2026-01-01T00:05:00Z", until="2026-01-01T00:06:00Z"))
+    assert [r["message"] for r in window] == [f"event-{i}" for i in range(300, 361) if i % 3 == 1]
+    errors = list(store.query(level="ERROR", limit=3))
+    assert [r["message"] for r in errors] == ["event-0", "event-10", "event-20"]
+
+def test_rotation_and_queries_leave_finalizing_to_the_background(tmp_path):
+    path = tmp_path / "logs.json"
+    store = SegmentedLogStore(str(path), segment_dir=str(tmp_path / "segments"), rotate_bytes=0,
+                              rotate_interval=0, compress=True, index_every=10, finalize_grace=0.5)
+    path.write_text("".join(json.dumps(_record(i, pid=1)) + "\n" for i in range(100)))
+    segment = store.rotate()
+    assert not segment.compressed and segment.load_index() is None
+
+    os.utime(segment.path, (0, 0))  # Old enough to be finalized, but a query must not do it
+    window = list(store.query(since="2026-01-01T00:01:00Z", until="2026-01-01T00:01:09Z"))
+    assert [r["message"] for r in window] == [f"event-{i}" for i in range(60, 70)]
+    assert [s.compressed for s in store.segments()] == [False] and segment.load_index() is None
+
+    store._finalizer.join(5)  # Started by rotate()
+    assert [s.compressed for s in store.segments()] == [True]
+    assert len(list(store.query(since="2026-01-01T00:01:00Z"))) == 40
@@ -0,0 +1,43 @@
+import json
+import os
+import signal
+import subprocess
+import sys
+import textwrap
+from src.core.log_writer import LogWriter
+
+def test_records_written_in_order_and_flushed(tmp_path):
+    path = tmp_path / "logs" / "logs.json"
+    writer = LogWriter(path=str(path), durability="records", fsync_records=10)
+    for i in range(25):
+        assert writer.write({"message": f"event-{i}"})
+    assert writer.flush()
+    lines = path.read_text().splitlines()
+    assert [json.loads(line)["message"] for line in lines] == [f"event-{i}" for i in range(25)]
+    stats = writer.stats()
+    assert stats["written"] == 25 and stats["queue_depth"] == 0 and stats["fsyncs"] >= 1
+    writer.close()
+
+def test_full_queue_drops_records(tmp_path):
+    writer = LogWriter(path=str(tmp_path / "logs.json"), queue_size=2, durability="never")
+    writer._thread = object()  # Pretend the writer is running but stalled
+    results = [writer.write({"message": i}) for i in range(5)]
+    assert results == [True, True, False, False, False]
+    assert writer.stats()["dropped"] == 3 and writer.stats()["queue_depth"] == 2
+
+def test_sigterm_exits_through_the_flushing_exit_handlers(tmp_path):
+    path = tmp_path / "logs.json"
+    script = textwrap.dedent("""
+        import functools, os, signal, sys, time
+        from src.core import log_writer
+        log_writer.LogWriter = functools.partial(log_writer.LogWriter, path=sys.argv[1])
+        writer = log_writer.get_log_writer()
+        for i in range(1000):
+            writer.write({"message": i}, block=True)
+        os.kill(os.getpid(), signal.SIGTERM)
+        time.sleep(10)
+    """)
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    result = subprocess.run([sys.executable, "-c", script, str(path)], cwd=root, timeout=10)
+    assert result.returncode == -signal.SIGTERM
+    assert len(path.read_text().splitlines()) == 1000
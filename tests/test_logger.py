@@ -0,0 +1,67 @@
+import json
+from src.core.logger import read_latest_logs, LogFollower, _tail_lines
+
+def _write(path, start, count, partial=False):
+    with open(path, "a") as f:
+        for i in range(start, start + count):
+            f.write(json.dumps({"message": f"event-{i}"}) + "\n")
+        if partial:
+            f.write('{"message": "half')
+
+def test_tail_reads_last_entries_across_blocks(tmp_path):
+    path = tmp_path / "logs.json"
+    _write(path, 0, 5000, partial=True)
+    logs = read_latest_logs(n=3, path=str(path))
+    assert [log["message"] for log in logs] == ["event-4999", "event-4998", "event-4997"]
+    with open(path, "rb") as f:
+        lines, end = _tail_lines(f, 300, block_size=64)
+    assert len(lines) == 300 and json.loads(lines[0])["message"] == "event-4700"
+    assert end == path.stat().st_size - len('{"message": "half')
+
+def test_follower_returns_only_new_entries(tmp_path):
+    path = tmp_path / "logs.json"
+    _write(path, 0, 10)
+    follower = LogFollower(path=str(path), initial=2)
+    assert [log["message"] for log in follower.read_new()] == ["event-8", "event-9"]
+    assert follower.read_new() == []
+    _write(path, 10, 2, partial=True)
+    assert [log["message"] for log in follower.read_new()] == ["event-10", "event-11"]
+
+    path.write_text("")  # truncated, e.g. by rotation
+    _write(path, 100, 1)
+    assert [log["message"] for log in follower.read_new()] == ["event-100"]
+
+def test_level_threshold_and_lazy_formatting(monkeypatch):
+    from src.core import logger
+    records = []
+    monkeypatch.setattr(logger, "log_event", lambda message, pid=None, port=None, level="INFO": records.append((level, message)))
+    monkeypatch.setattr(logger, "_threshold", logger.LEVELS["INFO"])
+    log = logger.get_logger(pid=1)
+
+    def expensive():
+        raise AssertionError("formatted although disabled")
+
+    log.debug(expensive)
+    log.info("value %d", 42)
+    log.error(lambda: "built lazily")
+    assert records == [("INFO", "value 42"), ("ERROR", "built lazily")]
+
+def test_sampling_and_rate_limiting(monkeypatch):
+    from src.core import logger
+    records = []
+    monkeypatch.setattr(logger, "log_event", lambda message, pid=None, port=None, level="INFO": records.append(message))
+    monkeypatch.setattr(logger, "_threshold", logger.LEVELS["INFO"])
+    log = logger.get_logger()
+
+    for i in range(25):
+        log.info("received %d", i, sample=10)
+    assert records == ["received 0 [1 in 10]", "received 10 [1 in 10]", "received 20 [1 in 10]"]
+
+    records.clear()
+    clock = [1000.0]
+    monkeypatch.setattr(logger.time, "monotonic", lambda: clock[0])
+    for i in range(5):
+        log.error("failure %d", i, rate=2, key="test-rate")
+    clock[0] += 1.0
+    log.error("failure %d", 5, rate=2, key="test-rate")
+    assert records == ["failure 0", "failure 1", "failure 5 (3 similar suppressed)"]
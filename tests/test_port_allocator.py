@@ -0,0 +1,100 @@
+import os
+import socket
+import subprocess
+import sys
+import time
+from src.core.port_allocator import PortAllocator
+
+def make_allocator(tmp_path, start=47000, end=47100):
+    return PortAllocator(start_port=start, end_port=end, lockfile=str(tmp_path / "allocator.lock"),
+                         used_ports_file=str(tmp_path / "used_ports.txt"),
+                         bitmap_file=str(tmp_path / "used_ports.bitmap"))
+
+def test_next_fit_and_release(tmp_path):
+    allocator = make_allocator(tmp_path)
+    first = allocator.get_next_free_port()
+    second = allocator.get_next_free_port()
+    assert second > first
+    allocator.release_port(first)
+    # Next-fit: the released port is reused only after the search wraps around
+    assert allocator.get_next_free_port() > second
+    assert first not in allocator.used_ports()
+
+def test_allocates_batches_and_fails_atomically(tmp_path):
+    allocator = make_allocator(tmp_path, 47100, 47120)
+    ports = allocator.get_free_ports(15)
+    assert len(set(ports)) == 15
+    other = make_allocator(tmp_path, 47100, 47120)  # Shares the bitmap through the file
+    try:
+        other.get_free_ports(10)
+        assert False, "allocated more ports than the range holds"
+    except RuntimeError:
+        pass
+    assert sorted(other.used_ports()) == sorted(ports)
+    assert len(other.get_free_ports(5)) == 5
+
+def test_skips_ports_bound_elsewhere(tmp_path):
+    allocator = make_allocator(tmp_path, 47200, 47210)
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as busy:
+        busy.bind(("localhost", 47200))
+        busy.listen()
+        assert allocator.get_next_free_port() == 47201
+
+def test_imports_legacy_used_ports_file(tmp_path):
+    (tmp_path / "used_ports.txt").write_text("47300 47301 47305")
+    allocator = make_allocator(tmp_path, 47300, 47310)
+    assert allocator.used_ports() == [47300, 47301, 47305]
+    assert allocator.get_free_ports(3) == [47302, 47303, 47304]
+
+def _exited_pid():
+    proc = subprocess.Popen([sys.executable, "-c", "pass"])
+    proc.wait()
+    return proc.pid
+
+def test_reclaims_ports_of_dead_holders(tmp_path):
+    allocator = make_allocator(tmp_path, 47400, 47410)
+    dead = allocator.get_free_ports(3, holder=_exited_pid())
+    kept = allocator.get_free_ports(2)
+    assert {lease.status for lease in allocator.leases() if lease.port in dead} == {"dead"}
+    assert sorted(allocator.reclaim()) == sorted(dead)
+    assert allocator.used_ports() == sorted(kept)
+
+def test_exhausted_range_sweeps_before_failing(tmp_path):
+    allocator = make_allocator(tmp_path, 47420, 47425)
+    allocator.get_free_ports(5, holder=_exited_pid())
+    assert len(allocator.get_free_ports(5)) == 5
+    try:
+        allocator.get_next_free_port()
+        assert False, "reclaimed ports of a running holder"
+    except RuntimeError:
+        pass
+
+def test_leases_expire_unless_renewed(tmp_path, monkeypatch):
+    allocator = make_allocator(tmp_path, 47430, 47440)
+    renewed, lapsed = allocator.get_free_ports(2, ttl=10)
+    child = subprocess.Popen([sys.executable, "-c", "import time; time.sleep(30)"])
+    try:
+        allocator.assign_ports({renewed: child.pid})
+        now = time.time()
+        monkeypatch.setattr(time, "time", lambda: now + 8)
+        allocator.renew([renewed])
+        monkeypatch.setattr(time, "time", lambda: now + 15)
+        assert {lease.port: (lease.pid, lease.status) for lease in allocator.leases()} == {
+            renewed: (child.pid, "alive"), lapsed: (os.getpid(), "expired")}
+        assert allocator.reclaim() == [lapsed]
+    finally:
+        child.kill()
+        child.wait()
+
+def test_upgrades_bitmap_without_leases(tmp_path):
+    bitmap = bytearray(8 + 65536 // 8)
+    bitmap[:4] = b"PPB1"
+    bitmap[8 + 47450 // 8] |= 1 << (47450 % 8)
+    (tmp_path / "used_ports.bitmap").write_bytes(bytes(bitmap))
+    allocator = make_allocator(tmp_path, 47450, 47460)
+    assert [(lease.port, lease.status) for lease in allocator.leases()] == [(47450, "unknown")]
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as busy:
+        busy.bind(("localhost", 47450))
+        busy.listen()
+        assert allocator.reclaim() == []  # Still in use by a process of the older version
+    assert allocator.reclaim() == [47450]
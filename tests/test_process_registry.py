@@ -0,0 +1,150 @@
+import json
+import multiprocessing
+import random
+from src.core.process_registry import ProcessRegistry, CachedProcessRegistry
+from src.core.registry_index import RegistryIndex
+
+def make_registry(tmp_path, legacy=None):
+    return ProcessRegistry(path=tmp_path / "registry.db", legacy_file=legacy or tmp_path / "missing.json")
+
+def test_register_lookup_and_remove(tmp_path):
+    registry = make_registry(tmp_path)
+    registry.register_process(100, 5100, socket_path="/tmp/portpulse/portpulse-5100.sock")
+    registry.register_process(101, 5101, parent_pid=100)
+    registry.register_process(102, 5102, parent_pid=100)
+
+    assert registry.get_pid_by_port(5101) == 101
+    assert registry.get_port_by_pid(100) == 5100
+    assert registry.get_endpoint_by_pid(100).path == "/tmp/portpulse/portpulse-5100.sock"
+    assert registry.get_endpoint_by_pid(101).path is None
+    assert registry.get_children_by_parent(100) == [101, 102]
+    assert registry.get_all_parents() == {"100": {"port": 5100, "children": [101, 102]}}
+    assert registry.get_all_children()["102"] == {"port": 5102, "parent": 100}
+
+    registry.remove_process(5101)
+    assert registry.get_pid_by_port(5101) is None
+    assert registry.get_children_by_parent(100) == [102]
+
+    registry.remove_parent_and_children(100)
+    assert registry.list_all_processes()["port_to_pid"] == {}
+    assert registry.get_all_parents() == {}
+    assert registry.get_all_children() == {}
+
+def test_child_before_parent_gets_placeholder(tmp_path):
+    registry = make_registry(tmp_path)
+    registry.register_process(201, 5201, parent_pid=200)
+    assert registry.get_port_by_pid(200) == -1
+    assert registry.get_endpoint_by_pid(200) is None
+    registry.register_process(200, 5200)
+    assert registry.get_all_parents()["200"] == {"port": 5200, "children": [201]}
+
+def test_imports_legacy_json(tmp_path):
+    legacy = tmp_path / "process_registry.json"
+    legacy.write_text(json.dumps({
+        "port_to_pid": {"5300": 300, "5301": 301},
+        "parent_to_children": {"300": [301]},
+        "parents": {"300": {"port": 5300, "children": [301]}},
+        "children": {"301": {"port": 5301, "parent": 300}},
+        "endpoints": {"5300": "/tmp/portpulse/portpulse-5300.sock"},
+        "services": {"broker": 300},
+    }))
+    registry = make_registry(tmp_path, legacy)
+    assert registry.get_children_by_parent(300) == [301]
+    assert registry.get_service_pid("broker") == 300
+    assert registry.get_endpoint_by_port(5300).path == "/tmp/portpulse/portpulse-5300.sock"
+
+    # Imported once, when the database is created
+    registry.remove_parent_and_children(300)
+    assert make_registry(tmp_path, legacy).get_pid_by_port(5300) is None
+
+def _register_range(path, start):
+    registry = ProcessRegistry(path=path, legacy_file=None)
+    for pid in range(start, start + 50):
+        registry.register_process(pid, pid + 1000, parent_pid=1)
+
+def test_concurrent_writers_lose_nothing(tmp_path):
+    path = tmp_path / "registry.db"
+    ProcessRegistry(path=path, legacy_file=None)
+    workers = [multiprocessing.Process(target=_register_range, args=(path, start)) for start in (1000, 2000, 3000, 4000)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join(30)
+    assert len(ProcessRegistry(path=path, legacy_file=None).get_children_by_parent(1)) == 200
+
+def test_cache_reloads_only_after_changes(tmp_path):
+    cache = CachedProcessRegistry(path=tmp_path / "registry.db", legacy_file=None)
+    writer = ProcessRegistry(path=tmp_path / "registry.db", legacy_file=None)
+    writer.register_process(400, 5400)
+    assert cache.get_port_by_pid(400) == 5400
+    reloads = cache.reloads
+    for _ in range(100):
+        assert cache.get_pid_by_port(5400) == 400
+        assert cache.get_endpoint_by_pid(400).port == 5400
+    assert cache.reloads == reloads
+
+    # A write from another connection is picked up on the next lookup
+    writer.register_process(401, 5401, parent_pid=400)
+    assert cache.get_children_by_parent(400) == [401]
+    assert cache.get_port_by_pid(401) == 5401
+    assert cache.reloads == reloads + 1
+
+    # ... and so is a write through the cache itself
+    cache.remove_process(5401)
+    assert cache.get_pid_by_port(5401) is None
+    assert writer.get_children_by_parent(400) == []
+
+def test_index_matches_database(tmp_path):
+    registry = ProcessRegistry(path=tmp_path / "registry.db", legacy_file=None)
+    index = RegistryIndex()
+    rng = random.Random(7)
+    for _ in range(500):
+        op = rng.random()
+        pid, port = rng.randrange(1, 40), rng.randrange(5000, 5040)
+        if op < 0.3:
+            registry.register_process(pid, port)
+            index.register(pid, port)
+        elif op < 0.7:
+            parent_pid = rng.randrange(1, 40)
+            socket_path = f"/tmp/portpulse/portpulse-{port}.sock" if rng.random() < 0.5 else None
+            registry.register_process(pid, port, parent_pid=parent_pid, socket_path=socket_path)
+            index.register(pid, port, parent_pid, socket_path)
+        elif op < 0.9:
+            registry.remove_process(port)
+            index.remove_port(port)
+        else:
+            registry.remove_parent_and_children(pid)
+            index.remove_tree(pid)
+        assert index.as_dict() == registry.list_all_processes()
+
+def test_tree_teardown_touches_only_the_tree(tmp_path):
+    index = RegistryIndex()
+    for parent in range(1, 101):
+        index.register(parent, 5000 + parent)
+        for child in range(10):
+            index.register(10000 + parent * 10 + child, 6000 + parent * 10 + child, parent_pid=parent)
+    index.remove_tree(50)
+    assert index.children(50) == []
+    assert index.port_of(10500) is None and index.endpoint_of(50) is None
+    assert len(index.processes) == 100 * 11 - 11
+    assert index.children(51) == [10510 + child for child in range(10)]
+
+def test_batch_is_atomic(tmp_path):
+    cache = CachedProcessRegistry(path=tmp_path / "registry.db", legacy_file=None)
+    other = ProcessRegistry(path=tmp_path / "registry.db", legacy_file=None)
+    cache.register_many([(500, 5500), (501, 5501, 500), (502, 5502, 500, "/tmp/portpulse/portpulse-5502.sock")])
+    assert other.get_children_by_parent(500) == [501, 502]
+    assert other.get_endpoint_by_port(5502).path == "/tmp/portpulse/portpulse-5502.sock"
+
+    try:
+        with cache.batch():
+            cache.register_process(600, 5600)
+            cache.register_process(601, 5601, parent_pid=600)
+            assert cache.get_children_by_parent(600) == [601]  # Visible inside the batch
+            assert other.get_port_by_pid(600) is None          # ... but not outside it
+            raise RuntimeError("spawn failed")
+    except RuntimeError:
+        pass
+    assert cache.get_port_by_pid(600) is None
+    assert other.get_port_by_pid(600) is None
+    assert cache.get_children_by_parent(500) == [501, 502]
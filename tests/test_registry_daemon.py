@@ -0,0 +1,198 @@
+import asyncio
+import json
+import socket
+import threading
+import pytest
+from src.core import process_registry
+from src.core.process_registry import ProcessRegistry, CachedProcessRegistry
+from src.core.registry_client import RegistryClient, RegistryError
+from src.core.registry_daemon import RegistryDaemon
+
+def start_daemon(tmp_path, database):
+    daemon = RegistryDaemon(str(tmp_path / "registry.sock"), str(tmp_path / "state"), snapshot_every=5,
+                            database=database)
+    daemon.recover()
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_until_complete, args=(daemon.serve(),), daemon=True)
+    thread.start()
+    client = RegistryClient(daemon.socket_path)
+    for _ in range(100):
+        if client.ping():
+            break
+        threading.Event().wait(0.01)
+
+    def stop(clean=True):
+        loop.call_soon_threadsafe(daemon.stop)
+        thread.join(5)
+        client.close()
+        if clean:
+            daemon.close()
+        else:
+            daemon._journal.close()  # As if the daemon had crashed
+    return daemon, client, stop
+
+def test_client_api_and_clean_shutdown(tmp_path):
+    database = ProcessRegistry(path=tmp_path / "registry.db", legacy_file=None)
+    database.register_process(700, 5700)
+    daemon, client, stop = start_daemon(tmp_path, database)
+    try:
+        assert client.get_port_by_pid(700) == 5700  # Imported from the database
+        client.register_many([(701, 5701, 700), (702, 5702, 700, "/tmp/portpulse/portpulse-5702.sock")])
+        client.register_service("broker", 700)
+        assert client.get_children_by_parent(700) == [701, 702]
+        assert client.get_endpoint_by_pid(702).path == "/tmp/portpulse/portpulse-5702.sock"
+        assert client.get_endpoint_by_port(5701).path is None
+        assert client.get_service_pid("broker") == 700
+        client.remove_process(5701)
+        assert client.get_all_parents() == {"700": {"port": 5700, "children": [702]}}
+        # A process that does not use the daemon writes to the database meanwhile
+        ProcessRegistry(path=tmp_path / "registry.db", legacy_file=None).register_process(4242, 6242)
+        try:
+            client.call("drop_everything")
+            assert False, "unknown operation accepted"
+        except RegistryError:
+            pass
+    finally:
+        stop()
+    # A clean stop writes the state back to the database
+    assert database.get_children_by_parent(700) == [702]
+    assert database.get_service_pid("broker") == 700
+    assert database.get_port_by_pid(4242) == 6242
+    assert database.get_pid_by_port(5701) is None
+
+def test_recovers_snapshot_and_journal_after_crash(tmp_path):
+    database = ProcessRegistry(path=tmp_path / "registry.db", legacy_file=None)
+    daemon, client, stop = start_daemon(tmp_path, database)
+    for pid in range(800, 812):  # Crosses two snapshots (every 5 updates)
+        client.register_process(pid, pid + 5000, parent_pid=799)
+    client.remove_parent_and_children(0)
+    stop(clean=False)
+    assert database.get_children_by_parent(799) == []
+
+    recovered = RegistryDaemon(daemon.socket_path, daemon.state_dir, database=database)
+    recovered.recover()
+    assert recovered.seq == 13
+    assert recovered.index.children(799) == list(range(800, 812))
+
+def test_subscribers_receive_changes(tmp_path):
+    database = ProcessRegistry(path=tmp_path / "registry.db", legacy_file=None)
+    daemon, client, stop = start_daemon(tmp_path, database)
+    try:
+        events = client.subscribe()
+        received = []
+        reader = threading.Thread(target=lambda: received.extend(next(events) for _ in range(2)))
+        reader.start()
+        threading.Event().wait(0.2)  # Let the subscription reach the daemon
+        client.register_process(900, 5900)
+        with client.batch():
+            client.register_process(901, 5901, parent_pid=900)
+            client.register_process(902, 5902, parent_pid=900)
+        reader.join(5)
+        assert [event["op"] for event in received] == ["register", "batch"]
+        assert len(received[1]["args"][0]) == 2
+    finally:
+        stop()
+
+def test_rejects_invalid_updates_without_applying_or_journaling_them(tmp_path):
+    database = ProcessRegistry(path=tmp_path / "registry.db", legacy_file=None)
+    daemon = RegistryDaemon(str(tmp_path / "registry.sock"), str(tmp_path / "state"), database=database)
+    daemon.recover()
+    daemon.update("register", [9, 6009, None, None])
+    for op, args in [("batch", [[["register", [10, 6010, None, None]], ["remove_tree", [{"x": 1}]]]]),
+                     ("register", [11, "6011"]), ("remove_port", [True])]:
+        try:
+            daemon.update(op, args)
+            assert False, f"accepted {op} {args}"
+        except TypeError:
+            pass
+    assert daemon.seq == 1 and list(daemon.index.processes) == [9]
+    daemon._journal.close()  # Crash
+
+    # A journal written before updates were validated stops replaying at the bad entry
+    with open(daemon.journal_path, "a") as f:
+        f.write(json.dumps({"seq": 2, "op": "remove_tree", "args": [{"x": 1}]}) + "\n")
+        f.write(json.dumps({"seq": 3, "op": "register", "args": [12, 6012, None, None]}) + "\n")
+    recovered = RegistryDaemon(daemon.socket_path, daemon.state_dir, database=database)
+    recovered.recover()
+    assert recovered.seq == 1 and list(recovered.index.processes) == [9]
+    recovered.update("register", [13, 6013, None, None])
+    recovered._journal.close()
+    again = RegistryDaemon(daemon.socket_path, daemon.state_dir, database=database)
+    again.recover()
+    assert sorted(again.index.processes) == [9, 13]
+
+def test_get_registry_falls_back_to_database_when_daemon_stops(tmp_path, monkeypatch):
+    database = ProcessRegistry(path=tmp_path / "registry.db", legacy_file=None)
+    daemon, client, stop = start_daemon(tmp_path, database)
+    monkeypatch.setattr(process_registry, "_registry", client)
+    monkeypatch.setattr(process_registry, "CachedProcessRegistry",
+                        lambda: CachedProcessRegistry(path=tmp_path / "registry.db", legacy_file=None))
+    client.register_process(600, 5600)
+    assert process_registry.get_registry() is client
+    stop()
+    try:
+        client.get_port_by_pid(600)
+        assert False, "daemon still answering"
+    except OSError:
+        pass
+    fallback = process_registry.get_registry()
+    assert isinstance(fallback, CachedProcessRegistry)
+    assert fallback.get_port_by_pid(600) == 5600  # Merged into the database on stop
+
+def fake_daemon(tmp_path, reply):
+    """
+    A Unix socket server that records each request line and answers with `reply(line)`:
+    bytes to send, or None to hang up without answering.
+    """
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(str(tmp_path / "fake.sock"))
+    server.listen()
+    requests = []
+
+    def serve():
+        while True:
+            try:
+                conn, _ = server.accept()
+            except OSError:
+                return
+            with conn, conn.makefile("rwb") as f:
+                for line in f:
+                    requests.append(json.loads(line)["op"])
+                    answer = reply(line)
+                    if answer is None:
+                        break
+                    f.write(answer)
+                    f.flush()
+
+    threading.Thread(target=serve, daemon=True).start()
+    return str(tmp_path / "fake.sock"), requests, server
+
+def test_hung_daemon_times_out_and_falls_back(tmp_path, monkeypatch):
+    hang = threading.Event()
+    path, requests, server = fake_daemon(tmp_path, lambda line: hang.wait(5) and None)
+    client = RegistryClient(path, timeout=0.2)
+    monkeypatch.setattr(process_registry, "_registry", client)
+    monkeypatch.setattr(process_registry, "CachedProcessRegistry",
+                        lambda: CachedProcessRegistry(path=tmp_path / "registry.db", legacy_file=None))
+    try:
+        with pytest.raises(TimeoutError):
+            client.get_port_by_pid(600)
+        assert requests == ["get_port_by_pid"]  # Not resent
+        assert isinstance(process_registry.get_registry(), CachedProcessRegistry)
+    finally:
+        hang.set()
+        server.close()
+
+def test_writes_are_not_resent_after_reaching_the_daemon(tmp_path):
+    path, requests, server = fake_daemon(tmp_path, lambda line: None)
+    client = RegistryClient(path, timeout=1)
+    try:
+        with pytest.raises(ConnectionError):
+            client.register_process(600, 5600)
+        assert requests == ["register"]
+        with pytest.raises(ConnectionError):
+            client.get_port_by_pid(600)
+        assert requests == ["register", "get_port_by_pid", "get_port_by_pid"]
+    finally:
+        client.close()
+        server.close()
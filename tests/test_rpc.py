@@ -0,0 +1,61 @@
+import asyncio
+import pytest
+from src.core.message_handler import MessageQueue
+from src.core.endpoint import Endpoint
+from src.core.rpc import RpcConnection, RpcError, EndpointBusy
+from src.core.inbox import Inbox
+
+async def _handler(envelope):
+    if envelope.text == "fail":
+        raise ValueError("boom")
+    if envelope.text == "slow":
+        await asyncio.sleep(10)
+    await asyncio.sleep(0.01)
+    return envelope.text.upper()
+
+def test_concurrent_requests_and_errors(unused_port):
+    port = unused_port()
+
+    async def run():
+        listener = asyncio.create_task(MessageQueue().start_message_listener(port, _handler))
+        await asyncio.sleep(0.1)
+        connection = await RpcConnection.open(Endpoint(port, None))
+        try:
+            replies = await asyncio.gather(*(connection.request(f"job-{i}") for i in range(20)))
+            assert [r.text for r in replies] == [f"JOB-{i}" for i in range(20)]
+            with pytest.raises(RpcError, match="boom"):
+                await connection.request("fail")
+            with pytest.raises(asyncio.TimeoutError):
+                await connection.request("slow", timeout=0.05)
+            assert connection.outstanding == 0
+        finally:
+            await connection.close()
+            listener.cancel()
+
+    asyncio.run(run())
+
+def test_full_inbox_rejects_requests_with_busy(unused_port):
+    port = unused_port()
+
+    async def slow(envelope):
+        await asyncio.sleep(0.2)
+        return "done"
+
+    async def run():
+        queue = MessageQueue()
+        inbox = Inbox(slow, capacity=1, workers=1, policy="busy")
+        listener = asyncio.create_task(queue.start_message_listener(port, slow, inbox=inbox))
+        await asyncio.sleep(0.1)
+        connection = await RpcConnection.open(Endpoint(port, None))
+        try:
+            results = await asyncio.gather(*(connection.request(str(i)) for i in range(4)),
+                                           return_exceptions=True)
+            busy = sum(isinstance(r, EndpointBusy) for r in results)
+            assert busy >= 2
+            assert results[0].text == "done"
+            assert queue.inbox_stats(port)["rejected"] == busy
+        finally:
+            await connection.close()
+            listener.cancel()
+
+    asyncio.run(run())
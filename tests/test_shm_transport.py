@@ -0,0 +1,100 @@
+import asyncio
+import multiprocessing
+import pytest
+from src.core.codec import decode_envelope
+from src.core.process_manager import send_message_to_process
+from src.core.shm_transport import (ShmRingBuffer, ShmChannel, ShmChannelFull, register_channel, channel_for,
+                                    close_channels)
+
+def test_ring_wraps_and_preserves_order():
+    ring = ShmRingBuffer(capacity=64)
+    try:
+        received = []
+        for i in range(20):
+            assert ring.write(f"msg-{i:02d}".encode())
+            received.extend(bytes(view) for view in ring.consume())
+        assert received == [f"msg-{i:02d}".encode() for i in range(20)]
+        assert ring.used() == 0
+    finally:
+        ring.close(unlink=True)
+
+def test_ring_reports_full():
+    ring = ShmRingBuffer(capacity=32)
+    try:
+        assert ring.write(b"x" * 12)
+        assert ring.write(b"y" * 12)
+        assert not ring.write(b"z")
+        with pytest.raises(ValueError):
+            ring.write(b"w" * 40)
+    finally:
+        ring.close(unlink=True)
+
+def test_channel_delivers_to_handler():
+    channel = ShmChannel(capacity=1024)
+    received = []
+
+    async def handler(msg):
+        received.append(msg.text)
+
+    async def run():
+        task = asyncio.create_task(channel.serve(handler))
+        channel.send("hello")
+        channel.send(b"world")
+        for _ in range(50):
+            if len(received) == 2:
+                break
+            await asyncio.sleep(0.01)
+        task.cancel()
+
+    try:
+        asyncio.run(run())
+        assert received == ["hello", "world"]
+    finally:
+        channel.close()
+
+def test_full_channel_fails_instead_of_waiting():
+    channel = ShmChannel(capacity=32)
+    try:
+        channel.send(b"x" * 20)
+        with pytest.raises(ShmChannelFull):
+            channel.send(b"y" * 20)
+        assert [bytes(view) for view in channel.ring.consume()] == [b"x" * 20]
+        channel.send(b"y" * 20)
+    finally:
+        channel.close()
+
+def test_send_message_uses_registered_channel():
+    channel = ShmChannel(capacity=1024)
+    register_channel(424242, channel)
+    try:
+        assert send_message_to_process(424242, "bulk", sender_pid=1)
+        envelopes = [decode_envelope(view) for view in channel.ring.consume()]
+        assert len(envelopes) == 1
+        envelope = envelopes[0]
+        assert (envelope.text, envelope.sender_pid, envelope.destination) == ("bulk", 1, 424242)
+    finally:
+        close_channels()
+    assert channel_for(424242) is None
+
+def _serve_in_child(channel, results):
+    async def handler(msg):
+        results.put(msg.text)
+        raise asyncio.CancelledError
+
+    try:
+        asyncio.run(channel.serve(handler))
+    except asyncio.CancelledError:
+        pass
+
+def test_forked_child_serves_inherited_channel():
+    ctx = multiprocessing.get_context("fork")
+    channel = ShmChannel(capacity=1024)
+    results = ctx.Queue()
+    child = ctx.Process(target=_serve_in_child, args=(channel, results))
+    child.start()
+    try:
+        channel.send("from parent")
+        assert results.get(timeout=5) == "from parent"
+    finally:
+        child.join(5)
+        channel.close()